@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DoctorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Doctor'
+
+    def ready(self):
+        # keep the doctor search index in sync
+        from . import search  # noqa: F401
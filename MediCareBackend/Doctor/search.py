@@ -0,0 +1,129 @@
+# search.py
+"""
+Doctor name/designation search backed by an in-process trigram index.
+
+The index is built from one query on first use. Signals keep it in sync
+with Doctor and user saves in this process, and it is rebuilt every
+DOCTOR_SEARCH_INDEX_TTL seconds to pick up writes made by other workers.
+Until then a doctor added or renamed by another worker is missing from
+this process's index, so a search the index can't answer is retried with
+the ``icontains`` scan. With settings.DOCTOR_SEARCH_INDEX = False, lookups
+always use the scan.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from MediCareBackend.textindex import CachedTextIndex
+from .models import Doctor
+
+NAME_FIELDS = ("first_name", "last_name", "username")
+ALL_FIELDS = NAME_FIELDS + ("designation",)
+
+
+class DoctorSearchIndex(CachedTextIndex):
+    field_order = ALL_FIELDS
+    ttl_setting = "DOCTOR_SEARCH_INDEX_TTL"
+
+    def __init__(self):
+        super().__init__()
+        self._doctor_for_user = {}
+
+    def load(self, index):
+        rows = Doctor.objects.values_list(
+            "id", "user_id", "user__first_name", "user__last_name", "user__username", "designation"
+        )
+        doctor_for_user = {}
+        for doctor_id, user_id, *values in rows.iterator(chunk_size=2000):
+            index.add(doctor_id, dict(zip(ALL_FIELDS, values)))
+            doctor_for_user[user_id] = doctor_id
+        self._doctor_for_user = doctor_for_user
+
+    def update(self, doctor):
+        user = doctor.user
+        fields = {
+            "first_name": user.first_name if user else None,
+            "last_name": user.last_name if user else None,
+            "username": user.username if user else None,
+            "designation": doctor.designation,
+        }
+
+        def change():
+            self.index.add(doctor.pk, fields)
+            self._doctor_for_user[doctor.user_id] = doctor.pk
+
+        self.apply_change(change)
+
+    def doctor_for_user(self, user_id):
+        return self._doctor_for_user.get(user_id)
+
+
+doctor_index = DoctorSearchIndex()
+
+
+def _sql_search(q, fields):
+    condition = Q()
+    for name in fields:
+        lookup = "designation" if name == "designation" else f"user__{name}"
+        condition |= Q(**{f"{lookup}__icontains": q})
+    return list(Doctor.objects.filter(condition).order_by("pk").values_list("pk", flat=True))
+
+
+def find_doctor_ids(q, include_designation=False, limit=None):
+    """
+    Ids of doctors whose first/last/username (and optionally designation)
+    contain ``q`` case-insensitively, best match first.
+    """
+    fields = ALL_FIELDS if include_designation else NAME_FIELDS
+    ids = []
+    if getattr(settings, "DOCTOR_SEARCH_INDEX", True):
+        ids = doctor_index.search(q, fields, limit=limit)
+    if not ids:
+        # no index, or a doctor another worker wrote since it was loaded
+        ids = _sql_search(q, fields)
+    return ids[:limit] if limit else ids
+
+
+def find_doctor(q):
+    """Best-matching doctor by name (user loaded), or None."""
+    doctors = Doctor.objects.select_related("user")
+    ids = find_doctor_ids(q)
+    for doctor_id in ids:
+        # the index can briefly hold a doctor deleted by another worker
+        doctor = doctors.filter(pk=doctor_id).first()
+        if doctor is not None:
+            return doctor
+    if not ids:
+        return None
+    # every hit was stale: ask the database
+    return doctors.filter(pk__in=_sql_search(q, NAME_FIELDS)).order_by("pk").first()
+
+
+# -----------------------
+# Keep the index in sync
+# -----------------------
+@receiver(post_save, sender=Doctor)
+def _doctor_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: doctor_index.update(instance))
+
+
+@receiver(post_delete, sender=Doctor)
+def _doctor_deleted(sender, instance, **kwargs):
+    doctor_id = instance.pk  # cleared on the instance once the delete finishes
+    transaction.on_commit(lambda: doctor_index.remove(doctor_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def _user_saved(sender, instance, **kwargs):
+    doctor_id = doctor_index.doctor_for_user(instance.pk)
+    if doctor_id is None:
+        return
+
+    def refresh():
+        doctor = Doctor.objects.select_related("user").filter(pk=doctor_id).first()
+        if doctor is not None:
+            doctor_index.update(doctor)
+
+    transaction.on_commit(refresh)
@@ -1,3 +1,111 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from MediCareBackend.testing import assert_max_queries, make_doctor, reset_shared_state
+from .models import Doctor
+from .search import doctor_index, find_doctor, find_doctor_ids
+
+User = get_user_model()
+
+
+class DoctorQueryCountTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        for n in range(2):
+            make_doctor(f"Doc{n}", "Smith")
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries)
+
+    def add_doctors(self):
+        # the search index picks up saves on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(2, 12):
+                make_doctor(f"Doc{n}", "Smith")
+
+    def test_list_is_one_query(self):
+        with assert_max_queries(1):
+            self.client.get("/Doctors/")
+        self.add_doctors()
+        response = self.client.get("/Doctors/")
+        self.assertEqual(len(response.json()["results"]), 12)
+        with assert_max_queries(1):
+            self.client.get("/Doctors/")
+
+    def test_search_queries_do_not_grow_with_matches(self):
+        self.client.get("/Doctors/search/?q=smith")  # builds the index
+        few = self.count_queries("/Doctors/search/?q=smith")
+        self.add_doctors()
+        response = self.client.get("/Doctors/search/?q=smith")
+        self.assertEqual(response.json()["count"], 12)
+        self.assertEqual(self.count_queries("/Doctors/search/?q=smith"), few)
+        self.assertLessEqual(few, 1)
+
+    def test_pages_and_stream_agree(self):
+        self.add_doctors()
+        paged, url = [], "/Doctors/?page_size=5"
+        while url:
+            body = self.client.get(url).json()
+            paged += body["results"]
+            url = body["next"]
+        with self.assertNumQueries(1):
+            streamed = json.loads(b"".join(self.client.get("/Doctors/?stream=1").streaming_content))
+        self.assertEqual(streamed, paged)
+        self.assertEqual(len(streamed), 12)
+
+    def test_detail_is_one_query(self):
+        doctor = Doctor.objects.first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/Doctors/{doctor.pk}/")
+        self.assertEqual(response.json()["user"]["first_name"], doctor.user.first_name)
+
+
+class DoctorSearchTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.asha = make_doctor("Asha", "Smith", designation="Cardiologist")
+        self.ashok = make_doctor("Ashok", "Smith", designation="Dermatologist")
+        self.nash = make_doctor("Nashita", "Smith")
+
+    def test_ranks_exact_then_word_start_then_substring(self):
+        self.assertEqual(find_doctor_ids("asha"), [self.asha.pk])
+        self.assertEqual(find_doctor_ids("ash"), [self.asha.pk, self.ashok.pk, self.nash.pk])
+        self.assertEqual(find_doctor("ASH"), self.asha)
+
+    def test_designation_only_when_asked(self):
+        self.assertEqual(find_doctor_ids("cardio"), [])
+        self.assertEqual(find_doctor_ids("cardio", include_designation=True), [self.asha.pk])
+
+    def test_matches_the_sql_scan(self):
+        for q in ("ash", "smith", "o", "dr-asho", "logist"):
+            with override_settings(DOCTOR_SEARCH_INDEX=False):
+                expected = set(find_doctor_ids(q, include_designation=True))
+            self.assertEqual(set(find_doctor_ids(q, include_designation=True)), expected, q)
+
+    def test_doctor_written_by_another_worker_is_found(self):
+        find_doctor_ids("ash")  # builds the index
+        # a save in another process never reaches this process's signals
+        user = User.objects.create(username="dr-9", first_name="Zara")
+        zara = Doctor.objects.bulk_create([Doctor(user=user, designation="ENT")])[0]
+        self.assertFalse(doctor_index.index.search("zara"))
+        self.assertEqual(find_doctor("zara"), zara)
+        self.assertEqual(find_doctor_ids("ent", include_designation=True), [zara.pk])
+
+    def test_doctor_deleted_by_another_worker_is_skipped(self):
+        self.assertEqual(find_doctor("asha"), self.asha)
+        Doctor.objects.filter(pk=self.asha.pk).delete()  # the index still holds it
+        self.assertEqual(find_doctor("asha"), None)
+        self.assertEqual(find_doctor("ash"), self.ashok)
+
+    def test_search_endpoint(self):
+        response = self.client.get("/Doctors/search/?q=ash")
+        self.assertEqual([row["id"] for row in response.json()["results"]], [self.asha.pk, self.ashok.pk, self.nash.pk])
+        self.assertEqual(self.client.get("/Doctors/search/?q=nobody").status_code, 404)
+        self.assertEqual(self.client.get("/Doctors/search/").status_code, 400)
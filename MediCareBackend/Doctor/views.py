@@ -5,7 +5,10 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
+from MediCareBackend.pagination import list_response
+from MediCareBackend.prefetch import optimize_queryset
 from .models import Doctor
+from .search import find_doctor_ids
 from .serializers import DoctorSerializer, DoctorDetailSerializer
 
 
@@ -13,10 +16,12 @@ from .serializers import DoctorSerializer, DoctorDetailSerializer
 # List All Doctors
 # ---------------------------------------------------------
 class ListDoctorView(APIView):
+    """
+    GET /Doctors/[?cursor=...&page_size=50]   -> {"next": ..., "results": [...]}
+    GET /Doctors/?stream=1                     -> every doctor, streamed as a JSON array
+    """
     def get(self, request):
-        doctors = Doctor.objects.all()
-        serializer = DoctorSerializer(doctors, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, Doctor.objects.all(), DoctorSerializer, ordering=("id",))
 
 
 # ---------------------------------------------------------
@@ -28,7 +33,7 @@ class DoctorDetailView(APIView):
     """
 
     def get(self, request, pk, *args, **kwargs):
-        doctor = get_object_or_404(Doctor, pk=pk)
+        doctor = get_object_or_404(optimize_queryset(Doctor.objects.all(), DoctorDetailSerializer), pk=pk)
         serializer = DoctorDetailSerializer(doctor)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -43,7 +48,8 @@ class DoctorDetailView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-from django.db.models import Q, Count
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -56,7 +62,7 @@ class SearchDoctorsAPIView(APIView):
     """
     GET /doctors/search/?q=<query>
     Search doctors by related user name (first/last/username) OR by designation.
-    Returns all matching doctors with appointment_count annotated.
+    Returns all matching doctors, best match first, with appointment_count annotated.
     """
     def get(self, request):
         q = (request.query_params.get("q") or "").strip()
@@ -64,20 +70,21 @@ class SearchDoctorsAPIView(APIView):
             return Response({"detail": "Query parameter 'q' is required."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Annotate each doctor with the number of related appointments
-        qs = (
+        ids = find_doctor_ids(q, include_designation=True)
+
+        # Annotate each doctor with the number of appointments ever booked,
+        # summed from the per-day rollup instead of counting Appointment rows
+        qs = optimize_queryset(
             Doctor.objects
-            .annotate(appointment_count=Count("appointments"))
-            .filter(
-                Q(user__first_name__icontains=q) |
-                Q(user__last_name__icontains=q) |
-                Q(user__username__icontains=q) |
-                Q(designation__icontains=q)
-            )
-            .distinct()
+            .annotate(appointment_count=Coalesce(Sum("daily_stats__booked"), 0))
+            .filter(pk__in=ids),
+            DoctorDetailSerializer,
         )
+        # keep the search ranking; evaluated once, the checks below reuse the rows
+        rank = {doctor_id: i for i, doctor_id in enumerate(ids)}
+        qs = sorted(qs, key=lambda doctor: rank[doctor.pk])
 
-        if not qs.exists():
+        if not qs:
             return Response({"detail": f"No doctors found matching '{q}'."},
                             status=status.HTTP_404_NOT_FOUND)
 
@@ -93,7 +100,7 @@ class SearchDoctorsAPIView(APIView):
 
         return Response({
             "searched_for": q,
-            "count": qs.count(),
+            "count": len(qs),
             "results": results
         }, status=status.HTTP_200_OK)
 
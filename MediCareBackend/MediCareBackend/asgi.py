@@ -20,6 +20,7 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.core.asgi import get_asgi_application
 import VideoCall.routing
+import appointments.routing
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "MediCareBackend.settings")
 
@@ -28,6 +29,7 @@ application = ProtocolTypeRouter({
     "websocket": AuthMiddlewareStack(
         URLRouter(
             VideoCall.routing.websocket_urlpatterns
+            + appointments.routing.websocket_urlpatterns
         )
     ),
 })
\ No newline at end of file
@@ -0,0 +1,89 @@
+# benchmarking.py
+"""
+Small helpers shared by the ``bench_*`` management commands.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection, connections
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """
+    Create a throwaway copy of the default database (migrated, empty) for the
+    duration of a benchmark and drop it afterwards, so benchmarks never touch
+    real data.
+
+    SQLite gets a file-backed database instead of the usual in-memory test
+    database so that worker threads each open their own connection, the way
+    separate requests would.
+    """
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    tmpdir = None
+    if connection.vendor == "sqlite" and not test_settings.get("NAME"):
+        tmpdir = tempfile.mkdtemp(prefix="medicare-bench-")
+        test_settings["NAME"] = os.path.join(tmpdir, "bench.sqlite3")
+
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        if tmpdir:
+            test_settings.pop("NAME", None)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def run_concurrently(task, workers, iterations):
+    """
+    Call ``task(worker, i)`` ``iterations`` times on each of ``workers`` threads.
+
+    Returns ``(elapsed_seconds, latencies, errors)`` where ``latencies`` holds
+    the duration of every successful call and ``errors`` the exceptions raised.
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(workers)
+
+    def worker(index):
+        local_latencies, local_errors = [], []
+        start_gate.wait()
+        try:
+            for i in range(iterations):
+                t0 = time.perf_counter()
+                try:
+                    task(index, i)
+                except Exception as exc:  # reported, not raised: keep hammering
+                    local_errors.append(exc)
+                else:
+                    local_latencies.append(time.perf_counter() - t0)
+        finally:
+            connections.close_all()
+            with lock:
+                latencies.extend(local_latencies)
+                errors.extend(local_errors)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, latencies, errors
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (0 if empty)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
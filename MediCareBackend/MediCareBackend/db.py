@@ -0,0 +1,75 @@
+# db.py
+"""
+DATABASES["default"] built from the environment.
+
+    DB_ENGINE            sqlite (default) or postgres
+    DB_NAME              SQLite file (default BASE_DIR/db.sqlite3) or database name
+    DB_USER, DB_PASSWORD, DB_HOST, DB_PORT     PostgreSQL only
+    DB_CONN_MAX_AGE      seconds a connection is kept between requests (default 60)
+    DB_POOL              PostgreSQL: use psycopg's connection pool instead (1/0)
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+    DB_SQLITE_TUNED      SQLite: apply SQLITE_PRAGMAS on connect (default 1)
+
+SQLite runs in WAL mode so bookings don't block readers, and write
+transactions take the lock when they start (BEGIN IMMEDIATE) rather than
+failing with "database is locked" when a reader tries to upgrade.
+"""
+import os
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # durable in WAL mode except for the last commits on power loss
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 20000,  # ms
+}
+SQLITE_TIMEOUT = 20  # seconds; the driver's own wait for a lock
+
+
+def _flag(env, name, default):
+    return env.get(name, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def sqlite_options(tuned=True):
+    if not tuned:
+        return {}
+    return {
+        "init_command": ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+        "timeout": SQLITE_TIMEOUT,
+        "transaction_mode": "IMMEDIATE",
+    }
+
+
+def database_config(base_dir, env=os.environ):
+    engine = env.get("DB_ENGINE", "sqlite").strip().lower()
+    conn_max_age = int(env.get("DB_CONN_MAX_AGE", "60"))
+
+    if engine == "sqlite":
+        return {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": env.get("DB_NAME") or base_dir / "db.sqlite3",
+            "CONN_MAX_AGE": conn_max_age,
+            "OPTIONS": sqlite_options(_flag(env, "DB_SQLITE_TUNED", True)),
+        }
+
+    if engine in ("postgres", "postgresql"):
+        config = {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": env.get("DB_NAME", "medicare"),
+            "USER": env.get("DB_USER", ""),
+            "PASSWORD": env.get("DB_PASSWORD", ""),
+            "HOST": env.get("DB_HOST", ""),
+            "PORT": env.get("DB_PORT", ""),
+            "CONN_MAX_AGE": conn_max_age,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+        if _flag(env, "DB_POOL", False):
+            # needs psycopg[pool]; the pool owns connection reuse, so Django must not keep them
+            config["CONN_MAX_AGE"] = 0
+            config["OPTIONS"]["pool"] = {
+                "min_size": int(env.get("DB_POOL_MIN_SIZE", "2")),
+                "max_size": int(env.get("DB_POOL_MAX_SIZE", "10")),
+            }
+        return config
+
+    raise ValueError(f"Unknown DB_ENGINE {engine!r}; expected sqlite or postgres.")
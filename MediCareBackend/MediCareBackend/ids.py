@@ -0,0 +1,184 @@
+# ids.py
+"""
+Compact, time-ordered ids generated by the server.
+
+``next_id()`` returns a 63-bit integer in snowflake layout:
+
+    | 41 bits: ms since ID_EPOCH | 10 bits: node | 12 bits: sequence |
+
+Ids from one process are strictly increasing, including from many threads
+and within one millisecond: the sequence runs on and borrows from the next
+millisecond when it overflows. Ids from different processes differ in the
+node bits, so no two live processes may share a node. It is
+settings.ID_NODE when set; that suits one process per host or container.
+Otherwise each process leases a free node from the shared cache, renews
+the lease while it runs and takes a new one after a fork. With DEBUG on
+and no ID_NODE, the node is the pid's low bits, which is enough for a
+development server. Sorting by id sorts by creation time, so new rows land
+at the right-hand end of an index instead of at random pages.
+
+``compact_id()`` is the same value as 13 characters of Crockford base32,
+for string keys. Base32 strings sort the same way as the integers.
+``IdField`` is a primary key column of these ids.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+logger = logging.getLogger(__name__)
+
+ID_EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z; 41 bits last until 2093
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford: no I, L, O, U
+COMPACT_ID_LENGTH = 13  # 13 * 5 = 65 bits >= 63
+
+NODE_LEASE_SECONDS = 3600  # renewed after a third of it
+
+_NODES = 1 << NODE_BITS
+_MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+_lock = threading.Lock()
+_last = 0  # last id issued, as (ms << SEQUENCE_BITS) | sequence
+_lease = None  # (pid, node, renew at) for this process
+
+
+def _lease_key(node):
+    return f"ids:node:{node}"
+
+
+def _lease_node(cache, owner):
+    """A node no other live process holds, reserved in ``cache`` for ``owner``."""
+    # start each search at a different node, so processes don't all race for node 0
+    cache.add("ids:node:next", 0, None)
+    start = cache.incr("ids:node:next")
+    for offset in range(_NODES):
+        node = (start + offset) % _NODES
+        if cache.add(_lease_key(node), owner, NODE_LEASE_SECONDS):
+            return node
+    raise ImproperlyConfigured(f"All {_NODES} id nodes are leased; set ID_NODE for each process instead.")
+
+
+def _node():
+    global _lease
+    configured = getattr(settings, "ID_NODE", None)
+    if configured is not None:
+        return int(configured) % _NODES
+    pid, now = os.getpid(), time.monotonic()
+    lease = _lease
+    if lease is not None and lease[0] == pid and now < lease[2]:
+        return lease[1]
+    if settings.DEBUG:
+        return pid % _NODES
+
+    from django.core.cache import cache
+
+    with _lock:
+        lease = _lease
+        owner = f"{socket.gethostname()}:{pid}"
+        try:
+            if lease is not None and lease[0] == pid:
+                # renew ours; if it lapsed and another process took the node, lease a new one
+                node = lease[1]
+                if cache.get(_lease_key(node)) != owner or not cache.touch(_lease_key(node), NODE_LEASE_SECONDS):
+                    node = _lease_node(cache, owner)
+            else:
+                # first id in this process, or in a child forked after the parent leased one
+                node = _lease_node(cache, owner)
+        except ImproperlyConfigured:
+            raise
+        except Exception as exc:
+            if lease is not None and lease[0] == pid:
+                logger.warning("could not renew id node lease %s; keeping it", lease[1], exc_info=True)
+                node = lease[1]
+            else:
+                raise ImproperlyConfigured(
+                    "Set ID_NODE or make the shared cache reachable: it hands out id nodes."
+                ) from exc
+        _lease = (pid, node, now + NODE_LEASE_SECONDS / 3)
+    return node
+
+
+def next_id():
+    global _last
+    node = _node()
+    now = (int(time.time() * 1000) - ID_EPOCH_MS) << SEQUENCE_BITS
+    with _lock:
+        # the clock may stand still or step back: keep counting from the last id
+        _last = max(now, _last + 1)
+        stamp = _last
+    ms, sequence = stamp >> SEQUENCE_BITS, stamp & _MAX_SEQUENCE
+    return (ms << (NODE_BITS + SEQUENCE_BITS)) | (node << SEQUENCE_BITS) | sequence
+
+
+def encode(value):
+    chars = []
+    for _ in range(COMPACT_ID_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def decode(text):
+    value = 0
+    for char in text.upper():
+        value = value * 32 + ALPHABET.index(char)
+    return value
+
+
+def compact_id():
+    """A new id as a 13-character string, e.g. "0A8SXPHVB1400"."""
+    return encode(next_id())
+
+
+def id_timestamp(value):
+    """When ``value`` (int or compact string) was issued, as Unix seconds."""
+    if isinstance(value, str):
+        value = decode(value)
+    return (ID_EPOCH_MS + (value >> (NODE_BITS + SEQUENCE_BITS))) / 1000
+
+
+class IdField(models.BigIntegerField):
+    """
+    A primary key filled by ``next_id()``. On SQLite the column is declared
+    INTEGER, which makes it the table's rowid: no separate primary key index.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("primary_key", True)
+        kwargs.setdefault("default", next_id)
+        kwargs.setdefault("editable", False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        for key, value in (("primary_key", True), ("default", next_id), ("editable", False), ("serialize", False)):
+            if kwargs.get(key) == value:
+                del kwargs[key]
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        if connection.vendor == "sqlite":
+            return "integer"
+        return super().db_type(connection)
+
+
+def assign_ids(queryset, field="id", batch_size=2000):
+    """
+    Give every row of ``queryset`` a fresh ``next_id()`` in ``field``, in the
+    queryset's order. For data migrations that move a table onto these ids.
+    """
+    batch = []
+    for row in queryset.only("pk").iterator(chunk_size=batch_size):
+        setattr(row, field, next_id())
+        batch.append(row)
+        if len(batch) >= batch_size:
+            queryset.model.objects.bulk_update(batch, [field])
+            batch.clear()
+    if batch:
+        queryset.model.objects.bulk_update(batch, [field])
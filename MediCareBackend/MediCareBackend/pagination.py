@@ -0,0 +1,120 @@
+# pagination.py
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .prefetch import optimize_queryset
+from .streaming import stream_list, wants_stream
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset ("seek") pagination.
+
+    Rows are ordered by ``ordering`` (all fields ascending or all descending,
+    the last one unique) and the cursor holds the ordering values of the last
+    row served. The next page is a ``WHERE (a, b) < (x, y)`` range read on a
+    matching index, so page 5000 costs the same as page 1, unlike OFFSET.
+
+    Response: {"next": <url or null>, "results": [...]}
+    """
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        fields = [name.lstrip("-") for name in self.ordering]
+        descending = self.ordering[0].startswith("-")
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model, fields)
+        if position is not None:
+            queryset = queryset.filter(self._after(fields, position, descending))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = [getattr(rows[-1], f) for f in fields] if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw and raw.isdigit() and int(raw) > 0:
+            return min(int(raw), self.max_page_size)
+        return self.page_size
+
+    @staticmethod
+    def _after(fields, position, descending):
+        # (f1, f2, ...) < (v1, v2, ...) expanded so each branch can use the index
+        op = "lt" if descending else "gt"
+        condition = Q()
+        for i, field in enumerate(fields):
+            branch = Q(**{f"{field}__{op}": position[i]})
+            for prev_field, prev_value in zip(fields[:i], position[:i]):
+                branch &= Q(**{prev_field: prev_value})
+            condition |= branch
+        return condition
+
+    def decode_cursor(self, request, model, fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(raw, list) or len(raw) != len(fields):
+                raise ValueError
+            return [model._meta.get_field(f).to_python(v) for f, v in zip(fields, raw)]
+        except (ValueError, TypeError, binascii.Error, UnicodeDecodeError) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+
+    def encode_cursor(self, position):
+        raw = [v.isoformat() if hasattr(v, "isoformat") else v for v in position]
+        return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+def list_response(request, queryset, serializer_class, ordering, **serializer_kwargs):
+    """
+    For plain APIViews: one keyset page of ``queryset`` ordered by
+    ``ordering``, or with ``?stream=1`` every row as a streamed JSON array.
+    """
+    columns = [name.lstrip("-") for name in ordering]
+    queryset = optimize_queryset(queryset, serializer_class, extra_columns=columns, **serializer_kwargs)
+    if wants_stream(request):
+        return stream_list(request, queryset.order_by(*ordering), serializer_class, **serializer_kwargs)
+    paginator = KeysetPagination(ordering=ordering)
+    page = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(serializer_class(page, many=True, **serializer_kwargs).data)
@@ -0,0 +1,139 @@
+# prefetch.py
+"""
+Derive select_related / prefetch_related / only() for a queryset from the
+serializer that will render it, so nested serializers and dotted sources
+(``doctor.user.get_full_name``) don't trigger a query per row.
+
+    queryset = optimize_queryset(Doctor.objects.all(), DoctorSerializer)
+
+Generic views can use ``QueryPlanMixin`` instead.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+class _ModelPlan:
+    """Columns needed from one model reached through ``path`` ("" for the root)."""
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = {model._meta.pk.name}
+        self.all_columns = False
+
+    def only_fields(self, prefix):
+        names = (
+            [f.name for f in self.model._meta.concrete_fields]
+            if self.all_columns else sorted(self.columns)
+        )
+        return [f"{prefix}{name}" for name in names]
+
+
+class _Planner:
+    def __init__(self, model):
+        self.plans = {"": _ModelPlan(model)}
+        self.select = set()
+        self.prefetch = set()
+
+    def visit_serializer(self, serializer, model, path):
+        for field in serializer.fields.values():
+            if field.write_only or isinstance(field, serializers.HiddenField):
+                continue
+            if field.source == "*":
+                # whole object handed to the field: keep every column
+                self.plans[path].all_columns = True
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                self.plans[path].all_columns = True
+                continue
+            child = field.child if isinstance(field, serializers.ListSerializer) else field
+            nested = child if isinstance(child, serializers.BaseSerializer) else None
+            self.visit_source(field.source_attrs, model, path, nested)
+
+    def visit_source(self, attrs, model, path, nested):
+        plan = self.plans[path]
+        name, rest = attrs[0], attrs[1:]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # property, method or annotation: it may read any column
+            plan.all_columns = True
+            return
+
+        if not model_field.is_relation:
+            plan.columns.add(name)
+            return
+
+        lookup = f"{path}__{name}" if path else name
+        related_model = model_field.related_model
+
+        if model_field.many_to_many or model_field.one_to_many:
+            # reverse FK / m2m: one extra query for all rows
+            self.prefetch.add(lookup)
+            return
+
+        if model_field.concrete:
+            plan.columns.add(name)
+        if not rest and nested is None:
+            # PrimaryKeyRelatedField & co. only read the local <name>_id column
+            return
+
+        self.select.add(lookup)
+        self.plans.setdefault(lookup, _ModelPlan(related_model))
+        if rest:
+            self.visit_source(rest, related_model, lookup, nested)
+        else:
+            self.visit_serializer(nested, related_model, lookup)
+
+    def only_fields(self):
+        fields = []
+        for path, plan in self.plans.items():
+            if path and path not in self.select:
+                continue
+            fields += plan.only_fields(f"{path}__" if path else "")
+        return fields
+
+
+def optimize_queryset(queryset, serializer_class, fields=None, extra_columns=(), **serializer_kwargs):
+    """
+    Apply the joins, prefetches and column list ``serializer_class`` needs
+    to render rows of ``queryset``.
+
+    ``fields`` restricts the plan to a subset of the serializer's fields (for
+    serializers that take a ``fields=`` argument). ``extra_columns`` are root
+    columns the caller needs besides the serialized ones (e.g. pagination keys).
+    """
+    if fields is not None:
+        serializer_kwargs["fields"] = fields
+    serializer = serializer_class(**serializer_kwargs)
+
+    planner = _Planner(queryset.model)
+    planner.visit_serializer(serializer, queryset.model, "")
+    planner.plans[""].columns.update(extra_columns)
+
+    if planner.select:
+        queryset = queryset.select_related(*sorted(planner.select))
+    if planner.prefetch:
+        queryset = queryset.prefetch_related(*sorted(planner.prefetch))
+    return queryset.only(*planner.only_fields())
+
+
+class QueryPlanMixin:
+    """
+    For generic views: plan ``get_queryset()`` from the serializer class,
+    keeping the paginator's ordering columns loaded.
+    """
+
+    def get_serializer_fields(self):
+        """Subset of serializer fields to render, or None for all."""
+        return None
+
+    def get_queryset(self):
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return optimize_queryset(
+            super().get_queryset(),
+            self.get_serializer_class(),
+            fields=self.get_serializer_fields(),
+            extra_columns=[name.lstrip("-") for name in ordering],
+        )
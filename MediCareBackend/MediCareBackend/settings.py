@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .db import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -96,10 +99,61 @@ CHANNEL_LAYERS = {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
             "hosts": [("127.0.0.1", 6379)],
+            # every consumer in a worker process shares one Redis key for its inbound
+            # messages; the default of 100 silently drops signaling under load
+            "capacity": 1500,
         },
     },
 }
 
+# Cache shared by all workers (medicine detail responses, see Medicine/cache.py)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://{}:{}/1".format(*CHANNEL_LAYERS["default"]["CONFIG"]["hosts"][0]),
+        "KEY_PREFIX": "medicare",
+    },
+}
+
+# Node bits of the generated ids (see MediCareBackend/ids.py). No two running
+# processes may share one. Set ID_NODE (0-1023) when each host or container runs
+# a single process; otherwise leave it unset and every process leases a free
+# node from the cache above. DEBUG without ID_NODE uses the pid.
+ID_NODE = int(os.environ["ID_NODE"]) if os.environ.get("ID_NODE") else None
+
+# Live per-doctor appointment queues (see appointments/queue.py)
+APPOINTMENT_QUEUE = {
+    "BACKEND": "appointments.queue.RedisQueueBackend",
+    "CONFIG": {
+        "hosts": CHANNEL_LAYERS["default"]["CONFIG"]["hosts"],
+    },
+}
+
+# WebRTC offer/answer store shared by all workers (see VideoCall/signaling.py)
+SIGNALING = {
+    "BACKEND": "VideoCall.signaling.RedisSignalingBackend",
+    "CONFIG": {
+        "hosts": CHANNEL_LAYERS["default"]["CONFIG"]["hosts"],
+        "offer_ttl": 120,
+        "answer_ttl": 120,
+    },
+}
+
+# Queue ETAs learn each doctor's average consultation length (see appointments/eta.py):
+# this is the length assumed before a doctor has any history, and ALPHA the
+# weight of the newest consultation in the moving average
+APPOINTMENT_SLOT_MINUTES = 15
+APPOINTMENT_ETA_ALPHA = 0.2
+
+# In-process trigram index for doctor name search (see Doctor/search.py);
+# rebuilt after this many seconds to pick up other workers' writes
+DOCTOR_SEARCH_INDEX = True
+DOCTOR_SEARCH_INDEX_TTL = 300
+
+# Same for the medicine catalogue (see Medicine/search.py)
+MEDICINE_SEARCH_INDEX = True
+MEDICINE_SEARCH_INDEX_TTL = 300
+
 # Set ASGI application
 ASGI_APPLICATION = "MediCareBackend.asgi.application"
 
@@ -109,11 +163,9 @@ WSGI_APPLICATION = 'MediCareBackend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Engine, pooling and SQLite tuning come from DB_* environment variables (see MediCareBackend/db.py)
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
 
 
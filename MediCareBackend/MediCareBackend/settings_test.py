@@ -0,0 +1,15 @@
+"""
+Django settings for the test suite.
+
+Process-local cache, channel layer, queue and signaling backends, so the
+suite runs without a Redis server. ``manage.py test`` uses this module
+unless DJANGO_SETTINGS_MODULE says otherwise.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import SIGNALING
+
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+APPOINTMENT_QUEUE = {"BACKEND": "appointments.queue.InMemoryQueueBackend"}
+SIGNALING = {"BACKEND": "VideoCall.signaling.InMemorySignalingBackend", "CONFIG": SIGNALING["CONFIG"]}
@@ -0,0 +1,51 @@
+# streaming.py
+"""
+Streamed JSON list responses for full exports.
+
+    return stream_list(request, queryset, DoctorSerializer)
+
+Rows are read with ``.iterator(chunk_size=...)`` and serialized one chunk
+at a time into a single JSON array. Worker memory therefore stays flat
+however large the table is. Under ASGI the chunks are pulled through
+``sync_to_async``; handing Django a plain generator there would make it
+read the whole body into a list first.
+"""
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_CHUNK_SIZE = 2000
+STREAM_QUERY_PARAM = "stream"
+
+
+def wants_stream(request):
+    return request.query_params.get(STREAM_QUERY_PARAM, "").lower() in ("1", "true", "yes")
+
+
+def _json_array(queryset, serializer_class, chunk_size, serializer_kwargs):
+    yield "["
+    rows, separator = queryset.iterator(chunk_size=chunk_size), ""
+    while chunk := list(islice(rows, chunk_size)):
+        data = serializer_class(chunk, many=True, **serializer_kwargs).data
+        # the chunk's own array, minus its brackets
+        yield separator + json.dumps(data, cls=JSONEncoder, ensure_ascii=False)[1:-1]
+        separator = ","
+    yield "]"
+
+
+async def _pulled_in_thread(iterator):
+    done = object()
+    pull = sync_to_async(next, thread_sensitive=True)
+    while (part := await pull(iterator, done)) is not done:
+        yield part
+
+
+def stream_list(request, queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE, **serializer_kwargs):
+    """A StreamingHttpResponse with every row of ``queryset`` as a JSON array."""
+    parts = _json_array(queryset, serializer_class, chunk_size, serializer_kwargs)
+    if hasattr(request, "scope"):  # ASGIRequest
+        parts = _pulled_in_thread(parts)
+    return StreamingHttpResponse(parts, content_type="application/json")
@@ -0,0 +1,190 @@
+# testing.py
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import unittest
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(limit, using=DEFAULT_DB_ALIAS):
+    """
+    Fail if the block runs more than ``limit`` queries, listing them. Unlike
+    TestCase.assertNumQueries it is an upper bound, so an endpoint's budget
+    can be asserted regardless of how many rows it returns:
+
+        with assert_max_queries(2):
+            client.get("/Doctors/")
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > limit:
+        queries = "\n".join(
+            f"{i}. {q['sql']}" for i, q in enumerate(context.captured_queries, start=1)
+        )
+        raise AssertionError(f"{executed} queries executed, at most {limit} expected:\n{queries}")
+
+
+# plan lines that mean "read every row" or "sort the result" rather than walk an index
+FULL_SCAN_MARKERS = {
+    "sqlite": ("SCAN ", "USE TEMP B-TREE"),
+    "postgresql": ("Seq Scan", "Sort "),
+}
+
+
+def index_plan_problems(queryset):
+    """
+    ``(plan, problems)`` for ``queryset``: its EXPLAIN output, and the plan
+    lines where it scans a table or sorts instead of using an index. A
+    SQLite "SCAN ... USING INDEX" (walking an index in order, as a LIMIT
+    query does) is fine.
+    """
+    vendor = connections[queryset.db].vendor
+    plan = queryset.explain()
+    markers = FULL_SCAN_MARKERS.get(vendor, ())
+    problems = [
+        line.strip() for line in plan.splitlines()
+        if any(marker in line for marker in markers)
+        and not (vendor == "sqlite" and "USING " in line and "INDEX" in line)
+    ]
+    return plan, problems
+
+
+def assert_uses_index(queryset):
+    """Fail if ``queryset`` would scan a table or sort rather than use an index."""
+    plan, problems = index_plan_problems(queryset)
+    if problems:
+        raise AssertionError("Query does not use an index:\n" + str(queryset.query) + "\n" + plan)
+
+
+def prefer_index_plans(using=DEFAULT_DB_ALIAS):
+    """
+    On PostgreSQL, stop the planner preferring sequential scans of the tiny
+    test tables, so EXPLAIN shows what it would do with real ones. Lasts for
+    the connection's transaction or session; a no-op on other databases.
+    """
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off" if connection.in_atomic_block else "SET enable_seqscan = off")
+
+
+def migrate_to(*targets, using=DEFAULT_DB_ALIAS):
+    """
+    Migrate the database to ``targets`` (``(app_label, migration_name)``
+    pairs, as for ``migrate``) and return the historical apps at that point,
+    for tests of data migrations against rows that predate them. Run from a
+    TransactionTestCase, and migrate forward to the leaf nodes when done.
+    """
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connections[using])
+    executor.loader.build_graph()
+    executor.migrate(list(targets))
+    return executor.loader.project_state(list(targets)).apps
+
+
+def latest_migrations(using=DEFAULT_DB_ALIAS):
+    """The leaf migration of every app, for ``migrate_to`` to go back to."""
+    from django.db.migrations.executor import MigrationExecutor
+
+    return MigrationExecutor(connections[using]).loader.graph.leaf_nodes()
+
+
+def reset_shared_state():
+    """
+    Empty the process-wide state that outlives a TestCase's rolled-back
+    transaction: the cache, the channel layer, the in-process appointment
+    queue and signaling backends, and the doctor and medicine search
+    indexes. Call from setUp.
+    """
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+    from django.core.cache import cache
+
+    from Doctor.search import doctor_index
+    from Medicine.search import medicine_index
+    from VideoCall.signaling import get_signaling_backend
+    from appointments.queue import get_queue_backend
+
+    cache.clear()
+    async_to_sync(get_channel_layer().flush)()
+    get_queue_backend.cache_clear()
+    get_signaling_backend.cache_clear()
+    doctor_index.invalidate()
+    medicine_index.invalidate()
+
+
+def make_doctor(first_name="Ann", last_name="", designation="General"):
+    """A Doctor and its user, whose username is derived from ``first_name``."""
+    from django.contrib.auth import get_user_model
+
+    from Doctor.models import Doctor
+
+    user = get_user_model().objects.create(
+        username=f"dr-{first_name.lower()}", first_name=first_name, last_name=last_name
+    )
+    return Doctor.objects.create(user=user, designation=designation)
+
+
+def make_patient(n, phone=None):
+    from django.contrib.auth import get_user_model
+
+    return get_user_model().objects.create(username=f"patient-{n}", phone_number=phone)
+
+
+def make_pharmacy(n, location="Baner Road, Pune", **fields):
+    """Pharmacy ``n`` and its owner; ``fields`` go to Pharmacy as they are."""
+    from django.contrib.auth import get_user_model
+
+    from Pharmacy.models import Pharmacy
+
+    owner = get_user_model().objects.create(username=f"pharmacist-{n}")
+    fields.setdefault("pharmacy_name", f"Pharmacy {n}")
+    return Pharmacy.objects.create(user=owner, location=location, contact_no=f"80000000{n:02d}", **fields)
+
+
+@contextmanager
+def redis_server():
+    """
+    Run a throwaway redis-server on a free local port for the block and yield
+    its ``(host, port)``, for tests of the Redis backends. Skips the test if
+    redis-server is not installed.
+    """
+    import redis
+
+    binary = shutil.which("redis-server")
+    if binary is None:
+        raise unittest.SkipTest("redis-server is not installed")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    workdir = tempfile.mkdtemp(prefix="medicare-redis-")
+    process = subprocess.Popen(
+        [binary, "--port", str(port), "--bind", "127.0.0.1", "--save", "", "--appendonly", "no", "--dir", workdir],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        client = redis.Redis(port=port)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                client.ping()
+                break
+            except redis.ConnectionError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("redis-server did not start")
+                time.sleep(0.05)
+        client.close()
+        yield "127.0.0.1", port
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,141 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, override_settings
+
+from . import ids
+from .db import SQLITE_PRAGMAS, database_config
+
+
+# PRAGMA synchronous reads back as a number
+PRAGMA_READBACK = {"journal_mode": "WAL", "synchronous": "1"}
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    base_dir = Path("/srv/medicare")
+
+    def test_sqlite_by_default(self):
+        config = database_config(self.base_dir, env={})
+        self.assertEqual(config["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(config["NAME"], self.base_dir / "db.sqlite3")
+        self.assertEqual(config["CONN_MAX_AGE"], 60)
+        self.assertEqual(config["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertIn("PRAGMA journal_mode=WAL", config["OPTIONS"]["init_command"])
+
+    def test_untuned_sqlite(self):
+        config = database_config(self.base_dir, env={"DB_SQLITE_TUNED": "no", "DB_NAME": "/tmp/x.db"})
+        self.assertEqual((config["NAME"], config["OPTIONS"]), ("/tmp/x.db", {}))
+
+    def test_postgres(self):
+        env = {"DB_ENGINE": "Postgres", "DB_NAME": "medicare", "DB_HOST": "db", "DB_CONN_MAX_AGE": "300"}
+        config = database_config(self.base_dir, env=env)
+        self.assertEqual(config["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual((config["HOST"], config["CONN_MAX_AGE"], config["OPTIONS"]), ("db", 300, {}))
+        self.assertTrue(config["CONN_HEALTH_CHECKS"])
+
+    def test_postgres_pool(self):
+        env = {"DB_ENGINE": "postgresql", "DB_POOL": "1", "DB_POOL_MAX_SIZE": "20"}
+        config = database_config(self.base_dir, env=env)
+        # the pool reuses connections, so Django must close its own
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertEqual(config["OPTIONS"]["pool"], {"min_size": 2, "max_size": 20})
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            database_config(self.base_dir, env={"DB_ENGINE": "oracle"})
+
+    def test_pragmas_are_applied_on_connect(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = database_config(self.base_dir, env={"DB_NAME": f"{directory}/tuned.sqlite3"})
+            handler = ConnectionHandler({"default": {"ENGINE": "django.db.backends.sqlite3"}, "tuned": config})
+            connection = handler["tuned"]
+            try:
+                with connection.cursor() as cursor:
+                    for name, value in SQLITE_PRAGMAS.items():
+                        cursor.execute(f"PRAGMA {name}")
+                        self.assertEqual(str(cursor.fetchone()[0]).upper(), PRAGMA_READBACK.get(name, str(value)), name)
+            finally:
+                connection.close()
+
+
+def node_of(value):
+    return (value >> ids.SEQUENCE_BITS) & ((1 << ids.NODE_BITS) - 1)
+
+
+class IdTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(ids, "_lease", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_increasing_across_threads(self):
+        issued = []
+
+        def issue():
+            issued.extend(ids.next_id() for _ in range(5000))
+
+        threads = [threading.Thread(target=issue) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(issued)), 20000)
+        own = [ids.next_id() for _ in range(10000)]
+        self.assertEqual(own, sorted(own))
+        self.assertGreater(own[0], max(issued))
+
+    def test_compact_ids_sort_like_the_integers(self):
+        values = [ids.next_id() for _ in range(100)] + [0, 1, 2**63 - 1]
+        encoded = [ids.encode(value) for value in values]
+        self.assertTrue(all(len(text) == ids.COMPACT_ID_LENGTH for text in encoded))
+        self.assertEqual([ids.decode(text) for text in encoded], values)
+        self.assertEqual(sorted(encoded), [ids.encode(value) for value in sorted(values)])
+        self.assertAlmostEqual(ids.id_timestamp(ids.compact_id()), time.time(), delta=1)
+
+    @override_settings(ID_NODE=1029)
+    def test_configured_node(self):
+        self.assertEqual(node_of(ids.next_id()), 5)
+
+    @override_settings(ID_NODE=None, DEBUG=False)
+    def test_processes_lease_different_nodes(self):
+        nodes = set()
+        for pid in range(100, 110):
+            with mock.patch("os.getpid", return_value=pid):
+                nodes.add(node_of(ids.next_id()))
+                # kept while the lease is fresh
+                self.assertEqual(node_of(ids.next_id()), node_of(ids.next_id()))
+        self.assertEqual(len(nodes), 10)
+
+    @override_settings(ID_NODE=None, DEBUG=False)
+    def test_lease_is_renewed_and_replaced_if_lost(self):
+        node = node_of(ids.next_id())
+        later = time.monotonic() + ids.NODE_LEASE_SECONDS
+        with mock.patch("time.monotonic", return_value=later):
+            self.assertEqual(node_of(ids.next_id()), node)
+        # the lease lapsed and another process took the node
+        cache.set(ids._lease_key(node), "elsewhere:1")
+        with mock.patch("time.monotonic", return_value=later + ids.NODE_LEASE_SECONDS):
+            self.assertNotEqual(node_of(ids.next_id()), node)
+
+    @override_settings(ID_NODE=None, DEBUG=False)
+    def test_no_node_without_the_cache(self):
+        with mock.patch.object(cache, "incr", side_effect=ConnectionError), self.assertRaises(ImproperlyConfigured):
+            ids.next_id()
+        node = node_of(ids.next_id())
+        # an unreachable cache doesn't stop a process that holds a lease
+        later = time.monotonic() + ids.NODE_LEASE_SECONDS
+        with mock.patch.object(cache, "get", side_effect=ConnectionError), \
+                mock.patch("time.monotonic", return_value=later), self.assertLogs("MediCareBackend.ids", "WARNING"):
+            self.assertEqual(node_of(ids.next_id()), node)
+
+    @override_settings(ID_NODE=None, DEBUG=True)
+    def test_debug_uses_the_pid(self):
+        with mock.patch("os.getpid", return_value=1024 + 7):
+            self.assertEqual(node_of(ids.next_id()), 7)
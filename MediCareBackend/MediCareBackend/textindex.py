@@ -0,0 +1,414 @@
+# textindex.py
+"""
+In-process trigram index for short text fields (names, designations).
+
+It gives case-insensitive substring matching with the same semantics as
+``icontains`` without scanning the table. Candidates come from intersecting
+trigram posting lists, are verified against the stored text, and are ranked
+by how well they match.
+
+``suggest()`` is the autocomplete lookup. A trie of the indexed words is
+walked with an edit-distance row per node (a Levenshtein automaton), so
+word-prefix matches and prefixes a few typos away are found without
+scoring every document.
+
+``CachedTextIndex`` wraps an index over database rows that is loaded on
+first use and reloaded after a TTL.
+"""
+import abc
+import heapq
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+
+def normalize(text):
+    return " ".join((text or "").casefold().split())
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def default_max_distance(length):
+    """Typos tolerated in a query of ``length`` characters."""
+    if length <= 3:
+        return 0
+    return 1 if length <= 6 else 2
+
+
+def _next_row(row, before, query, char, prev_char, depth, max_distance):
+    """
+    Edit-distance row between every prefix of ``query`` and the text extended
+    by ``char`` to ``depth`` characters (``row`` and ``before`` are the rows
+    for the two shorter texts). Cells more than ``max_distance`` away from the
+    diagonal can't get back under it, so only the band is computed and
+    everything over the limit is stored as ``max_distance + 1``.
+    """
+    over = max_distance + 1
+    current = [min(depth, over)] + [over] * len(query)
+    for i in range(max(1, depth - max_distance), min(len(query), depth + max_distance) + 1):
+        value = row[i - 1] + (query[i - 1] != char)
+        if row[i] + 1 < value:
+            value = row[i] + 1
+        if current[i - 1] + 1 < value:
+            value = current[i - 1] + 1
+        if i > 1 and before is not None and query[i - 1] == prev_char and query[i - 2] == char:
+            # adjacent letters swapped
+            if before[i - 2] + 1 < value:
+                value = before[i - 2] + 1
+        current[i] = value if value < over else over
+    return current
+
+
+def prefix_distance(query, text, max_distance):
+    """
+    Smallest edit distance (insert, delete, substitute, swap adjacent) between
+    ``query`` and any prefix of ``text``, or ``max_distance + 1`` if it is more.
+    """
+    row = [min(i, max_distance + 1) for i in range(len(query) + 1)]
+    before, prev_char = None, None
+    best = row[-1]
+    for depth, char in enumerate(text[:len(query) + max_distance], start=1):
+        row, before, prev_char = _next_row(row, before, query, char, prev_char, depth, max_distance), row, char
+        best = min(best, row[-1])
+        if min(row) > max_distance:
+            break
+    return min(best, max_distance + 1)
+
+
+class NgramIndex:
+    """
+    Maps document ids to a few named text fields.
+
+        index.add(7, {"first_name": "Asha", "designation": "Cardiologist"})
+        index.search("card")                      -> [7]
+        index.search("ash", fields=["first_name"]) -> [7]
+
+    Ranking, best first: whole field equals the query, a word in a field
+    starts with the query, then plain substring. Fields earlier in
+    ``field_order`` break ties, then shorter text, then id.
+    """
+
+    def __init__(self, field_order=()):
+        self.field_order = list(field_order)
+        self._lock = threading.RLock()
+        self._docs = {}                    # id -> {field: normalized text}
+        self._postings = defaultdict(set)  # trigram -> ids
+        self._word_docs = {}               # word -> ids
+        self._trie = {}                    # char -> subtrie; "" -> word ending here
+
+    def __len__(self):
+        return len(self._docs)
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._word_docs.clear()
+            self._trie.clear()
+
+    def add(self, doc_id, fields):
+        """Insert or replace a document."""
+        normalized = {name: normalize(value) for name, value in fields.items() if value}
+        with self._lock:
+            self._unindex(doc_id)
+            self._docs[doc_id] = normalized
+            for gram in self._grams(normalized):
+                self._postings[gram].add(doc_id)
+            for word in self._words(normalized):
+                if word not in self._word_docs:
+                    self._word_docs[word] = set()
+                    self._trie_add(word)
+                self._word_docs[word].add(doc_id)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._unindex(doc_id)
+            self._docs.pop(doc_id, None)
+
+    def _unindex(self, doc_id):
+        old = self._docs.get(doc_id)
+        if not old:
+            return
+        for gram in self._grams(old):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[gram]
+        for word in self._words(old):
+            ids = self._word_docs.get(word)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._word_docs[word]
+                    self._trie_remove(word)
+
+    @staticmethod
+    def _grams(normalized):
+        grams = set()
+        for text in normalized.values():
+            grams |= trigrams(text)
+        return grams
+
+    @staticmethod
+    def _words(normalized):
+        return {word for text in normalized.values() for word in text.split(" ")}
+
+    def _trie_add(self, word):
+        node = self._trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = word
+
+    def _trie_remove(self, word):
+        path, node = [], self._trie
+        for char in word:
+            path.append((node, char))
+            node = node[char]
+        node.pop("", None)
+        # prune branches left empty
+        for parent, char in reversed(path):
+            if parent[char]:
+                break
+            del parent[char]
+
+    def search(self, query, fields=None, limit=None):
+        """Ids of documents with ``query`` as a substring of one of ``fields``, best first."""
+        q = normalize(query)
+        if not q:
+            return []
+        with self._lock:
+            grams = trigrams(q)
+            if grams:
+                postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:])
+            else:
+                # 1-2 character query: too short for trigrams, check every document
+                candidates = self._docs.keys()
+            scored = []
+            for doc_id in candidates:
+                rank = self._rank(self._docs[doc_id], q, fields)
+                if rank is not None:
+                    scored.append((rank, doc_id))
+        return self._best(scored, limit)
+
+    def suggest(self, query, fields=None, limit=10, max_distance=None):
+        """
+        Autocomplete lookup. Returns the ``search()`` ranking, with word-prefix
+        matches found through the trie. If nothing matches as typed, returns
+        documents where a word starts with something one edit away from
+        ``query``, then two, up to ``max_distance`` (default:
+        ``default_max_distance``).
+        """
+        q = normalize(query)
+        if not q:
+            return []
+        if max_distance is None:
+            max_distance = default_max_distance(len(q))
+        # enough candidate words that the shortest texts make it into the top ``limit``
+        cap = max(4 * limit, 32) if limit else None
+        head = q.split(" ")[0]
+
+        with self._lock:
+            scored = self._score(self._near_words(head, 0, cap), q, fields, 0)
+            if limit is None or len(scored) < limit:
+                # mid-word matches can't be reached through the trie
+                found = {doc_id for _, doc_id in scored}
+                for doc_id in self.search(q, fields=fields, limit=limit):
+                    if doc_id not in found:
+                        scored.append((self._rank(self._docs[doc_id], q, fields), doc_id))
+            distance = 0
+            while not scored and distance < max_distance:
+                distance += 1
+                scored = self._score(self._near_words(head, distance, cap), q, fields, distance)
+        return self._best(scored, limit)
+
+    def _score(self, words, q, fields, max_distance):
+        candidates = set()
+        for word in words:
+            candidates |= self._word_docs[word]
+        scored = []
+        for doc_id in candidates:
+            doc = self._docs[doc_id]
+            rank = self._rank(doc, q, fields)
+            if rank is None:
+                rank = self._fuzzy_rank(doc, q, fields, max_distance)
+            if rank is not None:
+                scored.append((rank, doc_id))
+        return scored
+
+    def _near_words(self, word, max_distance, cap):
+        """
+        Indexed words with a prefix within ``max_distance`` edits of ``word``,
+        closest first and then shortest first, at most ``cap`` of them.
+        """
+        # walk the trie carrying the edit-distance row of each node's prefix;
+        # a node whose row ends within max_distance matches its whole subtree
+        matches = []
+        first_row = [min(i, max_distance + 1) for i in range(len(word) + 1)]
+        stack = [(self._trie, first_row, None, None, 0)]
+        while stack:
+            node, row, before, prev_char, depth = stack.pop()
+            if row[-1] <= max_distance:
+                matches.append((row[-1], node))
+                if row[-1] == 0:
+                    continue  # nothing deeper can match better
+            if min(row) > max_distance:
+                continue
+            for char, child in node.items():
+                if char:
+                    next_row = _next_row(row, before, word, char, prev_char, depth + 1, max_distance)
+                    stack.append((child, next_row, row, char, depth + 1))
+
+        found = {}
+        for distance, node in sorted(matches, key=lambda match: match[0]):
+            # breadth first, so shorter words come first
+            queue = deque([node])
+            while queue and (cap is None or len(found) < cap):
+                node = queue.popleft()
+                for char, child in node.items():
+                    if not char:
+                        found.setdefault(child, distance)
+                    else:
+                        queue.append(child)
+            if cap is not None and len(found) >= cap:
+                break
+        return list(found)
+
+    @staticmethod
+    def _best(scored, limit):
+        scored = heapq.nsmallest(limit, scored) if limit else sorted(scored)
+        return [doc_id for _, doc_id in scored]
+
+    def _rank(self, doc, q, fields):
+        best = None
+        order = self.field_order
+        for name, text in doc.items():
+            if fields is not None and name not in fields:
+                continue
+            pos = text.find(q)
+            if pos < 0:
+                continue
+            if text == q:
+                kind = 0
+            elif pos == 0 or f" {q}" in text:
+                kind = 1
+            else:
+                kind = 2
+            field_order = order.index(name) if name in order else len(order)
+            rank = (kind, field_order, len(text))
+            if best is None or rank < best:
+                best = rank
+        return best
+
+    def _fuzzy_rank(self, doc, q, fields, max_distance):
+        if not max_distance:
+            return None
+        best = None
+        order = self.field_order
+        for name, text in doc.items():
+            if fields is not None and name not in fields:
+                continue
+            starts = [0] + [i + 1 for i, char in enumerate(text) if char == " "]
+            distance = min(prefix_distance(q, text[start:], max_distance) for start in starts)
+            if distance > max_distance:
+                continue
+            field_order = order.index(name) if name in order else len(order)
+            # ranks after every substring match (kinds 0-2)
+            rank = (3 + distance, field_order, len(text))
+            if best is None or rank < best:
+                best = rank
+        return best
+
+
+class CachedTextIndex(abc.ABC):
+    """
+    An ``NgramIndex`` over database rows for one process.
+
+    It is loaded by ``load(index)`` on first use and reloaded once older than
+    the ``ttl_setting`` setting (seconds), which picks up writes made by other
+    workers. Reloads build a fresh index and swap it in, so searches never see
+    a half-loaded one. Subclasses keep it current in between with ``add`` and
+    ``remove`` from model signals, or with ``apply_change`` when they keep
+    state of their own next to the index. A change made while a reload is
+    loading is applied again once the new index is swapped in, since the load
+    may have read the rows before it.
+    """
+    field_order = ()
+    ttl_setting = None
+    default_ttl = 300
+
+    def __init__(self):
+        self.index = NgramIndex(field_order=self.field_order)
+        self._built_at = None
+        self._build_lock = threading.Lock()
+        self._changes_lock = threading.Lock()
+        self._pending = None  # changes made during a load, while one is running
+
+    @abc.abstractmethod
+    def load(self, index):
+        """Add every row to ``index``, a new empty NgramIndex."""
+
+    @property
+    def loaded(self):
+        return self._built_at is not None
+
+    def _fresh(self):
+        ttl = getattr(settings, self.ttl_setting, self.default_ttl) if self.ttl_setting else self.default_ttl
+        return self.loaded and time.monotonic() - self._built_at < ttl
+
+    def ensure_built(self):
+        if self._fresh():
+            return
+        with self._build_lock:
+            if self._fresh():
+                return
+            with self._changes_lock:
+                self._pending = []
+            index = NgramIndex(field_order=self.field_order)
+            try:
+                self.load(index)
+            except BaseException:
+                with self._changes_lock:
+                    self._pending = None
+                raise
+            with self._changes_lock:
+                self.index = index
+                self._built_at = time.monotonic()
+                pending, self._pending = self._pending, None
+                for change in pending:
+                    change()
+
+    def invalidate(self):
+        """Reload on next use (e.g. after a bulk write that skipped signals)."""
+        self._built_at = None
+
+    def apply_change(self, change):
+        """
+        Run ``change()``, which updates ``self.index`` and anything a subclass
+        keeps beside it. Before the first load there is nothing to keep
+        current; during a load it is run again once the new index is in.
+        """
+        with self._changes_lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            if self.loaded:
+                change()
+
+    def add(self, doc_id, fields):
+        self.apply_change(lambda: self.index.add(doc_id, fields))
+
+    def remove(self, doc_id):
+        self.apply_change(lambda: self.index.remove(doc_id))
+
+    def search(self, q, fields=None, limit=None):
+        self.ensure_built()
+        return self.index.search(q, fields=fields, limit=limit)
+
+    def suggest(self, q, fields=None, limit=10, max_distance=None):
+        self.ensure_built()
+        return self.index.suggest(q, fields=fields, limit=limit, max_distance=max_distance)
@@ -10,5 +10,6 @@ urlpatterns = [
     path('patient/',include('UserDetails.urls')),
     path('medicines/', include('Medicine.urls')),
     path('appointments/', include('appointments.urls')),
+    path('records/', include('PatientRecord.urls')),
 ]
 
@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Medicine,MedicineInstance,PatientMedicine
+from .models import Medicine,MedicineInstance,PatientMedicine,MedicineImport
 # Register your models here.
 admin.site.register(Medicine)
 admin.site.register(MedicineInstance)
-admin.site.register(PatientMedicine)
\ No newline at end of file
+admin.site.register(PatientMedicine)
+admin.site.register(MedicineImport)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MedicineConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Medicine'
+
+    def ready(self):
+        # keep the medicine search index and the detail cache in sync
+        from . import cache, search  # noqa: F401
@@ -0,0 +1,127 @@
+# cache.py
+"""
+Versioned response cache for MedicineDetailView.
+
+A medicine that has been served has a version token in the cache. The
+detail response is cached under (medicine_id, version) and served with an
+ETag built from the version and a Last-Modified of when it was issued. Any
+write that can change the response retires the version after commit. Such
+writes are a Medicine, one of its MedicineInstance rows, or a Pharmacy that
+stocks it. The next request checks that the medicine still exists before a
+new version is issued, so ids that don't exist never get one. A
+conditional GET with a version in the cache reads only the version, so a
+304 costs one cache lookup and no database work.
+
+Bulk writes skip model signals, so they call ``bump_versions`` themselves.
+If the cache is unreachable the view builds the response uncached.
+"""
+import logging
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Pharmacy.models import Pharmacy
+from .models import Medicine, MedicineInstance
+
+logger = logging.getLogger(__name__)
+
+VERSION_TIMEOUT = 7 * 24 * 3600  # an expired version is simply reissued
+BODY_TIMEOUT = 24 * 3600
+
+
+def _version_key(medicine_id):
+    return f"medicine:detail:version:{medicine_id}"
+
+
+def _body_key(medicine_id, version):
+    return f"medicine:detail:body:{medicine_id}:{version}"
+
+
+def _new_version():
+    # HTTP dates have one-second resolution
+    return {"token": uuid.uuid4().hex[:16], "issued_at": int(time.time())}
+
+
+def current_version(medicine_id):
+    """
+    ``{"token", "issued_at"}`` for ``medicine_id``, or None if none has been
+    issued since its last change, or if the cache is unavailable.
+    """
+    try:
+        return cache.get(_version_key(medicine_id))
+    except Exception:  # cache down or misconfigured: serve uncached
+        logger.warning("medicine detail cache unavailable", exc_info=True)
+        return None
+
+
+def issue_version(medicine_id):
+    """
+    The current version of ``medicine_id``, issuing one if there is none.
+    Only call it once the medicine is known to exist, and before reading
+    what the response is built from. None if the cache is unavailable.
+    """
+    key = _version_key(medicine_id)
+    try:
+        version = _new_version()
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key) or version
+        return version
+    except Exception:
+        logger.warning("medicine detail cache unavailable", exc_info=True)
+        return None
+
+
+def get_body(medicine_id, version):
+    try:
+        return cache.get(_body_key(medicine_id, version["token"]))
+    except Exception:
+        logger.warning("medicine detail cache unavailable", exc_info=True)
+        return None
+
+
+def set_body(medicine_id, version, body):
+    try:
+        cache.set(_body_key(medicine_id, version["token"]), body, BODY_TIMEOUT)
+    except Exception:
+        logger.warning("medicine detail cache unavailable", exc_info=True)
+
+
+def bump_versions(medicine_ids):
+    """Retire the versions of ``medicine_ids`` once the current transaction commits."""
+    medicine_ids = {str(medicine_id) for medicine_id in medicine_ids}
+    if not medicine_ids:
+        return
+
+    def bump():
+        try:
+            cache.delete_many([_version_key(mid) for mid in medicine_ids])
+        except Exception:
+            logger.exception("could not invalidate cached medicine details for %s", sorted(medicine_ids))
+
+    transaction.on_commit(bump)
+
+
+# -----------------------
+# Invalidation
+# -----------------------
+@receiver([post_save, post_delete], sender=Medicine)
+def _medicine_changed(sender, instance, **kwargs):
+    bump_versions([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=MedicineInstance)
+def _instance_changed(sender, instance, **kwargs):
+    bump_versions([instance.medicine_id])
+
+
+@receiver(post_save, sender=Pharmacy)
+def _pharmacy_changed(sender, instance, created, **kwargs):
+    # deleting a pharmacy deletes (and signals) its instances, and a new one stocks nothing yet
+    if not created:
+        bump_versions(
+            MedicineInstance.objects.filter(pharmacy_id=instance.pk).values_list("medicine_id", flat=True).distinct()
+        )
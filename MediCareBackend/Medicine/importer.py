@@ -0,0 +1,184 @@
+# importer.py
+"""
+Streaming import of the medicine master catalogue.
+
+Input is CSV with a header row (medicine_id, medicine_name, description),
+or NDJSON with one object per line using the same keys. Records are read
+one at a time and upserted in chunks of IMPORT_CHUNK_SIZE with
+``bulk_create(update_conflicts=True)``, so memory use does not grow with
+the file. Each chunk commits together with the MedicineImport checkpoint.
+After a failure, the same file can be re-run with the same import to
+continue from the first row not yet applied. Patients prescribed a
+medicine that an import renames get their timelines rebuilt on commit.
+
+Used by ``manage.py import_medicines`` and POST /medicines/import/.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+
+from PatientRecord.models import PatientRecord
+from PatientRecord.timeline import refresh_timelines
+from .cache import bump_versions
+from .models import Medicine, MedicineImport
+from .search import medicine_index
+
+IMPORT_CHUNK_SIZE = 2000
+MAX_RECORDED_ERRORS = 50
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+class CatalogueImportError(Exception):
+    """The file can't be imported at all (unknown format, missing header...)."""
+
+
+def detect_format(name, fmt=None):
+    if fmt:
+        if fmt not in FORMATS.values():
+            raise CatalogueImportError(f"Unknown format {fmt!r}; expected csv or ndjson.")
+        return fmt
+    for extension, detected in FORMATS.items():
+        if name.lower().endswith(extension):
+            return detected
+    raise CatalogueImportError(f"Can't tell the format of {name!r}; pass csv or ndjson explicitly.")
+
+
+def read_records(stream, fmt):
+    """
+    Yield ``(row_number, record)`` from a binary stream; ``record`` is a dict,
+    or None if unparseable. Raises CatalogueImportError if the file is not
+    UTF-8 or not valid CSV.
+    """
+    try:
+        yield from _read_records(stream, fmt)
+    except UnicodeDecodeError as exc:
+        raise CatalogueImportError(f"The file is not UTF-8 encoded: {exc.reason}.") from exc
+    except csv.Error as exc:
+        raise CatalogueImportError(f"Malformed CSV: {exc}.") from exc
+
+
+def _read_records(stream, fmt):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        if reader.fieldnames is not None and "medicine_id" not in reader.fieldnames:
+            raise CatalogueImportError("CSV header must include medicine_id.")
+        yield from enumerate(reader, start=1)
+        return
+
+    row = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield row, record if isinstance(record, dict) else None
+
+
+def clean_record(record):
+    """A Medicine built from ``record``, or an error message."""
+    if record is None:
+        return "Not a valid record."
+    medicine_id = str(record.get("medicine_id") or "").strip()
+    name = str(record.get("medicine_name") or "").strip() or None
+    description = str(record.get("description") or "") or None
+
+    if not medicine_id:
+        return "medicine_id is required."
+    max_length = Medicine._meta.get_field("medicine_id").max_length
+    if len(medicine_id) > max_length or (name and len(name) > max_length):
+        return f"medicine_id and medicine_name must be at most {max_length} characters."
+    return Medicine(medicine_id=medicine_id, medicine_name=name, description=description)
+
+
+def start_import(source, fmt, resume=False):
+    """A new MedicineImport, or with ``resume`` the latest unfinished one for ``source``."""
+    if resume:
+        job = (
+            MedicineImport.objects.filter(source=source, format=fmt)
+            .exclude(status="done").order_by("-created_at").first()
+        )
+        if job is not None:
+            return job
+    return MedicineImport.objects.create(source=source, format=fmt)
+
+
+def run_import(job, stream, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Import ``stream`` into the catalogue, continuing ``job`` from its
+    checkpoint. ``progress(job)`` is called after every committed chunk.
+    Raises CatalogueImportError, with ``job`` marked failed, if the file
+    can't be read or a chunk can't be saved.
+    """
+    job.status = "running"
+    job.save(update_fields=["status", "updated_at"])
+    records = islice(read_records(stream, job.format), job.rows_done, None)
+    try:
+        while chunk := list(islice(records, chunk_size)):
+            try:
+                _apply_chunk(job, chunk)
+            except DatabaseError as exc:
+                # the chunk rolled back; drop its counts from the in-memory job too
+                job.refresh_from_db(fields=["rows_done", "upserted", "skipped", "errors"])
+                raise CatalogueImportError(f"Rows {job.rows_done + 1}-{chunk[-1][0]} not saved: {exc}") from exc
+            if progress:
+                progress(job)
+    except Exception as exc:
+        job.status = "failed"
+        job.errors = (job.errors + [{"row": job.rows_done + 1, "error": f"Import stopped: {exc}"}])[-MAX_RECORDED_ERRORS:]
+        job.save(update_fields=["status", "errors", "updated_at"])
+        raise
+    finally:
+        # bulk_create bypasses the signals that keep the search index current
+        # (the detail cache is bumped per chunk)
+        medicine_index.invalidate()
+
+    job.status = "done"
+    job.save(update_fields=["status", "updated_at"])
+    return job
+
+
+def _apply_chunk(job, chunk):
+    medicines, errors = {}, []
+    for row, record in chunk:
+        cleaned = clean_record(record)
+        if isinstance(cleaned, str):
+            errors.append({"row": row, "error": cleaned})
+        else:
+            # last one wins: an upsert can't touch the same row twice in one statement
+            medicines[cleaned.medicine_id] = cleaned
+
+    with transaction.atomic():
+        if medicines:
+            # bulk_create skips the rename signal that refreshes patient timelines
+            stored_names = dict(
+                Medicine.objects.filter(pk__in=medicines).values_list("medicine_id", "medicine_name")
+            )
+            renamed = [
+                medicine_id for medicine_id, name in stored_names.items()
+                if name != medicines[medicine_id].medicine_name
+            ]
+            Medicine.objects.bulk_create(
+                medicines.values(),
+                update_conflicts=True,
+                unique_fields=["medicine_id"],
+                update_fields=["medicine_name", "description"],
+            )
+            if renamed:
+                refresh_timelines(
+                    PatientRecord.objects.filter(patientmedicine__medicine__in=renamed)
+                    .values_list("user_id", flat=True).distinct()
+                )
+        bump_versions(medicines)
+        job.rows_done = chunk[-1][0]
+        job.upserted += len(medicines)
+        job.skipped += len(errors)
+        if errors and len(job.errors) < MAX_RECORDED_ERRORS:
+            job.errors = (job.errors + errors)[:MAX_RECORDED_ERRORS]
+        job.save(update_fields=["rows_done", "upserted", "skipped", "errors", "updated_at"])
@@ -0,0 +1,110 @@
+# bench_ids.py
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.test.utils import isolate_apps
+
+from MediCareBackend.benchmarking import benchmark_database
+from MediCareBackend.ids import IdField, compact_id
+
+# primary key of the parent table for each layout
+LAYOUTS = {
+    "client string": lambda: models.CharField(max_length=45, primary_key=True, default=lambda: uuid.uuid4().hex),
+    "compact string": lambda: models.CharField(max_length=45, primary_key=True, default=compact_id),
+    "integer": lambda: IdField(),
+}
+
+
+def _tables(name, pk_field):
+    """A parent table keyed by ``pk_field`` and a child table with a foreign key to it."""
+    slug = name.replace(" ", "_")
+    meta = {"app_label": "Medicine", "db_table": f"bench_ids_{slug}"}
+    parent = type(f"Parent_{slug}", (models.Model,), {
+        "__module__": __name__,
+        "Meta": type("Meta", (), meta),
+        "id": pk_field,
+        "payload": models.CharField(max_length=45),
+    })
+    child = type(f"Child_{slug}", (models.Model,), {
+        "__module__": __name__,
+        "Meta": type("Meta", (), {**meta, "db_table": f"bench_ids_{slug}_child"}),
+        "parent": models.ForeignKey(parent, on_delete=models.CASCADE),
+    })
+    return parent, child
+
+
+def _sizes(table):
+    """``(table bytes, {index name: bytes})``."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT m.type, m.name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+                "WHERE m.tbl_name = %s GROUP BY m.name",
+                [table],
+            )
+            rows = cursor.fetchall()
+            table_size = sum(size for kind, _, size in rows if kind == "table")
+            return table_size, {name: size for kind, name, size in rows if kind == "index"}
+        cursor.execute("SELECT pg_relation_size(%s)", [table])
+        table_size = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT indexname, pg_relation_size(quote_ident(indexname)) FROM pg_indexes WHERE tablename = %s",
+            [table],
+        )
+        return table_size, dict(cursor.fetchall())
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert --rows parents and as many children into a throwaway database for "
+        "each primary key layout (random client strings, compact time-ordered "
+        "strings, time-ordered integers) and report insert throughput and "
+        "table and index sizes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rows, batch_size = options["rows"], options["batch_size"]
+        with benchmark_database(), isolate_apps("Medicine"):
+            for name, pk_field in LAYOUTS.items():
+                parent, child = _tables(name, pk_field())
+                with connection.schema_editor() as editor:
+                    editor.create_model(parent)
+                    editor.create_model(child)
+
+                parent_rate, parent_ids = self._insert(
+                    rows, batch_size, lambda n: parent(payload=f"row {n}"), parent
+                )
+                # children arrive in creation order of their parents, as prescriptions do
+                child_rate, _ = self._insert(rows, batch_size, lambda n: child(parent_id=parent_ids[n]), child)
+                del parent_ids
+
+                self._report(name, parent_rate, child_rate, parent._meta.db_table, child._meta.db_table)
+                with connection.schema_editor() as editor:
+                    editor.delete_model(child)
+                    editor.delete_model(parent)
+
+    @staticmethod
+    def _insert(rows, batch_size, build, model):
+        ids, started = [], time.perf_counter()
+        for start in range(0, rows, batch_size):
+            batch = [build(n) for n in range(start, min(start + batch_size, rows))]
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            ids.extend(obj.pk for obj in batch)
+        return rows / (time.perf_counter() - started), ids
+
+    def _report(self, name, parent_rate, child_rate, parent_table, child_table):
+        parent_size, parent_indexes = _sizes(parent_table)
+        child_size, child_indexes = _sizes(child_table)
+        mb = 1024 * 1024
+        self.stdout.write(
+            f"{name:>14}: parents {parent_rate:,.0f} rows/s, children {child_rate:,.0f} rows/s | "
+            f"parent table {parent_size / mb:.1f}MB + indexes {sum(parent_indexes.values()) / mb:.1f}MB | "
+            f"child table {child_size / mb:.1f}MB + fk index {sum(child_indexes.values()) / mb:.1f}MB"
+        )
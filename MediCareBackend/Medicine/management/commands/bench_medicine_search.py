@@ -0,0 +1,94 @@
+# bench_medicine_search.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from MediCareBackend.benchmarking import benchmark_database, percentile
+from Medicine.models import Medicine
+from Medicine.search import medicine_index
+
+SYLLABLES = ["para", "ceta", "mol", "amo", "xi", "cil", "lin", "met", "for", "min", "azi", "thro",
+             "my", "cin", "ibu", "pro", "fen", "ome", "pra", "zole", "cet", "iri", "zine", "dol"]
+
+
+def _typo(word, rng):
+    i = rng.randrange(len(word) - 1)
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]  # swapped letters
+    return word[:i] + word[i + 1:]  # dropped letter
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a synthetic medicine catalogue into a throwaway database and report "
+        "autocomplete latency for typed prefixes and misspelled names, from the "
+        "index and through /medicines/autocomplete/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--medicines", type=int, default=20000)
+        parser.add_argument("--queries", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        names = set()
+        while len(names) < options["medicines"]:
+            name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            names.add(f"{name} {rng.choice([250, 500, 650])}mg" if rng.random() < 0.3 else name)
+        names = sorted(names)
+
+        with benchmark_database():
+            Medicine.objects.bulk_create(
+                Medicine(medicine_id=f"bench-{n}", medicine_name=name) for n, name in enumerate(names)
+            )
+            medicine_index.invalidate()
+
+            started = time.perf_counter()
+            medicine_index.ensure_built()
+            self.stdout.write(f"index: {len(names)} medicines loaded in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+            # (query, word the user meant)
+            sample = [rng.choice(names).split()[0] for _ in range(options["queries"])]
+            workloads = {
+                "prefix": [(word[:rng.randint(3, len(word))], word) for word in sample],
+                "typo": [(_typo(word, rng), word) for word in sample],
+            }
+
+            def from_index(q):
+                ids = medicine_index.suggest(q, fields=["medicine_name"], limit=10)
+                return [medicine_index.name(medicine_id) for medicine_id in ids]
+
+            for label, queries in workloads.items():
+                latencies, hits = self._measure(from_index, queries)
+                self._report(f"{label:>6} index", latencies, hits, len(queries))
+
+            client = Client()
+
+            def over_http(q):
+                results = client.get("/medicines/autocomplete/", {"q": q}).json()["results"]
+                return [row["medicine_name"] for row in results]
+
+            latencies, hits = self._measure(over_http, workloads["typo"])
+            self._report("  typo http", latencies, hits, len(workloads["typo"]))
+            medicine_index.invalidate()
+
+    @staticmethod
+    def _measure(lookup, queries):
+        """Latency of each lookup, and how often the intended name is in the top 10."""
+        latencies, hits = [], 0
+        for q, meant in queries:
+            t0 = time.perf_counter()
+            names = lookup(q)
+            latencies.append(time.perf_counter() - t0)
+            hits += any(name.split()[0] == meant for name in names)
+        return latencies, hits
+
+    def _report(self, label, latencies, hits, total):
+        self.stdout.write(
+            f"{label}: p50 {percentile(latencies, 50) * 1000:.2f}ms "
+            f"p99 {percentile(latencies, 99) * 1000:.2f}ms "
+            f"max {max(latencies) * 1000:.2f}ms | intended name in top 10 for {hits}/{total}"
+        )
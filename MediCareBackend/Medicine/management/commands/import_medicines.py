@@ -0,0 +1,53 @@
+# import_medicines.py
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Medicine.importer import IMPORT_CHUNK_SIZE, CatalogueImportError, detect_format, run_import, start_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV or NDJSON medicine catalogue (medicine_id, medicine_name, "
+        "description) into the database, upserting in chunks. With --resume, "
+        "continue the last unfinished import of the same file from its checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument("--resume", action="store_true")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            fmt = detect_format(path, options["format"])
+        except CatalogueImportError as exc:
+            raise CommandError(str(exc))
+
+        source = os.path.abspath(path)
+        job = start_import(source, fmt, resume=options["resume"])
+        if job.rows_done:
+            self.stdout.write(f"Resuming import {job.pk} after row {job.rows_done}")
+        started, first_row = time.perf_counter(), job.rows_done
+
+        def progress(job):
+            rate = (job.rows_done - first_row) / max(time.perf_counter() - started, 1e-9)
+            self.stdout.write(
+                f"import {job.pk}: row {job.rows_done} | upserted {job.upserted} | "
+                f"skipped {job.skipped} | {rate:.0f} rows/s"
+            )
+
+        try:
+            with open(path, "rb") as stream:
+                run_import(job, stream, chunk_size=options["chunk_size"], progress=progress)
+        except (OSError, CatalogueImportError) as exc:
+            raise CommandError(f"Import {job.pk} failed at row {job.rows_done + 1}: {exc}")
+
+        for error in job.errors:
+            self.stdout.write(f"  row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Import {job.pk} done: {job.rows_done} rows, {job.upserted} upserted, {job.skipped} skipped"
+        ))
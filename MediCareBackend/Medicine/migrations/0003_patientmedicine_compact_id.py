@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:52
+
+import MediCareBackend.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Medicine', '0002_medicineimport'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='patientmedicine',
+            name='patient_medicine_id',
+            field=models.CharField(default=MediCareBackend.ids.compact_id, max_length=45, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Moves MedicineInstance and PatientMedicine onto server-generated integer
+# primary keys (see MediCareBackend/ids.py); instance_id and
+# patient_medicine_id stay as unique secondary keys. Part 1: add and fill
+# the new columns, and park PatientMedicine's record reference in
+# record_ref while PatientRecord's primary key is swapped.
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+from MediCareBackend.ids import next_id
+
+
+def assign_ids(queryset, field="id", batch_size=2000):
+    # MediCareBackend.ids.assign_ids as of this migration; next_id() is the
+    # generator the IdField default refers to as well
+    batch = []
+    for row in queryset.only("pk").iterator(chunk_size=batch_size):
+        setattr(row, field, next_id())
+        batch.append(row)
+        if len(batch) >= batch_size:
+            queryset.model.objects.bulk_update(batch, [field])
+            batch.clear()
+    if batch:
+        queryset.model.objects.bulk_update(batch, [field])
+
+
+def fill_ids(apps, schema_editor):
+    MedicineInstance = apps.get_model("Medicine", "MedicineInstance")
+    PatientMedicine = apps.get_model("Medicine", "PatientMedicine")
+    PatientRecord = apps.get_model("PatientRecord", "PatientRecord")
+
+    assign_ids(MedicineInstance.objects.order_by("instance_id"))
+    assign_ids(PatientMedicine.objects.order_by("patient_record__id", "patient_medicine_id"))
+    PatientMedicine.objects.update(
+        record_ref=Subquery(PatientRecord.objects.filter(pk=OuterRef("patient_record_id")).values("id")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Medicine', '0003_patientmedicine_compact_id'),
+        ('PatientRecord', '0005_patientrecord_int_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicineinstance',
+            name='id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='patientmedicine',
+            name='id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='patientmedicine',
+            name='record_ref',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(fill_ids, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='patientmedicine',
+            name='patient_record',
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Part 2 of 0004: swap the primary keys and point PatientMedicine.patient_record
+# at PatientRecord's integer id.
+
+import MediCareBackend.ids
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def attach_records(apps, schema_editor):
+    PatientMedicine = apps.get_model("Medicine", "PatientMedicine")
+    PatientMedicine.objects.update(patient_record_id=F("record_ref"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Medicine', '0004_int_ids_fill'),
+        ('PatientRecord', '0006_patientrecord_int_pk'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='medicineinstance',
+            name='id',
+            field=MediCareBackend.ids.IdField(),
+        ),
+        migrations.AlterField(
+            model_name='medicineinstance',
+            name='instance_id',
+            field=models.CharField(max_length=45, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='patientmedicine',
+            name='id',
+            field=MediCareBackend.ids.IdField(),
+        ),
+        migrations.AlterField(
+            model_name='patientmedicine',
+            name='patient_medicine_id',
+            field=models.CharField(default=MediCareBackend.ids.compact_id, max_length=45, unique=True),
+        ),
+        migrations.AddField(
+            model_name='patientmedicine',
+            name='patient_record',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='PatientRecord.patientrecord'),
+        ),
+        migrations.RunPython(attach_records, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='patientmedicine',
+            name='patient_record',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='PatientRecord.patientrecord'),
+        ),
+        migrations.RemoveField(
+            model_name='patientmedicine',
+            name='record_ref',
+        ),
+    ]
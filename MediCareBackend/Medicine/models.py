@@ -1,5 +1,7 @@
 from django.db import models
 
+from MediCareBackend.ids import IdField, compact_id
+
 
 class Medicine(models.Model):
     medicine_id = models.CharField(max_length=45, primary_key=True)
@@ -11,7 +13,8 @@ class Medicine(models.Model):
 
 
 class MedicineInstance(models.Model):
-    instance_id = models.CharField(max_length=45, primary_key=True)
+    id = IdField()
+    instance_id = models.CharField(max_length=45, unique=True)
     medicine = models.ForeignKey("Medicine.Medicine", on_delete=models.CASCADE)
     pharmacy = models.ForeignKey("Pharmacy.Pharmacy", on_delete=models.CASCADE)
 
@@ -20,7 +23,8 @@ class MedicineInstance(models.Model):
 
 
 class PatientMedicine(models.Model):
-    patient_medicine_id = models.CharField(max_length=45, primary_key=True)
+    id = IdField()
+    patient_medicine_id = models.CharField(max_length=45, unique=True, default=compact_id)
     days_of_intake = models.CharField(max_length=45, blank=True, null=True)
     intake_note = models.TextField(blank=True, null=True)
     medicine = models.ForeignKey("Medicine.Medicine", on_delete=models.CASCADE)
@@ -28,3 +32,28 @@ class PatientMedicine(models.Model):
 
     def __str__(self):
         return f"Prescription: {self.medicine} for {self.patient_record.user.username}"
+
+
+class MedicineImport(models.Model):
+    """
+    One run of a catalogue import (see Medicine/importer.py). ``rows_done`` is
+    the checkpoint: it is advanced in the same transaction as each chunk, so a
+    resumed import skips exactly the rows already applied.
+    """
+    STATUS_CHOICES = [
+        ("running", "Running"),
+        ("failed", "Failed"),
+        ("done", "Done"),
+    ]
+    source = models.CharField(max_length=255)
+    format = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="running")
+    rows_done = models.PositiveIntegerField(default=0)
+    upserted = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Import {self.pk} of {self.source}: {self.status} at row {self.rows_done}"
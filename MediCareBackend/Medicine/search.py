@@ -0,0 +1,95 @@
+# search.py
+"""
+Medicine catalogue search for the pharmacy counter.
+
+Names are held in an in-process trigram index (MediCareBackend/textindex.py)
+that answers substring, prefix and misspelled-prefix lookups without a
+query. Medicine saves and deletes in this process update it, and it is
+reloaded every MEDICINE_SEARCH_INDEX_TTL seconds to pick up other workers'
+writes. Bulk writes that bypass signals call ``medicine_index.invalidate()``.
+A lookup the index can't answer (say, a medicine another worker added since
+the last reload) falls back to an ``icontains`` scan without typo
+tolerance, as do all lookups with settings.MEDICINE_SEARCH_INDEX = False.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from MediCareBackend.textindex import CachedTextIndex
+from .models import Medicine
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+
+class MedicineSearchIndex(CachedTextIndex):
+    field_order = ("medicine_name", "medicine_id")
+    ttl_setting = "MEDICINE_SEARCH_INDEX_TTL"
+
+    def __init__(self):
+        super().__init__()
+        self._names = {}
+
+    def load(self, index):
+        names = {}
+        rows = Medicine.objects.values_list("medicine_id", "medicine_name")
+        for medicine_id, name in rows.iterator(chunk_size=2000):
+            index.add(medicine_id, {"medicine_name": name})
+            names[medicine_id] = name
+        self._names = names
+
+    def update(self, medicine):
+        medicine_id, name = medicine.pk, medicine.medicine_name
+
+        def change():
+            self.index.add(medicine_id, {"medicine_name": name})
+            self._names[medicine_id] = name
+
+        self.apply_change(change)
+
+    def remove(self, medicine_id):
+        def change():
+            self.index.remove(medicine_id)
+            self._names.pop(medicine_id, None)
+
+        self.apply_change(change)
+
+    def name(self, medicine_id):
+        return self._names.get(medicine_id)
+
+
+medicine_index = MedicineSearchIndex()
+
+
+def suggest_medicines(q, limit=DEFAULT_SUGGESTIONS):
+    """
+    Top ``limit`` medicines for ``q`` as ``[{"medicine_id", "medicine_name"}]``,
+    best first: exact name, name or word prefix, substring, then names a
+    few typos away.
+    """
+    if getattr(settings, "MEDICINE_SEARCH_INDEX", True):
+        ids = medicine_index.suggest(q, fields=["medicine_name"], limit=limit)
+        if ids:
+            return [{"medicine_id": medicine_id, "medicine_name": medicine_index.name(medicine_id)} for medicine_id in ids]
+    # no index, or a medicine another worker added since it was loaded
+    rows = (
+        Medicine.objects.filter(medicine_name__icontains=q)
+        .order_by("medicine_name")
+        .values("medicine_id", "medicine_name")
+    )
+    return list(rows[:limit])
+
+
+# -----------------------
+# Keep the index in sync
+# -----------------------
+@receiver(post_save, sender=Medicine)
+def _medicine_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: medicine_index.update(instance))
+
+
+@receiver(post_delete, sender=Medicine)
+def _medicine_deleted(sender, instance, **kwargs):
+    medicine_id = instance.pk
+    transaction.on_commit(lambda: medicine_index.remove(medicine_id))
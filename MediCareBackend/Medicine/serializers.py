@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Medicine,MedicineInstance
+from .models import Medicine,MedicineInstance,MedicineImport
 from Pharmacy.serializers import PharmacySerializer
 
 class MedicineSerializer(serializers.ModelSerializer):
@@ -10,4 +10,10 @@ class MedicineInstanceSerializer(serializers.ModelSerializer):
     pharmacy = PharmacySerializer(read_only=True)
     class Meta:
         model = MedicineInstance
-        fields = ["instance_id", "pharmacy"]
\ No newline at end of file
+        fields = ["instance_id", "pharmacy"]
+
+
+class MedicineImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MedicineImport
+        fields = ["id", "source", "format", "status", "rows_done", "upserted", "skipped", "errors", "created_at", "updated_at"]
@@ -1,3 +1,319 @@
-from django.test import TestCase
+import io
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase
+from django.utils.http import http_date
+from django.test.utils import CaptureQueriesContext
+
+from MediCareBackend.streaming import stream_list
+from MediCareBackend.testing import make_pharmacy, reset_shared_state
+from MediCareBackend.textindex import CachedTextIndex
+from .models import Medicine, MedicineImport, MedicineInstance
+from .importer import CatalogueImportError, run_import, start_import
+from .serializers import MedicineSerializer
+from .search import MedicineSearchIndex, medicine_index, suggest_medicines
+
+
+def stock(medicine, pharmacies):
+    for pharmacy in pharmacies:
+        MedicineInstance.objects.create(
+            instance_id=f"{medicine.pk}-{pharmacy.pk}", medicine=medicine, pharmacy=pharmacy
+        )
+
+
+class MedicineDetailQueryCountTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.pharmacies = [make_pharmacy(n) for n in range(8)]
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries), response.json()
+
+    def test_instances_do_not_add_queries(self):
+        one = Medicine.objects.create(medicine_id="M1", medicine_name="Paracetamol")
+        many = Medicine.objects.create(medicine_id="M2", medicine_name="Ibuprofen")
+        stock(one, self.pharmacies[:1])
+        stock(many, self.pharmacies)
+
+        few_queries, _ = self.count_queries("/medicines/M1/")
+        many_queries, body = self.count_queries("/medicines/M2/")
+        self.assertEqual(len(body["instances"]), 8)
+        self.assertEqual(body["instances"][0]["pharmacy"]["location"], "Baner Road, Pune")
+        self.assertEqual(many_queries, few_queries)
+        # the version check that the medicine exists, the medicine, then its
+        # instances joined to their pharmacies
+        self.assertEqual(many_queries, 3)
+
+
+class MedicineSuggestTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        names = ["Paracetamol", "Paracetamol Forte", "Pantoprazole", "Amoxicillin", "Ibuprofen"]
+        Medicine.objects.bulk_create(
+            [Medicine(medicine_id=f"M{n}", medicine_name=name) for n, name in enumerate(names)]
+        )
+
+    def names(self, q, **kwargs):
+        return [row["medicine_name"] for row in suggest_medicines(q, **kwargs)]
+
+    def test_exact_then_prefix_then_substring(self):
+        self.assertEqual(self.names("paracetamol"), ["Paracetamol", "Paracetamol Forte"])
+        # shorter names first among equal matches
+        self.assertEqual(self.names("pa"), ["Paracetamol", "Pantoprazole", "Paracetamol Forte"])
+        self.assertEqual(self.names("forte"), ["Paracetamol Forte"])
+        self.assertEqual(self.names("cillin"), ["Amoxicillin"])
+        self.assertEqual(self.names("pa", limit=1), ["Paracetamol"])
+
+    def test_misspelled_prefix(self):
+        self.assertEqual(self.names("parcetamol"), ["Paracetamol", "Paracetamol Forte"])
+        self.assertEqual(self.names("ibuprfen"), ["Ibuprofen"])
+        self.assertEqual(self.names("zzzz"), [])
+
+    def test_medicine_written_by_another_worker_is_found(self):
+        self.names("pa")  # builds the index
+        # a save in another process never reaches this process's signals
+        Medicine.objects.bulk_create([Medicine(medicine_id="M9", medicine_name="Cetirizine")])
+        self.assertEqual(suggest_medicines("cetiri"), [{"medicine_id": "M9", "medicine_name": "Cetirizine"}])
+
+    def test_saves_and_deletes_update_the_index(self):
+        self.names("pa")
+        with self.captureOnCommitCallbacks(execute=True):
+            Medicine.objects.filter(pk="M2").delete()
+            Medicine.objects.create(medicine_id="M9", medicine_name="Pantop Plus")
+        self.assertEqual(medicine_index.index.search("pantoprazole"), [])
+        self.assertEqual(medicine_index.name("M9"), "Pantop Plus")
+
+    def test_change_during_a_reload_is_kept(self):
+        index = MedicineSearchIndex()
+        load = index.load
+
+        def load_racing_a_save(new_index):
+            load(new_index)
+            # committed by another request after the rows were read
+            index.update(Medicine(medicine_id="M9", medicine_name="Cetirizine"))
+            index.remove("M4")
+
+        with mock.patch.object(index, "load", load_racing_a_save):
+            index.ensure_built()
+        self.assertEqual(index.search("cetirizine"), ["M9"])
+        self.assertEqual(index.name("M9"), "Cetirizine")
+        self.assertEqual(index.search("ibuprofen"), [])
+
+    def test_load_is_abstract(self):
+        with self.assertRaises(TypeError):
+            CachedTextIndex()
+
+    def test_search_endpoint(self):
+        response = self.client.get("/medicines/search/?q=parcetamol")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["medicine_found"]["medicine_id"], "M0")
+        self.assertEqual(self.client.get("/medicines/search/?q=zzzz").status_code, 404)
+
+
+class CatalogueImportTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+
+    def upload(self, content, name="catalogue.csv", **data):
+        return self.client.post("/medicines/import/", {"file": SimpleUploadedFile(name, content), **data})
+
+    def test_csv(self):
+        Medicine.objects.create(medicine_id="M1", medicine_name="Old name")
+        content = (
+            "medicine_id,medicine_name,description\n"
+            "M1,Paracetamol,Fever\n"
+            ",No id,\n"
+            "M2,Ibuprofen,\n"
+            "M2,Ibuprofen 400,Pain\n"
+        ).encode()
+        response = self.upload(content)
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual((body["status"], body["rows_done"], body["upserted"], body["skipped"]), ("done", 4, 2, 1))
+        self.assertEqual(body["errors"], [{"row": 2, "error": "medicine_id is required."}])
+        self.assertEqual(
+            dict(Medicine.objects.values_list("medicine_id", "medicine_name")),
+            {"M1": "Paracetamol", "M2": "Ibuprofen 400"},
+        )
+
+    def test_ndjson(self):
+        content = b'{"medicine_id": "M1", "medicine_name": "Paracetamol"}\n\n[1]\n{"medicine_id": "M2"}\n'
+        body = self.upload(content, name="catalogue.ndjson").json()
+        self.assertEqual((body["rows_done"], body["upserted"], body["skipped"]), (3, 2, 1))
+        self.assertEqual(suggest_medicines("paracet"), [{"medicine_id": "M1", "medicine_name": "Paracetamol"}])
+
+    def test_rejected_before_reading(self):
+        self.assertEqual(self.upload(b"x", name="catalogue.xls").status_code, 400)
+        self.assertEqual(self.upload(b"x", format="xml").status_code, 400)
+        self.assertEqual(self.client.post("/medicines/import/").status_code, 400)
+        response = self.upload(b"id,name\nM1,Paracetamol\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "CSV header must include medicine_id.")
+        self.assertEqual(response.json()["import"]["status"], "failed")
+
+    def test_not_utf8(self):
+        response = self.upload("medicine_id,medicine_name\nM1,Crème\n".encode("latin-1"))
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()["error"].startswith("The file is not UTF-8 encoded"))
+        self.assertEqual(MedicineImport.objects.get().status, "failed")
+
+    def test_malformed_csv(self):
+        response = self.upload(b"medicine_id,description\nM1," + b"x" * 200_000 + b"\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()["error"].startswith("Malformed CSV"))
+        self.assertEqual(MedicineImport.objects.get().status, "failed")
+
+    def failing_bulk_create(self, failing_call):
+        real_bulk_create = Medicine.objects.bulk_create
+        calls = []
+
+        def bulk_create(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == failing_call:
+                raise OperationalError("database is locked")
+            return real_bulk_create(objs, *args, **kwargs)
+
+        return mock.patch.object(Medicine.objects, "bulk_create", bulk_create)
+
+    def test_database_error_fails_the_import(self):
+        content = b"medicine_id,medicine_name\nM1,Paracetamol\n"
+        with self.failing_bulk_create(1):
+            response = self.upload(content)
+        self.assertEqual(response.status_code, 400)
+        body = response.json()["import"]
+        self.assertEqual((body["status"], body["rows_done"], body["upserted"]), ("failed", 0, 0))
+        self.assertIn("database is locked", body["errors"][-1]["error"])
+
+        body = self.upload(content, import_id=body["id"]).json()
+        self.assertEqual((body["status"], body["rows_done"], body["upserted"]), ("done", 1, 1))
+        self.assertEqual(self.upload(content, import_id=body["id"]).status_code, 404)
+
+    def test_resume_continues_after_the_last_saved_chunk(self):
+        rows = "".join(f"M{n},Medicine {n}\n" for n in range(1, 6))
+        content = f"medicine_id,medicine_name\n{rows}".encode()
+        job = start_import("catalogue.csv", "csv")
+        with self.failing_bulk_create(2), self.assertRaises(CatalogueImportError):
+            run_import(job, io.BytesIO(content), chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_done, job.upserted), ("failed", 2, 2))
+        self.assertEqual(job.errors[-1]["row"], 3)
+
+        self.assertEqual(start_import("catalogue.csv", "csv", resume=True), job)
+        upserts = mock.patch.object(Medicine.objects, "bulk_create", wraps=Medicine.objects.bulk_create)
+        with upserts as bulk_create:
+            run_import(job, io.BytesIO(content), chunk_size=2)
+        # rows 3-4 and 5 only
+        self.assertEqual([len(call.args[0]) for call in bulk_create.call_args_list], [2, 1])
+        self.assertEqual((job.status, job.rows_done, job.upserted), ("done", 5, 5))
+        self.assertEqual(Medicine.objects.count(), 5)
+
+
+class MedicineDetailCacheTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.pharmacy = make_pharmacy(1)
+        self.medicine = Medicine.objects.create(medicine_id="M1", medicine_name="Paracetamol")
+        stock(self.medicine, [self.pharmacy])
+
+    def get(self, medicine_id="M1", **headers):
+        return self.client.get(f"/medicines/{medicine_id}/", headers=headers)
+
+    def test_conditional_get_is_answered_from_the_cache(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            by_etag = self.get(if_none_match=first["ETag"])
+            by_date = self.get(if_modified_since=first["Last-Modified"])
+            cached = self.get()
+        self.assertEqual((by_etag.status_code, by_date.status_code), (304, 304))
+        self.assertEqual(by_etag["ETag"], first["ETag"])
+        self.assertEqual(cached.json(), first.json())
+
+    def test_writes_retire_the_version(self):
+        first = self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medicine.medicine_name = "Paracetamol 650"
+            self.medicine.save()
+        second = self.get(if_none_match=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second.json()["medicine"]["medicine_name"], "Paracetamol 650")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pharmacy.location = "Aundh, Pune"
+            self.pharmacy.save()
+        third = self.get(if_none_match=second["ETag"])
+        self.assertEqual(third.json()["instances"][0]["pharmacy"]["location"], "Aundh, Pune")
+
+    def test_missing_medicine_is_never_not_modified(self):
+        future = http_date(2**32)
+        for _ in range(2):
+            response = self.get("nope", if_modified_since=future, if_none_match="*")
+            self.assertEqual(response.status_code, 404)
+        self.assertIsNone(cache.get("medicine:detail:version:nope"))
+
+    def test_deleted_medicine_is_not_found(self):
+        first = self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medicine.delete()
+        self.assertEqual(self.get(if_none_match=first["ETag"]).status_code, 404)
+        self.assertEqual(self.get(if_modified_since=first["Last-Modified"]).status_code, 404)
+
+    def test_served_uncached_when_the_cache_is_down(self):
+        with mock.patch("Medicine.cache.cache.get", side_effect=ConnectionError), \
+                mock.patch("Medicine.cache.cache.add", side_effect=ConnectionError), \
+                self.assertLogs("Medicine.cache", "WARNING"):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertEqual(response.json()["medicine"]["medicine_id"], "M1")
+
+
+class MedicineListTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        Medicine.objects.bulk_create(
+            [Medicine(medicine_id=f"M{n:03d}", medicine_name=f"Medicine {n}") for n in range(25)]
+        )
+        self.expected = [f"M{n:03d}" for n in range(25)]
+
+    def test_pages(self):
+        seen, url = [], "/medicines/?page_size=10"
+        while url:
+            with self.assertNumQueries(1):
+                body = self.client.get(url).json()
+            seen += [row["medicine_id"] for row in body["results"]]
+            url = body["next"]
+        self.assertEqual(seen, self.expected)
+
+    def test_stream(self):
+        response = self.client.get("/medicines/?stream=1")
+        self.assertTrue(response.streaming)
+        body = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([row["medicine_id"] for row in body], self.expected)
+        self.assertEqual(body[0], {"medicine_id": "M000", "medicine_name": "Medicine 0", "description": None})
+
+    def test_stream_in_chunks(self):
+        request = RequestFactory().get("/medicines/?stream=1")
+        response = stream_list(request, Medicine.objects.order_by("medicine_id"), MedicineSerializer, chunk_size=7)
+        parts = list(response.streaming_content)
+        # "[", four chunks of rows, "]"
+        self.assertEqual(len(parts), 6)
+        self.assertEqual([row["medicine_id"] for row in json.loads(b"".join(parts))], self.expected)
+
+    def test_stream_of_nothing(self):
+        Medicine.objects.all().delete()
+        response = self.client.get("/medicines/?stream=true")
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), [])
+
+    async def test_stream_under_asgi(self):
+        response = await self.async_client.get("/medicines/?stream=1")
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual([row["medicine_id"] for row in json.loads(b"".join(chunks))], self.expected)
@@ -1,11 +1,17 @@
 # medicines/urls.py
 from django.urls import path
-from .views import MedicineListView, MedicineDetailView, SearchMedicineByNameAPIView
+from .views import (
+    MedicineListView, MedicineDetailView, SearchMedicineByNameAPIView, MedicineAutocompleteAPIView,
+    MedicineImportAPIView, MedicineImportDetailAPIView,
+)
 
 
 urlpatterns = [
     # MUST be first so "<str:pk>/" doesn't capture "search"
     path("search/", SearchMedicineByNameAPIView.as_view(), name="medicine-search"),
+    path("autocomplete/", MedicineAutocompleteAPIView.as_view(), name="medicine-autocomplete"),
+    path("import/", MedicineImportAPIView.as_view(), name="medicine-import"),
+    path("import/<int:import_id>/", MedicineImportDetailAPIView.as_view(), name="medicine-import-detail"),
 
     # list of all medicines
     path("", MedicineListView.as_view(), name="medicine-list"),
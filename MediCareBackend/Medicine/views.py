@@ -3,43 +3,88 @@
 # ============================================
 # Imports
 # ============================================
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import Medicine, MedicineInstance
-from .serializers import MedicineSerializer, MedicineInstanceSerializer
+from MediCareBackend.pagination import list_response
+from MediCareBackend.prefetch import optimize_queryset
+from Pharmacy.geo import nearest_stockists
+from Pharmacy.models import Pharmacy
+from Pharmacy.serializers import PharmacySerializer
+from .cache import current_version, get_body, issue_version, set_body
+from .importer import CatalogueImportError, detect_format, run_import, start_import
+from .models import Medicine, MedicineImport, MedicineInstance
+from .search import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, suggest_medicines
+from .serializers import MedicineSerializer, MedicineInstanceSerializer, MedicineImportSerializer
 
 
 # ============================================
 # Medicine List View
 # ============================================
 class MedicineListView(APIView):
+    """
+    GET /medicines/[?cursor=...&page_size=50]   -> {"next": ..., "results": [...]}
+    GET /medicines/?stream=1                     -> every medicine, streamed as a JSON array
+    """
     def get(self, request):
-        medicines = Medicine.objects.all()
-        serializer = MedicineSerializer(medicines, many=True)
-        return Response(serializer.data)
+        return list_response(request, Medicine.objects.all(), MedicineSerializer, ordering=("medicine_id",))
 
 
 # ============================================
 # Medicine Detail View
 # ============================================
 class MedicineDetailView(APIView):
+    """
+    GET /medicines/<medicine_id>/
+    Served from the versioned cache in Medicine/cache.py, with ETag and
+    Last-Modified; a matching If-None-Match / If-Modified-Since gets a 304
+    without touching the database.
+    """
     def get(self, request, medicine_id):
-        try:
-            medicine = Medicine.objects.get(medicine_id=medicine_id)
-        except Medicine.DoesNotExist:
-            return Response(
-                {"error": "Medicine not found"},
-                status=status.HTTP_404_NOT_FOUND
+        version = current_version(medicine_id)
+        if version is None:
+            # versions are only issued for medicines that exist, so a missing
+            # or deleted one is never answered 304
+            if not Medicine.objects.filter(medicine_id=medicine_id).exists():
+                return Response({"error": "Medicine not found"}, status=status.HTTP_404_NOT_FOUND)
+            version = issue_version(medicine_id)
+        body = None
+        if version is not None:
+            headers = {
+                "ETag": quote_etag(f"{medicine_id}-{version['token']}"),
+                "Last-Modified": http_date(version["issued_at"]),
+            }
+            not_modified = get_conditional_response(
+                request, etag=headers["ETag"], last_modified=version["issued_at"]
             )
+            if not_modified is not None:
+                for name, value in headers.items():
+                    not_modified.headers[name] = value
+                return not_modified
+            body = get_body(medicine_id, version)
+
+        if body is None:
+            try:
+                medicine = Medicine.objects.get(medicine_id=medicine_id)
+            except Medicine.DoesNotExist:
+                return Response(
+                    {"error": "Medicine not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            instances = optimize_queryset(MedicineInstance.objects.filter(medicine=medicine), MedicineInstanceSerializer)
 
-        instances = MedicineInstance.objects.filter(medicine=medicine)
+            body = {
+                "medicine": MedicineSerializer(medicine).data,
+                "instances": MedicineInstanceSerializer(instances, many=True).data
+            }
+            if version is not None:
+                set_body(medicine_id, version, body)
 
-        return Response({
-            "medicine": MedicineSerializer(medicine).data,
-            "instances": MedicineInstanceSerializer(instances, many=True).data
-        })
+        return Response(body, headers=headers if version is not None else None)
 
 
 # ============================================
@@ -47,10 +92,15 @@ class MedicineDetailView(APIView):
 # ============================================
 class SearchMedicineByNameAPIView(APIView):
     """
-    GET /medicines/search/?q=paracetamol[&location=gandhipuram]
-    Returns first matching medicine (case-insensitive contains) and its instances.
+    GET /medicines/search/?q=paracetamol[&location=gandhipuram][&limit=10]
+    Returns the best matching medicine and its instances, plus the top
+    `limit` ranked matches (prefix first, misspellings tolerated) in `matches`.
     If `location` is provided, only instances whose pharmacy.location contains
-    the location substring (case-insensitive) are returned.
+    the location substring (ignoring case, spaces and punctuation) are returned.
+
+    With `lat` & `lng` (and optional `k`, default 10, and `max_km`, default 50),
+    the instances are the `k` nearest stocking pharmacies, nearest first, each
+    with a `distance_km`.
     """
     def get(self, request):
         q = (request.query_params.get("q") or "").strip()
@@ -62,45 +112,129 @@ class SearchMedicineByNameAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # find medicine (same behaviour as your working code)
-        qs = Medicine.objects.filter(medicine_name__icontains=q)
+        matches = suggest_medicines(q, limit=_limit(request))
+        # the index can briefly list a medicine another worker just deleted
+        medicine = Medicine.objects.filter(medicine_id=matches[0]["medicine_id"]).first() if matches else None
 
-        if not qs.exists():
+        if medicine is None:
             return Response(
                 {"detail": f"No medicine found matching '{q}'"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        medicine = qs.first()
         med_data = MedicineSerializer(medicine).data
 
+        if "lat" in request.query_params or "lng" in request.query_params:
+            try:
+                lat = float(request.query_params["lat"])
+                lng = float(request.query_params["lng"])
+                k = int(request.query_params.get("k", 10))
+                max_km = float(request.query_params.get("max_km", 50))
+                if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < k <= 100 and 0 < max_km <= 500):
+                    raise ValueError
+            except (KeyError, ValueError):
+                return Response(
+                    {"detail": "'lat' and 'lng' must both be valid coordinates; 'k' is 1-100 and 'max_km' up to 500."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            pharmacies = Pharmacy.objects.in_area(location) if location else Pharmacy.objects.all()
+            pharmacies = optimize_queryset(pharmacies, PharmacySerializer)
+            nearest = nearest_stockists(pharmacies, medicine, lat, lng, k=k, max_km=max_km)
+            med_data["instances"] = [
+                {
+                    "instance_id": pharmacy.instance_id,
+                    "pharmacy": PharmacySerializer(pharmacy).data,
+                    "distance_km": round(distance, 3),
+                }
+                for pharmacy, distance in nearest
+            ]
+            return Response(
+                {"searched_for": q, "medicine_found": med_data, "matches": matches},
+                status=status.HTTP_200_OK
+            )
+
         # get all instances for this medicine
-        instances_qs = MedicineInstance.objects.filter(medicine=medicine).select_related('pharmacy')
+        instances_qs = MedicineInstance.objects.filter(medicine=medicine)
 
-        # if location provided, filter instances where pharmacy.location contains the location (case-insensitive)
+        # if location provided, keep instances whose pharmacy.location contains it
+        # (ignoring case, spaces and punctuation), using the location suffix index
         if location:
-            # some pharmacies/instances may have location stored with different casing or formats
-            # so we filter in Python to be safe (alternatively you can use __icontains on related field)
-            filtered_instances = []
-            for inst in instances_qs:
-                pharmacy = getattr(inst, "pharmacy", None)
-                # try nested pharmacy object first
-                if pharmacy:
-                    loc_val = getattr(pharmacy, "location", "") or ""
-                else:
-                    # fallback to instance-level location field if present
-                    loc_val = getattr(inst, "location", "") or ""
-                if location.lower() in str(loc_val).lower():
-                    filtered_instances.append(inst)
-            instances = filtered_instances
-        else:
-            # no location filter -> return all instances
-            instances = list(instances_qs)
+            instances_qs = instances_qs.filter(pharmacy__in=Pharmacy.objects.in_area(location))
+
+        instances = optimize_queryset(instances_qs, MedicineInstanceSerializer)
 
         # serialize instances (reuse your serializer)
         med_data["instances"] = MedicineInstanceSerializer(instances, many=True).data
 
         return Response(
-            {"searched_for": q, "medicine_found": med_data},
+            {"searched_for": q, "medicine_found": med_data, "matches": matches},
             status=status.HTTP_200_OK
         )
+
+
+# ============================================
+# Medicine Name Autocomplete API
+# ============================================
+class MedicineAutocompleteAPIView(APIView):
+    """
+    GET /medicines/autocomplete/?q=parac[&limit=10]
+    Ranked medicine names for a partly typed (or misspelled) name, served from
+    the in-memory index: [{"medicine_id": ..., "medicine_name": ...}, ...]
+    """
+    def get(self, request):
+        q = (request.query_params.get("q") or "").strip()
+        if not q:
+            return Response(
+                {"detail": "Query parameter 'q' is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({"searched_for": q, "results": suggest_medicines(q, limit=_limit(request))})
+
+
+def _limit(request):
+    raw = request.query_params.get("limit") or ""
+    return min(int(raw), MAX_SUGGESTIONS) if raw.isdigit() and int(raw) > 0 else DEFAULT_SUGGESTIONS
+
+
+# ============================================
+# Medicine Catalogue Import API
+# ============================================
+class MedicineImportAPIView(APIView):
+    """
+    POST /medicines/import/   multipart: file=<catalogue.csv|.ndjson>[, format=csv|ndjson][, import_id=<id>]
+    Streams the file into the catalogue (see Medicine/importer.py) and returns
+    the import record. Pass the `import_id` of a failed import with the same
+    file to resume it from its checkpoint.
+    """
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload the catalogue as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            fmt = detect_format(upload.name, request.data.get("format"))
+        except CatalogueImportError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        import_id = request.data.get("import_id")
+        if import_id:
+            job = MedicineImport.objects.filter(pk=import_id).first() if str(import_id).isdigit() else None
+            if job is None or job.status == "done" or job.format != fmt:
+                return Response({"error": "No unfinished import with that id and format."}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            job = start_import(upload.name, fmt)
+
+        try:
+            run_import(job, upload.file)
+        except CatalogueImportError as exc:
+            return Response({"error": str(exc), "import": MedicineImportSerializer(job).data}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(MedicineImportSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class MedicineImportDetailAPIView(APIView):
+    """GET /medicines/import/<import_id>/ -> progress of an import."""
+    def get(self, request, import_id):
+        job = MedicineImport.objects.filter(pk=import_id).first()
+        if job is None:
+            return Response({"error": "Import not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(MedicineImportSerializer(job).data)
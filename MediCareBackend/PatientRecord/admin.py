@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import PatientRecord
+from .models import PatientRecord, PatientTimeline
 
 admin.site.register(PatientRecord)
+admin.site.register(PatientTimeline)
 # Register your models here.
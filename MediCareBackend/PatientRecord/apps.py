@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PatientrecordConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'PatientRecord'
+
+    def ready(self):
+        # keep patient timelines in sync
+        from . import timeline  # noqa: F401
@@ -0,0 +1,27 @@
+# rebuild_timelines.py
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from PatientRecord.models import PatientRecord
+from PatientRecord.timeline import REBUILD_CHUNK_SIZE, rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild patient timelines from PatientRecord and PatientMedicine: for the "
+        "given user ids, or for every patient with a record. Use after bulk loads "
+        "or doctor renames, which don't update timelines themselves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("user_ids", nargs="*", type=int)
+        parser.add_argument("--chunk-size", type=int, default=REBUILD_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"] or PatientRecord.objects.values_list("user_id", flat=True).distinct()
+        if options["user_ids"]:
+            missing = set(user_ids) - set(get_user_model().objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+            for user_id in sorted(missing):
+                self.stdout.write(self.style.WARNING(f"  no user {user_id}"))
+        written = rebuild_timelines(user_ids, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{written} timelines rebuilt"))
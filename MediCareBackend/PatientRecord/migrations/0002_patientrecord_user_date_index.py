@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Doctor', '0002_doctor_designation'),
+        ('PatientRecord', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patientrecord',
+            index=models.Index(fields=['user', '-date'], name='record_user_date_idx'),
+        ),
+    ]
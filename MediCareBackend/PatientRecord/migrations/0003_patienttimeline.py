@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PatientRecord', '0002_patientrecord_user_date_index'),
+        ('UserDetails', '0003_customuser_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientTimeline',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='timeline', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('visits', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Moves PatientRecord onto a server-generated integer primary key (see
+# MediCareBackend/ids.py). record_id stays as a unique secondary key.
+# Part 1: add and fill the new column. Medicine 0004 then detaches
+# PatientMedicine.patient_record, 0006 swaps the primary key, and
+# Medicine 0005 reattaches the foreign key to the integer id.
+
+from django.db import migrations, models
+
+from MediCareBackend.ids import next_id
+
+
+def assign_ids(queryset, field="id", batch_size=2000):
+    # MediCareBackend.ids.assign_ids as of this migration; next_id() is the
+    # generator the IdField default refers to as well
+    batch = []
+    for row in queryset.only("pk").iterator(chunk_size=batch_size):
+        setattr(row, field, next_id())
+        batch.append(row)
+        if len(batch) >= batch_size:
+            queryset.model.objects.bulk_update(batch, [field])
+            batch.clear()
+    if batch:
+        queryset.model.objects.bulk_update(batch, [field])
+
+
+def fill_ids(apps, schema_editor):
+    PatientRecord = apps.get_model("PatientRecord", "PatientRecord")
+    assign_ids(PatientRecord.objects.order_by("date", "record_id"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PatientRecord', '0004_patientrecord_compact_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientrecord',
+            name='id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(fill_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Part 2 of 0005: make id the primary key and record_id a unique secondary key.
+
+import MediCareBackend.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PatientRecord', '0005_patientrecord_int_id'),
+        ('Medicine', '0004_int_ids_fill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='patientrecord',
+            name='id',
+            field=MediCareBackend.ids.IdField(),
+        ),
+        migrations.AlterField(
+            model_name='patientrecord',
+            name='record_id',
+            field=models.CharField(default=MediCareBackend.ids.compact_id, max_length=45, unique=True),
+        ),
+    ]
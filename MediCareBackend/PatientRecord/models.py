@@ -1,12 +1,37 @@
 from django.db import models
 from django.conf import settings
 
+from MediCareBackend.ids import IdField, compact_id
+
 class PatientRecord(models.Model):
-    record_id = models.CharField(max_length=45, primary_key=True)
+    id = IdField()
+    record_id = models.CharField(max_length=45, unique=True, default=compact_id)
     doctor = models.ForeignKey("Doctor.Doctor", on_delete=models.CASCADE)  # ✅ Use string reference
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     doctor_note = models.TextField(blank=True, null=True)
     date = models.DateField()
 
+    class Meta:
+        indexes = [
+            # a patient's history, newest first
+            models.Index(fields=["user", "-date"], name="record_user_date_idx"),
+        ]
+
     def __str__(self):
         return f"Record {self.record_id} - {self.user.username}"
+
+
+class PatientTimeline(models.Model):
+    """
+    A patient's whole history as one JSON document, newest visit first:
+    each PatientRecord with its doctor and prescriptions. Maintained by
+    PatientRecord/timeline.py; never edit it directly.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="timeline"
+    )
+    visits = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Timeline of user {self.user_id} ({len(self.visits)} visits)"
@@ -0,0 +1,58 @@
+# prescriptions.py
+"""
+Write path for a finished consultation: one PatientRecord and all of its
+PatientMedicine rows in a single transaction.
+
+The number of queries does not depend on the number of prescriptions:
+one ``in_bulk`` checks every medicine id, the record is one INSERT and
+the prescriptions one ``bulk_create``. Ids are generated here
+(MediCareBackend/ids.py), so nothing has to be looked up to avoid
+collisions.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from Medicine.models import Medicine, PatientMedicine
+from .models import PatientRecord
+
+
+class UnknownMedicineError(Exception):
+    def __init__(self, medicine_ids):
+        super().__init__(f"Unknown medicine ids: {', '.join(sorted(medicine_ids))}")
+        self.medicine_ids = sorted(medicine_ids)
+
+
+def record_consultation(user, doctor, prescriptions, date=None, doctor_note=None):
+    """
+    Create the record and its prescriptions; returns ``(record, [PatientMedicine])``.
+    ``prescriptions`` are dicts with medicine_id and optional days_of_intake
+    and intake_note. Raises UnknownMedicineError (and writes nothing) if any
+    medicine id doesn't exist.
+    """
+    wanted = {p["medicine_id"] for p in prescriptions}
+    try:
+        with transaction.atomic():
+            medicines = Medicine.objects.only("pk", "medicine_name").in_bulk(wanted)
+            if missing := wanted - medicines.keys():
+                raise UnknownMedicineError(missing)
+            # the record's post_save refreshes the patient's timeline on commit,
+            # after the prescriptions below are in as well
+            record = PatientRecord.objects.create(
+                user=user, doctor=doctor, date=date or timezone.localdate(), doctor_note=doctor_note
+            )
+            rows = PatientMedicine.objects.bulk_create(
+                PatientMedicine(
+                    patient_record=record,
+                    medicine=medicines[p["medicine_id"]],
+                    days_of_intake=p.get("days_of_intake"),
+                    intake_note=p.get("intake_note"),
+                )
+                for p in prescriptions
+            )
+    except IntegrityError:
+        # a medicine was deleted after the check; the foreign key caught it
+        missing = wanted - set(Medicine.objects.filter(pk__in=wanted).values_list("pk", flat=True))
+        if not missing:
+            raise
+        raise UnknownMedicineError(missing)
+    return record, rows
@@ -0,0 +1,24 @@
+# serializers.py
+from rest_framework import serializers
+
+from Doctor.models import Doctor
+
+MAX_PRESCRIPTIONS = 100
+
+
+class PrescriptionSerializer(serializers.Serializer):
+    medicine_id = serializers.CharField(max_length=45)
+    days_of_intake = serializers.CharField(max_length=45, required=False, allow_blank=True, allow_null=True)
+    intake_note = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class ConsultationSerializer(serializers.Serializer):
+    """
+    Input of a completed consultation: the PatientRecord fields plus its
+    prescriptions. Medicine ids are checked in one query by
+    ``record_consultation``, not here.
+    """
+    doctor_id = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.only("pk"), source="doctor")
+    date = serializers.DateField(required=False, input_formats=["%Y-%m-%d"])
+    doctor_note = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    prescriptions = PrescriptionSerializer(many=True, required=False, max_length=MAX_PRESCRIPTIONS)
@@ -1,3 +1,242 @@
-from django.test import TestCase
+import io
+import json
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from Medicine.importer import run_import, start_import
+from Medicine.models import Medicine, MedicineInstance, PatientMedicine
+from MediCareBackend.testing import (
+    assert_uses_index, latest_migrations, make_doctor, migrate_to, prefer_index_plans,
+)
+from .models import PatientRecord, PatientTimeline
+from .timeline import build_visits, rebuild_timelines
+
+User = get_user_model()
+
+
+class PatientRecordQueryPlanTests(TestCase):
+    def setUp(self):
+        prefer_index_plans()
+        self.user = User.objects.create(username="patient")
+
+    def test_records_newest_first(self):
+        assert_uses_index(PatientRecord.objects.filter(user=self.user).order_by("-date"))
+
+    def test_prescriptions(self):
+        assert_uses_index(PatientMedicine.objects.filter(patient_record__user=self.user))
+
+
+class PatientTimelineTests(TestCase):
+    def setUp(self):
+        self.patient = User.objects.create(username="patient")
+        self.doctor = make_doctor(last_name="Rao")
+        self.paracetamol = Medicine.objects.create(medicine_id="M1", medicine_name="Paracetamol")
+        self.url = f"/records/patients/{self.patient.pk}/timeline/"
+
+    def visit(self, day, *medicines):
+        with self.captureOnCommitCallbacks(execute=True):
+            record = PatientRecord.objects.create(
+                user=self.patient, doctor=self.doctor, date=date(2026, 1, day), doctor_note=f"day {day}"
+            )
+            for medicine in medicines:
+                PatientMedicine.objects.create(patient_record=record, medicine=medicine, days_of_intake="3")
+        return record
+
+    def visits(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["visits"]
+
+    def test_newest_visit_first_with_prescriptions(self):
+        first = self.visit(1, self.paracetamol)
+        self.visit(5)
+        visits = self.visits()
+        self.assertEqual([v["date"] for v in visits], ["2026-01-05", "2026-01-01"])
+        self.assertEqual(visits[1]["record_id"], first.record_id)
+        self.assertEqual(visits[1]["doctor_name"], "Ann Rao")
+        self.assertEqual(
+            [(m["medicine_id"], m["medicine_name"], m["days_of_intake"]) for m in visits[1]["medicines"]],
+            [("M1", "Paracetamol", "3")],
+        )
+
+    def test_read_is_one_query_however_long_the_history(self):
+        for day in range(1, 21):
+            self.visit(day, self.paracetamol)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.visits()), 20)
+
+    def test_built_on_first_read(self):
+        PatientRecord.objects.create(user=self.patient, doctor=self.doctor, date=date(2026, 1, 1))
+        self.assertFalse(PatientTimeline.objects.exists())  # on_commit never ran
+        self.assertEqual(len(self.visits()), 1)
+        self.assertTrue(PatientTimeline.objects.filter(user=self.patient).exists())
+
+    def test_changes_are_picked_up(self):
+        record = self.visit(1, self.paracetamol)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paracetamol.medicine_name = "Paracetamol 650"
+            self.paracetamol.save()
+        self.assertEqual(self.visits()[0]["medicines"][0]["medicine_name"], "Paracetamol 650")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PatientMedicine.objects.get().delete()
+        self.assertEqual(self.visits()[0]["medicines"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delete()
+        self.assertEqual(self.visits(), [])
+
+    def test_renamed_by_a_catalogue_import(self):
+        self.visit(1, self.paracetamol)
+        job = start_import("catalogue.csv", "csv")
+        content = b"medicine_id,medicine_name\nM1,Paracetamol 650\nM2,Ibuprofen\n"
+        with self.captureOnCommitCallbacks(execute=True):
+            run_import(job, io.BytesIO(content))
+        self.assertEqual(self.visits()[0]["medicines"][0]["medicine_name"], "Paracetamol 650")
+
+    def test_matches_a_fresh_build(self):
+        other = User.objects.create(username="other")
+        self.visit(1, self.paracetamol)
+        self.visit(2, self.paracetamol)
+        with self.captureOnCommitCallbacks(execute=True):
+            PatientRecord.objects.create(user=other, doctor=self.doctor, date=date(2026, 1, 3))
+        stored = dict(PatientTimeline.objects.values_list("user_id", "visits"))
+        self.assertEqual(stored, build_visits([self.patient.pk, other.pk]))
+        # lock, patients, records, prescriptions and upsert, in a savepoint
+        with self.assertNumQueries(7):
+            self.assertEqual(rebuild_timelines([self.patient.pk, other.pk]), 2)
+
+    def test_unknown_patient(self):
+        self.assertEqual(self.client.get("/records/patients/999999/timeline/").status_code, 404)
+
+
+class ConsultationTests(TestCase):
+    def setUp(self):
+        self.patient = User.objects.create(username="patient")
+        self.doctor = make_doctor()
+        Medicine.objects.bulk_create([Medicine(medicine_id=f"M{n}", medicine_name=f"Medicine {n}") for n in range(15)])
+        self.url = f"/records/patients/{self.patient.pk}/consultations/"
+
+    def post(self, prescriptions, **fields):
+        payload = {"doctor_id": self.doctor.pk, "prescriptions": prescriptions, **fields}
+        return self.client.post(self.url, json.dumps(payload), content_type="application/json")
+
+    def test_record_and_prescriptions(self):
+        response = self.post(
+            [{"medicine_id": "M1", "days_of_intake": "5", "intake_note": "after food"}, {"medicine_id": "M2"}],
+            date="2026-01-02",
+            doctor_note="rest",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        record = PatientRecord.objects.get(record_id=body["record_id"])
+        self.assertEqual((record.user, record.date, record.doctor_note), (self.patient, date(2026, 1, 2), "rest"))
+        self.assertEqual(
+            [(p["medicine_id"], p["medicine_name"], p["days_of_intake"]) for p in body["prescriptions"]],
+            [("M1", "Medicine 1", "5"), ("M2", "Medicine 2", None)],
+        )
+        self.assertEqual(
+            sorted(PatientMedicine.objects.values_list("patient_medicine_id", flat=True)),
+            sorted(p["patient_medicine_id"] for p in body["prescriptions"]),
+        )
+
+    def test_queries_do_not_grow_with_prescriptions(self):
+        # patient, doctor, medicines, record and prescriptions in a savepoint
+        with self.assertNumQueries(7):
+            self.assertEqual(self.post([{"medicine_id": "M0"}]).status_code, 201)
+        with self.assertNumQueries(7):
+            self.assertEqual(self.post([{"medicine_id": f"M{n}"} for n in range(15)]).status_code, 201)
+
+        # and with the timeline rebuilt on commit
+        counts = []
+        for prescriptions in ([{"medicine_id": "M0"}], [{"medicine_id": f"M{n}"} for n in range(15)]):
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                self.post(prescriptions)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unknown_medicine_writes_nothing(self):
+        response = self.post([{"medicine_id": "M1"}, {"medicine_id": "nope"}, {"medicine_id": "gone"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"prescriptions": ["Unknown medicine_id: gone, nope"]})
+        self.assertFalse(PatientRecord.objects.exists())
+
+    def test_unknown_patient_or_doctor(self):
+        missing_patient = self.client.post(
+            "/records/patients/999999/consultations/",
+            json.dumps({"doctor_id": self.doctor.pk}),
+            content_type="application/json",
+        )
+        self.assertEqual(missing_patient.status_code, 404)
+        self.assertEqual(self.post([], doctor_id=999999).status_code, 400)
+
+
+class ConsultationRaceTests(TransactionTestCase):
+    def test_medicine_deleted_after_the_check(self):
+        patient = User.objects.create(username="patient")
+        doctor = make_doctor()
+        Medicine.objects.create(medicine_id="M1")
+        real_in_bulk = QuerySet.in_bulk
+
+        def in_bulk_before_a_delete(queryset, *args, **kwargs):
+            found = real_in_bulk(queryset, *args, **kwargs)
+            # what the check saw before another request deleted M2 and committed
+            found["M2"] = Medicine(medicine_id="M2")
+            return found
+
+        payload = {"doctor_id": doctor.pk, "prescriptions": [{"medicine_id": "M1"}, {"medicine_id": "M2"}]}
+        with mock.patch.object(QuerySet, "in_bulk", in_bulk_before_a_delete):
+            response = self.client.post(
+                f"/records/patients/{patient.pk}/consultations/", json.dumps(payload), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"prescriptions": ["Unknown medicine_id: M2"]})
+        self.assertFalse(PatientRecord.objects.exists())
+
+
+class IntegerIdMigrationTests(TransactionTestCase):
+    def tearDown(self):
+        migrate_to(*latest_migrations())
+
+    def test_existing_rows_get_ids_and_keep_their_prescriptions(self):
+        apps = migrate_to(
+            ("PatientRecord", "0004_patientrecord_compact_id"), ("Medicine", "0003_patientmedicine_compact_id")
+        )
+        user = apps.get_model("UserDetails", "CustomUser").objects.create(username="patient")
+        doctor = apps.get_model("Doctor", "Doctor").objects.create(
+            user=apps.get_model("UserDetails", "CustomUser").objects.create(username="dr-ann")
+        )
+        pharmacy = apps.get_model("Pharmacy", "Pharmacy").objects.create(
+            user_id=user.pk, location="Gandhipuram", contact_no="8000000001"
+        )
+        medicine = apps.get_model("Medicine", "Medicine").objects.create(medicine_id="M1", medicine_name="Paracetamol")
+        OldRecord = apps.get_model("PatientRecord", "PatientRecord")
+        older = OldRecord.objects.create(record_id="R2", user=user, doctor=doctor, date=date(2026, 1, 5))
+        newer = OldRecord.objects.create(record_id="R1", user=user, doctor=doctor, date=date(2026, 2, 5))
+        OldPatientMedicine = apps.get_model("Medicine", "PatientMedicine")
+        for n, record in enumerate([newer, older, newer]):
+            OldPatientMedicine.objects.create(
+                patient_medicine_id=f"P{n}", patient_record=record, medicine=medicine, days_of_intake="3"
+            )
+        apps.get_model("Medicine", "MedicineInstance").objects.create(
+            instance_id="I1", medicine=medicine, pharmacy=pharmacy
+        )
+
+        migrate_to(*latest_migrations())
+
+        older, newer = PatientRecord.objects.order_by("date")
+        self.assertEqual((older.record_id, newer.record_id), ("R2", "R1"))
+        # ids follow the visit dates the rows were assigned in
+        self.assertLess(older.pk, newer.pk)
+        self.assertEqual(
+            {pm.patient_medicine_id: pm.patient_record_id for pm in PatientMedicine.objects.all()},
+            {"P0": newer.pk, "P1": older.pk, "P2": newer.pk},
+        )
+        self.assertTrue(all(pm.pk for pm in PatientMedicine.objects.all()))
+        self.assertTrue(MedicineInstance.objects.get(instance_id="I1").pk)
@@ -0,0 +1,145 @@
+# timeline.py
+"""
+The PatientTimeline read model: a patient's full history in one row.
+
+A visit is a PatientRecord with its doctor and prescriptions, all
+denormalised:
+    {"record_id", "date", "doctor_id", "doctor_name", "doctor_note",
+     "medicines": [{"patient_medicine_id", "medicine_id", "medicine_name",
+                    "days_of_intake", "intake_note"}]}
+
+Saving or deleting a PatientRecord or a PatientMedicine rebuilds that
+patient's timeline once the transaction commits. Renaming a Medicine
+rebuilds the timelines that prescribe it. A rebuild costs two queries for
+any number of patients. Doctor renames and bulk writes skip these signals:
+the catalogue importer calls ``refresh_timelines`` for the medicines it
+renames, and ``manage.py rebuild_timelines`` refreshes everything else.
+"""
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from Medicine.models import Medicine, PatientMedicine
+from .models import PatientRecord, PatientTimeline
+
+REBUILD_CHUNK_SIZE = 500
+
+
+def build_visits(user_ids):
+    """``{user_id: [visit, ...]}`` (newest first) for every id in ``user_ids``, in two queries."""
+    visits, by_record = {user_id: [] for user_id in user_ids}, {}
+    records = (
+        PatientRecord.objects.filter(user_id__in=user_ids)
+        .select_related("doctor__user")
+        .order_by("user_id", "-date", "id")
+    )
+    for record in records:
+        doctor_user = record.doctor.user
+        visit = {
+            "record_id": record.record_id,
+            "date": record.date.isoformat(),
+            "doctor_id": record.doctor_id,
+            "doctor_name": doctor_user.get_full_name() or doctor_user.username,
+            "doctor_note": record.doctor_note,
+            "medicines": [],
+        }
+        visits[record.user_id].append(visit)
+        by_record[record.pk] = visit
+
+    prescriptions = (
+        PatientMedicine.objects.filter(patient_record__user_id__in=user_ids)
+        .select_related("medicine")
+        .order_by("id")
+    )
+    for prescription in prescriptions:
+        visit = by_record.get(prescription.patient_record_id)
+        if visit is None:
+            # its record was committed after the records query; that commit
+            # schedules its own rebuild
+            continue
+        visit["medicines"].append({
+            "patient_medicine_id": prescription.patient_medicine_id,
+            "medicine_id": prescription.medicine_id,
+            "medicine_name": prescription.medicine.medicine_name,
+            "days_of_intake": prescription.days_of_intake,
+            "intake_note": prescription.intake_note,
+        })
+    return visits
+
+
+def rebuild_timelines(user_ids, chunk_size=REBUILD_CHUNK_SIZE):
+    """Rewrite the timelines of ``user_ids`` now. Returns how many were written."""
+    User = get_user_model()
+    user_ids, written = iter(sorted(set(user_ids))), 0
+    while chunk := list(islice(user_ids, chunk_size)):
+        with transaction.atomic():
+            # lock before reading, so a slower rebuild can't overwrite a newer one
+            list(PatientTimeline.objects.select_for_update().filter(pk__in=chunk).values_list("pk"))
+            # the patient may have been deleted since the change was scheduled
+            chunk = list(User.objects.filter(pk__in=chunk).values_list("pk", flat=True))
+            timelines = [
+                PatientTimeline(user_id=user_id, visits=visits)
+                for user_id, visits in build_visits(chunk).items()
+            ]
+            PatientTimeline.objects.bulk_create(
+                timelines,
+                update_conflicts=True,
+                unique_fields=["user"],
+                update_fields=["visits", "updated_at"],
+            )
+        written += len(timelines)
+    return written
+
+
+def refresh_timelines(user_ids):
+    """Rebuild the timelines of ``user_ids`` once the current transaction commits."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        transaction.on_commit(lambda: rebuild_timelines(user_ids))
+
+
+def get_visits(user_id):
+    """The patient's visits from their timeline, building it on first use."""
+    visits = PatientTimeline.objects.filter(user_id=user_id).values_list("visits", flat=True).first()
+    if visits is None:
+        rebuild_timelines([user_id])
+        visits = PatientTimeline.objects.filter(user_id=user_id).values_list("visits", flat=True).first()
+    return visits
+
+
+# -----------------------
+# Keep timelines current
+# -----------------------
+@receiver([post_save, post_delete], sender=PatientRecord)
+def _record_changed(sender, instance, **kwargs):
+    refresh_timelines([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=PatientMedicine)
+def _prescription_changed(sender, instance, **kwargs):
+    # read now: once committed, a cascading delete has removed the record too
+    user_id = (
+        PatientRecord.objects.filter(pk=instance.patient_record_id).values_list("user_id", flat=True).first()
+    )
+    refresh_timelines([user_id])
+
+
+@receiver(pre_save, sender=Medicine)
+def _remember_medicine_name(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._stored_name = (
+            Medicine.objects.filter(pk=instance.pk).values_list("medicine_name", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Medicine)
+def _medicine_renamed(sender, instance, created, **kwargs):
+    if not created and getattr(instance, "_stored_name", instance.medicine_name) != instance.medicine_name:
+        refresh_timelines(
+            PatientRecord.objects.filter(patientmedicine__medicine=instance)
+            .values_list("user_id", flat=True).distinct()
+        )
@@ -0,0 +1,8 @@
+# urls.py
+from django.urls import path
+from .views import ConsultationAPIView, PatientTimelineAPIView
+
+urlpatterns = [
+    path("patients/<int:user_id>/timeline/", PatientTimelineAPIView.as_view(), name="patient-timeline"),
+    path("patients/<int:user_id>/consultations/", ConsultationAPIView.as_view(), name="patient-consultations"),
+]
@@ -1,3 +1,77 @@
-from django.shortcuts import render
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .prescriptions import UnknownMedicineError, record_consultation
+from .serializers import ConsultationSerializer
+from .timeline import get_visits
+
+User = get_user_model()
+
+
+class PatientTimelineAPIView(APIView):
+    """
+    GET /records/patients/<user_id>/timeline/
+    The patient's whole medical history, newest visit first, with each
+    visit's doctor and prescriptions. Read from the patient's PatientTimeline
+    row, so the cost does not grow with the number of visits.
+    """
+    def get(self, request, user_id):
+        visits = get_visits(user_id)
+        if visits is None:
+            get_object_or_404(User, pk=user_id)  # 404 for unknown patients
+        return Response({"user_id": user_id, "visits": visits}, status=status.HTTP_200_OK)
+
+
+class ConsultationAPIView(APIView):
+    """
+    POST /records/patients/<user_id>/consultations/
+    {"doctor_id": 3, "date": "YYYY-MM-DD" (default today), "doctor_note": "...",
+     "prescriptions": [{"medicine_id": "...", "days_of_intake": "...", "intake_note": "..."}, ...]}
+
+    Records a finished consultation: the PatientRecord and all its
+    prescriptions in one transaction, with server-generated ids. The query
+    count is the same for 1 or 15 prescriptions.
+    """
+    def post(self, request, user_id):
+        patient = get_object_or_404(User.objects.only("pk"), pk=user_id)
+        serializer = ConsultationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        try:
+            record, prescriptions = record_consultation(
+                patient,
+                data["doctor"],
+                data.get("prescriptions", []),
+                date=data.get("date"),
+                doctor_note=data.get("doctor_note"),
+            )
+        except UnknownMedicineError as exc:
+            return Response(
+                {"prescriptions": [f"Unknown medicine_id: {', '.join(exc.medicine_ids)}"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {
+                "record_id": record.record_id,
+                "user_id": patient.pk,
+                "doctor_id": record.doctor_id,
+                "date": record.date.isoformat(),
+                "doctor_note": record.doctor_note,
+                "prescriptions": [
+                    {
+                        "patient_medicine_id": p.patient_medicine_id,
+                        "medicine_id": p.medicine_id,
+                        "medicine_name": p.medicine.medicine_name,
+                        "days_of_intake": p.days_of_intake,
+                        "intake_note": p.intake_note,
+                    }
+                    for p in prescriptions
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
@@ -0,0 +1,70 @@
+# geo.py
+"""
+Nearest-pharmacy lookups without a GIS server.
+
+Pharmacies with coordinates are bucketed into a grid of GRID_DEGREES cells
+(Pharmacy.grid_lat / grid_lng, indexed together). A k-nearest query reads
+a square of cells around the point, doubling it until the k-th closest
+stockist is nearer than anything outside the square could be, and sorts
+by great-circle distance. Changing GRID_DEGREES means re-saving every
+pharmacy so the grid columns are recomputed.
+"""
+import math
+
+from django.db.models import OuterRef, Subquery
+
+GRID_DEGREES = 0.01  # about 1.1 km
+EARTH_RADIUS_KM = 6371.0088
+
+
+def grid_cell(lat, lng):
+    return math.floor(lat / GRID_DEGREES), math.floor(lng / GRID_DEGREES)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def _reach_km(lat, rings):
+    """
+    How far from a point in the centre cell the square ``rings`` cells out in
+    every direction is guaranteed to extend: anything outside it is further.
+    """
+    span = math.radians(rings * GRID_DEGREES)
+    north_south = EARTH_RADIUS_KM * span
+    # distance to the nearest point of the meridian ``span`` away
+    east_west = EARTH_RADIUS_KM * math.asin(min(1.0, math.cos(math.radians(lat)) * math.sin(span)))
+    return min(north_south, east_west)
+
+
+def nearest_stockists(pharmacies, medicine, lat, lng, k=10, max_km=50):
+    """
+    The ``k`` pharmacies of the ``pharmacies`` queryset nearest to (lat, lng),
+    within ``max_km``, that stock ``medicine``: a list of
+    ``(pharmacy, distance_km)``, nearest first. Each pharmacy has
+    ``instance_id`` set to one of its MedicineInstance ids.
+    """
+    from Medicine.models import MedicineInstance
+
+    stock = MedicineInstance.objects.filter(medicine=medicine, pharmacy=OuterRef("pk"))
+    row, col = grid_cell(lat, lng)
+    rings = 1
+    while True:
+        candidates = (
+            pharmacies
+            .filter(grid_lat__range=(row - rings, row + rings), grid_lng__range=(col - rings, col + rings))
+            .annotate(instance_id=Subquery(stock.values("instance_id")[:1]))
+            .filter(instance_id__isnull=False)
+        )
+        found = sorted(
+            ((p, haversine_km(lat, lng, p.latitude, p.longitude)) for p in candidates),
+            key=lambda pair: (pair[1], pair[0].pk),
+        )
+        reach = _reach_km(lat, rings)
+        settled = [pair for pair in found if pair[1] <= min(reach, max_km)]
+        if len(settled) >= k or reach >= max_km or rings * GRID_DEGREES >= 180:
+            return [pair for pair in found if pair[1] <= max_km][:k]
+        rings *= 2
@@ -0,0 +1,173 @@
+# inventory.py
+"""
+Batch add/remove of MedicineInstance rows for pharmacy stock syncs.
+
+Operations are applied in chunks of INVENTORY_CHUNK_SIZE, one transaction
+per chunk. Each chunk looks up its medicines, pharmacies and existing
+instances with one ``in_bulk`` per table, then writes with
+bulk_create / bulk_update / a single delete. A failing chunk does not
+undo the chunks committed before it.
+
+An operation is a dict:
+    {"op": "add", "instance_id": "...", "medicine_id": "...", "pharmacy_id": 3}
+    {"op": "remove", "instance_id": "..."}
+"add" creates the instance, or repoints an existing one. Within a batch,
+later operations on the same instance_id see the effect of earlier ones.
+"""
+import json
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+
+from Medicine.cache import bump_versions
+from Medicine.models import Medicine, MedicineInstance
+from .models import Pharmacy
+
+INVENTORY_CHUNK_SIZE = 1000
+OPS = ("add", "remove")
+
+
+RECORD_SEPARATOR = b"\x1e"
+
+
+def _parse_records(records):
+    for record in records:
+        record = record.strip()
+        if not record:
+            continue
+        try:
+            yield json.loads(record)
+        except ValueError:
+            yield ValueError("Invalid JSON.")
+
+
+def parse_ndjson(lines):
+    """Operations from an iterable of NDJSON lines (bytes or str); blank lines are skipped."""
+    yield from _parse_records(lines)
+
+
+def parse_json_seq(chunks):
+    """
+    Operations from an application/json-seq body (RFC 7464), given as an
+    iterable of byte strings split anywhere: each record is the RS byte,
+    a JSON text (which may span lines), then a newline.
+    """
+    pending = b""
+    for chunk in chunks:
+        *records, pending = (pending + chunk).split(RECORD_SEPARATOR)
+        yield from _parse_records(records)
+    yield from _parse_records([pending])
+
+
+def _validate(op, default_pharmacy_id):
+    if isinstance(op, Exception):
+        return str(op)
+    if not isinstance(op, dict):
+        return "Each operation must be a JSON object."
+    if op.get("op") not in OPS:
+        return "'op' must be 'add' or 'remove'."
+    if not op.get("instance_id"):
+        return "instance_id is required."
+    if op["op"] == "add":
+        if default_pharmacy_id is not None:
+            op.setdefault("pharmacy_id", default_pharmacy_id)
+        if not op.get("medicine_id") or op.get("pharmacy_id") in (None, ""):
+            return "medicine_id and pharmacy_id are required."
+    return None
+
+
+def apply_inventory(ops, default_pharmacy_id=None, chunk_size=INVENTORY_CHUNK_SIZE):
+    """
+    Apply ``ops`` (any iterable, consumed lazily) and yield one result per
+    operation, in order:
+        {"row": 1, "instance_id": ..., "status": "created" | "updated" | "unchanged" | "removed" | "error"[, "error": ...]}
+    ``default_pharmacy_id`` fills in "add" operations that leave pharmacy_id out.
+    """
+    rows = enumerate(ops, start=1)
+    while chunk := list(islice(rows, chunk_size)):
+        yield from _apply_chunk(chunk, default_pharmacy_id)
+
+
+def _apply_chunk(chunk, default_pharmacy_id):
+    results, valid = [], []
+    for row, op in chunk:
+        error = _validate(op, default_pharmacy_id)
+        instance_id = op.get("instance_id") if isinstance(op, dict) else None
+        result = {"row": row, "instance_id": instance_id, "status": "error"}
+        if error:
+            result["error"] = error
+        else:
+            valid.append((op, result))
+        results.append(result)
+
+    def ids(key):
+        return {str(op[key]) for op, _ in valid if op["op"] == "add"}
+
+    try:
+        with transaction.atomic():
+            medicines = Medicine.objects.only("pk").in_bulk(ids("medicine_id"))
+            pharmacy_ids = {int(pk) for pk in ids("pharmacy_id") if pk.isdigit()}
+            pharmacies = Pharmacy.objects.only("pk").in_bulk(pharmacy_ids)
+            existing = MedicineInstance.objects.only("pk", "instance_id", "medicine_id", "pharmacy_id").in_bulk(
+                {str(op["instance_id"]) for op, _ in valid}, field_name="instance_id"
+            )
+
+            # replay the chunk against the current rows: instance_id -> (medicine_id, pharmacy_id) or None
+            before = {instance_id: (inst.medicine_id, inst.pharmacy_id) for instance_id, inst in existing.items()}
+            state = dict(before)
+            for op, result in valid:
+                instance_id = str(op["instance_id"])
+                current = state.get(instance_id)
+                if op["op"] == "remove":
+                    if current is None:
+                        result["error"] = "Medicine instance not found."
+                        continue
+                    state[instance_id] = None
+                    result["status"] = "removed"
+                    continue
+
+                medicine_id, pharmacy_id = str(op["medicine_id"]), str(op["pharmacy_id"])
+                if medicine_id not in medicines or not pharmacy_id.isdigit() or int(pharmacy_id) not in pharmacies:
+                    result["error"] = "Invalid medicine_id or pharmacy_id."
+                    continue
+                wanted = (medicine_id, int(pharmacy_id))
+                result["status"] = "created" if current is None else ("unchanged" if current == wanted else "updated")
+                state[instance_id] = wanted
+
+            to_delete = [instance_id for instance_id in existing if state[instance_id] is None]
+            to_update, to_create = [], []
+            for instance_id, wanted in state.items():
+                if wanted is None:
+                    continue
+                medicine_id, pharmacy_id = wanted
+                if instance_id not in existing:
+                    to_create.append(
+                        MedicineInstance(instance_id=instance_id, medicine_id=medicine_id, pharmacy_id=pharmacy_id)
+                    )
+                elif wanted != before[instance_id]:
+                    instance = existing[instance_id]
+                    instance.medicine_id, instance.pharmacy_id = medicine_id, pharmacy_id
+                    to_update.append(instance)
+
+            # bulk writes skip the signals that invalidate cached medicine details
+            bump_versions(
+                [before[instance_id][0] for instance_id in to_delete]
+                + [before[inst.instance_id][0] for inst in to_update]
+                + [inst.medicine_id for inst in to_update + to_create]
+            )
+            if to_delete:
+                MedicineInstance.objects.filter(instance_id__in=to_delete).delete()
+            if to_update:
+                MedicineInstance.objects.bulk_update(to_update, ["medicine", "pharmacy"])
+            if to_create:
+                MedicineInstance.objects.bulk_create(to_create)
+    except DatabaseError as exc:
+        # e.g. a concurrent sync inserted the same instance_id: report the chunk, keep going
+        for _, result in valid:
+            result["status"] = "error"
+            result["error"] = f"Chunk not applied: {exc}"
+
+    for result in results:
+        if result["status"] != "error":
+            result.pop("error", None)
+    return results
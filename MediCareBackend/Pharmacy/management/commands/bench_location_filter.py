@@ -0,0 +1,86 @@
+# bench_location_filter.py
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from MediCareBackend.benchmarking import benchmark_database, percentile
+from MediCareBackend.prefetch import optimize_queryset
+from Medicine.models import Medicine, MedicineInstance
+from Medicine.serializers import MedicineInstanceSerializer
+from Pharmacy.models import Pharmacy, PharmacyLocationSuffix
+
+User = get_user_model()
+
+AREAS = ["Gandhipuram", "RS Puram", "Peelamedu", "Saibaba Colony", "Ukkadam", "Singanallur",
+         "Town Hall", "Saravanampatti", "Vadavalli", "Kuniyamuthur", "Ramanathapuram", "Race Course",
+         "Thudiyalur", "Kovaipudur", "Sulur", "Podanur", "Ganapathy", "Sitra", "Hopes College", "Avinashi Road"]
+CITIES = ["Coimbatore", "Tiruppur", "Erode", "Pollachi"]
+
+
+def _python_filter(medicine, location):
+    """The previous path: load every instance and match pharmacy.location in Python."""
+    instances = optimize_queryset(MedicineInstance.objects.filter(medicine=medicine), MedicineInstanceSerializer)
+    return [inst for inst in instances if location.lower() in str(inst.pharmacy.location or "").lower()]
+
+
+def _sql_filter(medicine, location):
+    instances = MedicineInstance.objects.filter(medicine=medicine, pharmacy__in=Pharmacy.objects.in_area(location))
+    return list(optimize_queryset(instances, MedicineInstanceSerializer))
+
+
+PATHS = {"python": _python_filter, "sql": _sql_filter}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare filtering a medicine's stockists by pharmacy location in Python "
+        "(the old SearchMedicineByNameAPIView path) with the indexed SQL filter, "
+        "over a synthetic set of pharmacies in a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pharmacies", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=20, help="lookups per location and path")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        count = options["pharmacies"]
+
+        with benchmark_database():
+            owner = User.objects.create(username="bench-pharmacist")
+            pharmacies = Pharmacy.objects.bulk_create(
+                Pharmacy(
+                    user=owner,
+                    pharmacy_name=f"Pharmacy {n}",
+                    location=f"{rng.choice(AREAS)}, {rng.choice(CITIES)}",
+                    contact_no=f"80000{n:05d}",
+                )
+                for n in range(count)
+            )
+            # bulk_create skips save(), so index the locations explicitly
+            PharmacyLocationSuffix.rebuild(pharmacies)
+
+            medicine = Medicine.objects.create(medicine_id="bench-med", medicine_name="Paracetamol")
+            MedicineInstance.objects.bulk_create(
+                MedicineInstance(instance_id=f"bench-{p.pk}", medicine=medicine, pharmacy=p) for p in pharmacies
+            )
+
+            for location in ["coimbatore", "gandhipuram", "puram", "sulur, pollachi", "nowhere"]:
+                expected = None
+                for name, path in PATHS.items():
+                    latencies = []
+                    for _ in range(options["repeat"]):
+                        t0 = time.perf_counter()
+                        found = path(medicine, location)
+                        latencies.append(time.perf_counter() - t0)
+                    ids = sorted(inst.pk for inst in found)
+                    same = "" if expected is None or ids == expected else " | RESULTS DIFFER"
+                    expected = ids if expected is None else expected
+                    self.stdout.write(
+                        f"{location!r:>18} {name:>6}: {len(ids):>5} stockists | "
+                        f"p50 {percentile(latencies, 50) * 1000:.1f}ms "
+                        f"p99 {percentile(latencies, 99) * 1000:.1f}ms{same}"
+                    )
@@ -0,0 +1,91 @@
+# bench_nearest_pharmacy.py
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from MediCareBackend.benchmarking import benchmark_database, percentile
+from Medicine.models import Medicine, MedicineInstance
+from Pharmacy.geo import haversine_km, nearest_stockists
+from Pharmacy.models import Pharmacy, PharmacyLocationSuffix
+
+User = get_user_model()
+
+# a city-sized box (around Coimbatore), denser towards the centre
+CENTRE = (11.0168, 76.9558)
+SPREAD_DEGREES = 0.25
+
+
+def _scan(medicine, lat, lng, k, max_km):
+    """Baseline: distance to every stockist, computed in Python."""
+    stockists = Pharmacy.objects.filter(medicineinstance__medicine=medicine, latitude__isnull=False).distinct()
+    found = sorted(
+        ((p, haversine_km(lat, lng, p.latitude, p.longitude)) for p in stockists),
+        key=lambda pair: (pair[1], pair[0].pk),
+    )
+    return [pair for pair in found if pair[1] <= max_km][:k]
+
+
+def _grid(medicine, lat, lng, k, max_km):
+    return nearest_stockists(Pharmacy.objects.all(), medicine, lat, lng, k=k, max_km=max_km)
+
+
+PATHS = {"scan": _scan, "grid": _grid}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load synthetic pharmacies with coordinates into a throwaway database and "
+        "compare k-nearest stockist lookups through the grid index with a full "
+        "distance scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pharmacies", type=int, default=50000)
+        parser.add_argument("--stocked", type=float, default=0.3, help="share of pharmacies stocking the medicine")
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("-k", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        k = options["k"]
+
+        def point():
+            return (rng.gauss(CENTRE[0], SPREAD_DEGREES / 2), rng.gauss(CENTRE[1], SPREAD_DEGREES / 2))
+
+        with benchmark_database():
+            owner = User.objects.create(username="bench-pharmacist")
+            pharmacies = []
+            for n in range(options["pharmacies"]):
+                lat, lng = point()
+                pharmacy = Pharmacy(user=owner, location="Coimbatore", contact_no=f"80000{n:06d}",
+                                    latitude=lat, longitude=lng)
+                pharmacy.update_grid()  # bulk_create skips save()
+                pharmacies.append(pharmacy)
+            pharmacies = Pharmacy.objects.bulk_create(pharmacies, batch_size=2000)
+            PharmacyLocationSuffix.rebuild(pharmacies)
+
+            medicine = Medicine.objects.create(medicine_id="bench-med", medicine_name="Paracetamol")
+            MedicineInstance.objects.bulk_create(
+                (MedicineInstance(instance_id=f"bench-{p.pk}", medicine=medicine, pharmacy=p)
+                 for p in pharmacies if rng.random() < options["stocked"]),
+                batch_size=2000,
+            )
+
+            points = [point() for _ in range(options["queries"])]
+            results = {}
+            for name, path in PATHS.items():
+                latencies, results[name] = [], []
+                for lat, lng in points:
+                    t0 = time.perf_counter()
+                    found = path(medicine, lat, lng, k, 50)
+                    latencies.append(time.perf_counter() - t0)
+                    results[name].append([p.pk for p, _ in found])
+                self.stdout.write(
+                    f"{name:>5}: p50 {percentile(latencies, 50) * 1000:.1f}ms "
+                    f"p99 {percentile(latencies, 99) * 1000:.1f}ms over {len(points)} lookups"
+                )
+            agree = sum(a == b for a, b in zip(results["scan"], results["grid"]))
+            self.stdout.write(f"grid and scan agree on {agree}/{len(points)} lookups")
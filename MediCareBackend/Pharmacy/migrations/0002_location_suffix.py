@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:33
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def location_suffixes(raw_location):
+    # Pharmacy.utils.location_suffixes as of this migration
+    key = re.sub(r"[\W_]", "", raw_location.casefold()) if raw_location else ""
+    return [key[i:] for i in range(len(key))]
+
+
+def index_existing_locations(apps, schema_editor):
+    Pharmacy = apps.get_model('Pharmacy', 'Pharmacy')
+    PharmacyLocationSuffix = apps.get_model('Pharmacy', 'PharmacyLocationSuffix')
+    PharmacyLocationSuffix.objects.bulk_create(
+        (
+            PharmacyLocationSuffix(pharmacy_id=pharmacy_id, suffix=suffix)
+            for pharmacy_id, location in Pharmacy.objects.values_list('pharmacy_id', 'location').iterator()
+            for suffix in set(location_suffixes(location))
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pharmacy', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PharmacyLocationSuffix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('suffix', models.CharField(max_length=45)),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_suffixes', to='Pharmacy.pharmacy')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['suffix', 'pharmacy'], name='pharmacy_loc_suffix_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pharmacy', '0002_location_suffix'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pharmacy',
+            name='grid_lat',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='pharmacy',
+            name='grid_lng',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='pharmacy',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pharmacy',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='pharmacy',
+            index=models.Index(fields=['grid_lat', 'grid_lng'], name='pharmacy_grid_idx'),
+        ),
+    ]
@@ -1,6 +1,24 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
+from .geo import grid_cell
+from .utils import location_suffixes, normalize_location
+
+
+class PharmacyQuerySet(models.QuerySet):
+    def in_area(self, location):
+        """
+        Pharmacies whose location contains ``location``, ignoring case, spaces
+        and punctuation. Answered from the PharmacyLocationSuffix index.
+        """
+        key = normalize_location(location)
+        if not key:
+            return self
+        # suffixes starting with ``key``: [key, key with its last character bumped)
+        upper = key[:-1] + chr(ord(key[-1]) + 1)
+        matching = PharmacyLocationSuffix.objects.filter(suffix__gte=key, suffix__lt=upper)
+        return self.filter(pk__in=matching.values("pharmacy_id"))
+
 
 class Pharmacy(models.Model):
     pharmacy_id = models.AutoField(primary_key=True)
@@ -9,9 +27,77 @@ class Pharmacy(models.Model):
     location = models.CharField(max_length=45)
     created_on = models.DateField(auto_now_add=True)
     contact_no = models.CharField(max_length=45, unique=True)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    # grid bucket of (latitude, longitude) for nearest-pharmacy lookups (see Pharmacy/geo.py)
+    grid_lat = models.IntegerField(blank=True, null=True, editable=False)
+    grid_lng = models.IntegerField(blank=True, null=True, editable=False)
+
+    objects = PharmacyQuerySet.as_manager()
 
     class Meta:
         unique_together = ('pharmacy_id', 'user')
+        indexes = [models.Index(fields=["grid_lat", "grid_lng"], name="pharmacy_grid_idx")]
 
     def __str__(self):
-        return self.pharmacy_name or self.pharmacy_id
\ No newline at end of file
+        return self.pharmacy_name or self.pharmacy_id
+
+    def update_grid(self):
+        """Recompute the grid bucket from latitude/longitude (save() does this)."""
+        if self.latitude is None or self.longitude is None:
+            self.grid_lat = self.grid_lng = None
+        else:
+            self.grid_lat, self.grid_lng = grid_cell(self.latitude, self.longitude)
+
+    # the location the PharmacyLocationSuffix rows were built from; None if unknown
+    _indexed_location = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "location" in field_names:
+            instance._indexed_location = instance.location
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.update_grid()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = update_fields = {*update_fields, "grid_lat", "grid_lng"}
+        reindex = (update_fields is None or "location" in update_fields) and (
+            self._indexed_location is None
+            or normalize_location(self.location) != normalize_location(self._indexed_location)
+        )
+        if reindex:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                PharmacyLocationSuffix.rebuild([self])
+        else:
+            super().save(*args, **kwargs)
+        self._indexed_location = self.location
+
+
+class PharmacyLocationSuffix(models.Model):
+    """
+    Suffixes of a pharmacy's normalized location (see Pharmacy/utils.py),
+    so "pharmacies in <area>" is an indexed range read instead of a scan.
+    Kept in sync by Pharmacy.save(); bulk writes call rebuild() themselves.
+    """
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name="location_suffixes")
+    suffix = models.CharField(max_length=45)
+
+    class Meta:
+        indexes = [models.Index(fields=["suffix", "pharmacy"], name="pharmacy_loc_suffix_idx")]
+
+    def __str__(self):
+        return f"{self.suffix} -> {self.pharmacy_id}"
+
+    @classmethod
+    def rebuild(cls, pharmacies):
+        pharmacies = list(pharmacies)
+        with transaction.atomic():
+            cls.objects.filter(pharmacy__in=[p.pk for p in pharmacies]).delete()
+            cls.objects.bulk_create(
+                (cls(pharmacy_id=p.pk, suffix=suffix) for p in pharmacies for suffix in set(location_suffixes(p.location))),
+                batch_size=2000,
+            )
\ No newline at end of file
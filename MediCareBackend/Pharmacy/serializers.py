@@ -3,4 +3,4 @@ from rest_framework import serializers
 class PharmacySerializer(serializers.ModelSerializer):
     class Meta:
         model = Pharmacy
-        fields = ["pharmacy_id", "pharmacy_name", "location", "contact_no"]
\ No newline at end of file
+        fields = ["pharmacy_id", "pharmacy_name", "location", "contact_no", "latitude", "longitude"]
\ No newline at end of file
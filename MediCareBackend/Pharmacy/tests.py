@@ -1,3 +1,241 @@
-from django.test import TestCase
+import json
+import random
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError
+from django.test import TestCase, TransactionTestCase
+
+from MediCareBackend.testing import latest_migrations, make_pharmacy, migrate_to
+from Medicine.models import Medicine, MedicineInstance
+from .geo import haversine_km, nearest_stockists
+from .inventory import apply_inventory, parse_json_seq, parse_ndjson
+from .models import Pharmacy, PharmacyLocationSuffix
+from .utils import location_suffixes, normalize_location
+
+
+class LocationSearchTests(TestCase):
+    def setUp(self):
+        self.rs_puram = make_pharmacy(1, "R.S. Puram, Coimbatore")
+        self.gandhipuram = make_pharmacy(2, "Gandhipuram")
+        self.baner = make_pharmacy(3, "Baner Road, Pune")
+
+    def in_area(self, location):
+        return set(Pharmacy.objects.in_area(location).values_list("pk", flat=True))
+
+    def test_normalize(self):
+        self.assertEqual(normalize_location("R.S. Puram"), "rspuram")
+        self.assertEqual(normalize_location(None), "")
+        self.assertEqual(location_suffixes("Ab-c"), ["abc", "bc", "c"])
+
+    def test_matches_substrings_ignoring_case_and_punctuation(self):
+        self.assertEqual(self.in_area("rs puram"), {self.rs_puram.pk})
+        self.assertEqual(self.in_area("PURAM"), {self.rs_puram.pk, self.gandhipuram.pk})
+        self.assertEqual(self.in_area("road pune"), {self.baner.pk})
+        self.assertEqual(self.in_area("chennai"), set())
+        self.assertEqual(self.in_area(" ,. "), {self.rs_puram.pk, self.gandhipuram.pk, self.baner.pk})
+
+    def test_matches_the_substring_scan(self):
+        for term in ("pur", "u", "ramc", "baner", "zzz"):
+            expected = {
+                p.pk for p in Pharmacy.objects.all() if normalize_location(term) in normalize_location(p.location)
+            }
+            self.assertEqual(self.in_area(term), expected, term)
+
+    def test_moving_a_pharmacy_reindexes_it(self):
+        self.baner.location = "Aundh, Pune"
+        self.baner.save()
+        self.assertEqual(self.in_area("baner"), set())
+        self.assertEqual(self.in_area("aundh"), {self.baner.pk})
+
+        pharmacy = Pharmacy.objects.get(pk=self.gandhipuram.pk)
+        pharmacy.location = "Peelamedu"
+        pharmacy.save(update_fields=["location"])
+        self.assertEqual(self.in_area("peelamedu"), {self.gandhipuram.pk})
+
+    def test_other_saves_leave_the_suffixes_alone(self):
+        pharmacy = Pharmacy.objects.get(pk=self.baner.pk)
+        pharmacy.pharmacy_name = "Baner Medicals"
+        # the UPDATE, and the medicine detail cache looking up what it stocks
+        with self.assertNumQueries(2):
+            pharmacy.save()
+        pharmacy.location = "baner road pune"  # same normalized location
+        with self.assertNumQueries(2):
+            pharmacy.save()
+        with self.assertNumQueries(2):
+            pharmacy.save(update_fields=["pharmacy_name"])
+        self.assertEqual(self.in_area("banerroad"), {self.baner.pk})
+        self.assertEqual(PharmacyLocationSuffix.objects.filter(pharmacy=self.baner).count(), len("banerroadpune"))
+
+
+class NearestStockistTests(TestCase):
+    def setUp(self):
+        self.medicine = Medicine.objects.create(medicine_id="M1", medicine_name="Paracetamol")
+        other = Medicine.objects.create(medicine_id="M2", medicine_name="Ibuprofen")
+        rng = random.Random(7)
+        for n in range(40):
+            # scattered over roughly 60 km around Coimbatore
+            pharmacy = make_pharmacy(
+                n, f"Area {n}", latitude=11.0 + rng.uniform(-0.3, 0.3), longitude=77.0 + rng.uniform(-0.3, 0.3)
+            )
+            medicine = self.medicine if n % 4 else other
+            MedicineInstance.objects.create(instance_id=f"I{n}", medicine=medicine, pharmacy=pharmacy)
+        make_pharmacy(99, "Nowhere")  # no coordinates
+
+    def brute_force(self, lat, lng, k, max_km):
+        found = sorted(
+            (haversine_km(lat, lng, p.latitude, p.longitude), p.pk)
+            for p in Pharmacy.objects.filter(medicineinstance__medicine=self.medicine, latitude__isnull=False)
+        )
+        return [pk for distance, pk in found if distance <= max_km][:k]
+
+    def test_matches_brute_force(self):
+        for lat, lng, k, max_km in [(11.0, 77.0, 5, 50), (11.2, 76.8, 10, 50), (11.0, 77.0, 3, 2), (12.0, 78.0, 5, 500)]:
+            found = nearest_stockists(Pharmacy.objects.all(), self.medicine, lat, lng, k=k, max_km=max_km)
+            self.assertEqual([p.pk for p, _ in found], self.brute_force(lat, lng, k, max_km), (lat, lng, k, max_km))
+            self.assertEqual([d for _, d in found], sorted(d for _, d in found))
+
+    def test_stockists_carry_their_instance(self):
+        pharmacy, distance = nearest_stockists(Pharmacy.objects.all(), self.medicine, 11.0, 77.0, k=1)[0]
+        self.assertEqual(
+            pharmacy.instance_id, MedicineInstance.objects.get(pharmacy=pharmacy, medicine=self.medicine).instance_id
+        )
+        self.assertGreater(distance, 0)
+
+    def test_grid_follows_coordinates(self):
+        pharmacy = make_pharmacy(98, "Moving", latitude=11.0, longitude=77.0)
+        pharmacy.latitude = 12.5
+        pharmacy.save(update_fields=["latitude"])
+        pharmacy.refresh_from_db()
+        self.assertEqual((pharmacy.grid_lat, pharmacy.grid_lng), (1250, 7700))
+
+
+class BulkInventoryTests(TestCase):
+    def setUp(self):
+        self.pharmacy = make_pharmacy(1, "Gandhipuram")
+        self.other_pharmacy = make_pharmacy(2, "Peelamedu")
+        for n in range(3):
+            Medicine.objects.create(medicine_id=f"M{n}", medicine_name=f"Medicine {n}")
+        MedicineInstance.objects.create(instance_id="I1", medicine_id="M1", pharmacy=self.pharmacy)
+
+    def stock(self):
+        return {i.instance_id: (i.medicine_id, i.pharmacy_id) for i in MedicineInstance.objects.all()}
+
+    def post_stream(self, body, content_type):
+        response = self.client.post(
+            f"/pharmacy/inventory/bulk/?pharmacy_id={self.pharmacy.pk}", body, content_type=content_type
+        )
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_json_list(self):
+        ops = [
+            {"op": "add", "instance_id": "I2", "medicine_id": "M2"},
+            {"op": "add", "instance_id": "I1", "medicine_id": "M1", "pharmacy_id": self.pharmacy.pk},
+            {"op": "add", "instance_id": "I1", "medicine_id": "M2", "pharmacy_id": self.other_pharmacy.pk},
+            {"op": "remove", "instance_id": "I2"},
+            {"op": "remove", "instance_id": "I2"},
+        ]
+        response = self.client.post(
+            f"/pharmacy/inventory/bulk/?pharmacy_id={self.pharmacy.pk}", ops, content_type="application/json"
+        )
+        body = response.json()
+        # later operations see earlier ones in the same batch
+        self.assertEqual(
+            [r["status"] for r in body["results"]], ["created", "unchanged", "updated", "removed", "error"]
+        )
+        self.assertEqual(body["results"][4]["error"], "Medicine instance not found.")
+        self.assertEqual(body["summary"], {"created": 1, "unchanged": 1, "updated": 1, "removed": 1, "error": 1})
+        self.assertEqual(self.stock(), {"I1": ("M2", self.other_pharmacy.pk)})
+
+    def test_invalid_operations_are_reported_per_row(self):
+        ops = [
+            "not an object",
+            {"op": "move", "instance_id": "I9"},
+            {"op": "add", "medicine_id": "M0"},
+            {"op": "add", "instance_id": "I9", "medicine_id": "M0"},
+            {"op": "add", "instance_id": "I9", "medicine_id": "nope", "pharmacy_id": self.pharmacy.pk},
+            {"op": "add", "instance_id": "I9", "medicine_id": "M0", "pharmacy_id": "x"},
+            {"op": "add", "instance_id": "I9", "medicine_id": "M0", "pharmacy_id": self.pharmacy.pk},
+        ]
+        results = list(apply_inventory(ops))
+        self.assertEqual([r["row"] for r in results], list(range(1, 8)))
+        self.assertEqual(
+            [r.get("error") for r in results],
+            [
+                "Each operation must be a JSON object.",
+                "'op' must be 'add' or 'remove'.",
+                "instance_id is required.",
+                "medicine_id and pharmacy_id are required.",
+                "Invalid medicine_id or pharmacy_id.",
+                "Invalid medicine_id or pharmacy_id.",
+                None,
+            ],
+        )
+        self.assertEqual(self.stock()["I9"], ("M0", self.pharmacy.pk))
+
+    def test_not_a_list(self):
+        response = self.client.post("/pharmacy/inventory/bulk/", {"op": "add"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_queries_per_chunk_do_not_grow_with_it(self):
+        ops = [{"op": "add", "instance_id": f"N{n}", "medicine_id": f"M{n % 3}"} for n in range(50)]
+        # savepoint, three lookups, one bulk insert, release
+        with self.assertNumQueries(6):
+            results = list(apply_inventory(ops, default_pharmacy_id=self.pharmacy.pk))
+        self.assertEqual({r["status"] for r in results}, {"created"})
+
+    def test_failed_chunk_leaves_earlier_chunks_applied(self):
+        ops = [{"op": "add", "instance_id": f"N{n}", "medicine_id": "M0"} for n in range(4)]
+        real_bulk_create = MedicineInstance.objects.bulk_create
+        calls = []
+
+        def bulk_create(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == 2:
+                raise IntegrityError("UNIQUE constraint failed: instance_id")
+            return real_bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(MedicineInstance.objects, "bulk_create", bulk_create):
+            results = list(apply_inventory(ops, default_pharmacy_id=self.pharmacy.pk, chunk_size=2))
+        self.assertEqual([r["status"] for r in results], ["created", "created", "error", "error"])
+        self.assertTrue(results[2]["error"].startswith("Chunk not applied"))
+        self.assertEqual(set(self.stock()), {"I1", "N0", "N1"})
+
+    def test_ndjson_stream(self):
+        body = b'{"op": "add", "instance_id": "I2", "medicine_id": "M2"}\n\n{not json\n{"op": "remove", "instance_id": "I1"}\n'
+        lines = self.post_stream(body, "application/x-ndjson")
+        self.assertEqual([line.get("status") for line in lines[:-1]], ["created", "error", "removed"])
+        self.assertEqual(lines[1]["error"], "Invalid JSON.")
+        self.assertEqual(lines[-1], {"summary": {"created": 1, "error": 1, "removed": 1}})
+        self.assertEqual(self.stock(), {"I2": ("M2", self.pharmacy.pk)})
+
+    def test_json_seq_stream(self):
+        body = (
+            b'\x1e{"op": "add",\n "instance_id": "I2", "medicine_id": "M2"}\n'
+            b'\x1e{"op": "remove", "instance_id": "I1"}\n'
+        )
+        lines = self.post_stream(body, "application/json-seq")
+        self.assertEqual([line.get("status") for line in lines[:-1]], ["created", "removed"])
+        self.assertEqual(self.stock(), {"I2": ("M2", self.pharmacy.pk)})
+
+    def test_json_seq_records_split_across_chunks(self):
+        chunks = [b'\x1e{"op": "remove", ', b'"instance_id": "I1"}\n\x1e', b'[1,\n2]\n\x1e{bad\n']
+        self.assertEqual(
+            [str(op) if isinstance(op, Exception) else op for op in parse_json_seq(chunks)],
+            [{"op": "remove", "instance_id": "I1"}, [1, 2], "Invalid JSON."],
+        )
+        self.assertEqual(list(parse_ndjson(["", " [1] "])), [[1]])
+
+
+class LocationSuffixMigrationTests(TransactionTestCase):
+    def tearDown(self):
+        migrate_to(*latest_migrations())
+
+    def test_existing_pharmacies_are_indexed(self):
+        apps = migrate_to(("Pharmacy", "0001_initial"))
+        owner = apps.get_model("UserDetails", "CustomUser").objects.create(username="pharmacist")
+        old = apps.get_model("Pharmacy", "Pharmacy").objects.create(
+            user_id=owner.pk, location="R.S. Puram", contact_no="8000000001"
+        )
+        migrate_to(*latest_migrations())
+        self.assertEqual(set(Pharmacy.objects.in_area("s pur").values_list("pk", flat=True)), {old.pk})
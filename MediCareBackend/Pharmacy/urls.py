@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import AddMedicineInstanceView,RemoveMedicineInstanceView
+from .views import AddMedicineInstanceView,RemoveMedicineInstanceView,BulkInventoryView
 
 urlpatterns = [
     path("addmedicineinstance/", AddMedicineInstanceView.as_view(), name="add-medicine"),
     path("removemedicineinstance/", RemoveMedicineInstanceView.as_view(), name="remove-medicine"),
+    path("inventory/bulk/", BulkInventoryView.as_view(), name="inventory-bulk"),
 ]
@@ -0,0 +1,23 @@
+# utils.py
+import re
+
+
+def normalize_location(raw_location: str) -> str:
+    """
+    Normalize a location for matching: lowercase letters and digits only,
+    so "R.S. Puram" and "rs puram" both become "rspuram".
+    Returns empty string if input is falsy.
+    """
+    if not raw_location:
+        return ""
+    return re.sub(r"[\W_]", "", raw_location.casefold())
+
+
+def location_suffixes(raw_location: str) -> list:
+    """
+    Every suffix of the normalized location. A location contains a search
+    term exactly when one of its suffixes starts with it, which an index on
+    the suffixes can answer with a range scan.
+    """
+    key = normalize_location(raw_location)
+    return [key[i:] for i in range(len(key))]
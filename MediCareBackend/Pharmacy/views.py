@@ -1,3 +1,7 @@
+import json
+from collections import Counter
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -5,6 +9,7 @@ from rest_framework import status
 from Medicine.models import MedicineInstance, Medicine
 from Pharmacy.models import Pharmacy
 from Medicine.serializers import MedicineInstanceSerializer,MedicineSerializer
+from .inventory import apply_inventory, parse_json_seq, parse_ndjson
 
 class AddMedicineInstanceView(APIView):
     def post(self, request):
@@ -45,10 +50,51 @@ class RemoveMedicineInstanceView(APIView):
             return Response({"error": "instance_id is required."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            instance = MedicineInstance.objects.get(pk=instance_id)
+            instance = MedicineInstance.objects.get(instance_id=instance_id)
             instance.delete()
             return Response({"message": f"Medicine instance {instance_id} removed successfully."}, status=status.HTTP_200_OK)
         except MedicineInstance.DoesNotExist:
             return Response({"error": "Medicine instance not found."}, status=status.HTTP_404_NOT_FOUND)
 
 
+class BulkInventoryView(APIView):
+    """
+    POST /pharmacy/inventory/bulk/[?pharmacy_id=3]
+
+    Apply many add/remove operations (see Pharmacy/inventory.py) in one request:
+      - Content-Type: application/json   -> a JSON list of operations;
+        responds {"summary": {<status>: count}, "results": [...]}
+      - Content-Type: application/x-ndjson -> one operation per line, read as a
+        stream; responds with one NDJSON result line per operation, then
+        {"summary": {...}}
+      - Content-Type: application/json-seq -> RS-separated operations (RFC 7464),
+        read as a stream; responds as for NDJSON
+    `pharmacy_id` in the query string is used for "add" operations without one.
+    """
+    STREAM_PARSERS = {
+        "application/x-ndjson": parse_ndjson,
+        "application/jsonl": parse_ndjson,
+        "application/json-seq": parse_json_seq,
+    }
+
+    def post(self, request):
+        default_pharmacy_id = request.query_params.get("pharmacy_id")
+
+        parse = self.STREAM_PARSERS.get(request.content_type.split(";")[0].strip())
+        if parse is not None:
+            results = apply_inventory(parse(request.stream or []), default_pharmacy_id)
+            return StreamingHttpResponse(_ndjson_lines(results), content_type="application/x-ndjson")
+
+        ops = request.data
+        if not isinstance(ops, list):
+            return Response({"error": "Expected a JSON list of operations."}, status=status.HTTP_400_BAD_REQUEST)
+        results = list(apply_inventory(ops, default_pharmacy_id))
+        return Response({"summary": Counter(r["status"] for r in results), "results": results}, status=status.HTTP_200_OK)
+
+
+def _ndjson_lines(results):
+    summary = Counter()
+    for result in results:
+        summary[result["status"]] += 1
+        yield json.dumps(result) + "\n"
+    yield json.dumps({"summary": summary}) + "\n"
@@ -0,0 +1,22 @@
+# backfill_phone_numbers.py
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from UserDetails.utils import backfill_phone_normalized
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's normalised phone number (the column phone booking "
+        "looks up), e.g. after bulk loads that bypassed save(). Users whose number "
+        "normalises to one already taken are listed and left without one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        updated, conflicts = backfill_phone_normalized(get_user_model(), batch_size=options["batch_size"])
+        for user_pk, phone, owner_pk in conflicts:
+            self.stdout.write(self.style.WARNING(f"  user {user_pk}: {phone} already belongs to user {owner_pk}"))
+        self.stdout.write(self.style.SUCCESS(f"{updated} users updated, {len(conflicts)} conflicting numbers"))
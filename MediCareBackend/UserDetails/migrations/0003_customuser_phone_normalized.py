@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:49
+
+import re
+
+from django.db import migrations, models
+
+
+def normalize_phone(raw_phone):
+    # UserDetails.utils.normalize_phone as of this migration
+    if not raw_phone:
+        return ""
+    p = raw_phone.strip()
+    if p.startswith("+"):
+        return "+" + re.sub(r"\D", "", p[1:])
+    return re.sub(r"\D", "", p)
+
+
+def backfill(apps, schema_editor):
+    # UserDetails.utils.backfill_phone_normalized as of this migration: the
+    # first user with a number keeps it, later spellings of it are left NULL
+    CustomUser = apps.get_model("UserDetails", "CustomUser")
+    owners, changed = set(), []
+    for user in CustomUser.objects.order_by("pk").only("pk", "phone_number").iterator(chunk_size=2000):
+        normalized = normalize_phone(user.phone_number) or None
+        if normalized is None or normalized in owners:
+            continue
+        owners.add(normalized)
+        user.phone_normalized = normalized
+        changed.append(user)
+    CustomUser.objects.bulk_update(changed, ["phone_normalized"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    # its name before the gap in the numbering was closed
+    replaces = [('UserDetails', '0004_customuser_phone_normalized')]
+
+    dependencies = [
+        ('UserDetails', '0002_customuser_ice_candidates_customuser_sdp'),
+    ]
+
+    operations = [
+        # an earlier revision indexed the raw phone_number; databases that
+        # applied it still carry the index
+        migrations.RunSQL("DROP INDEX IF EXISTS user_phone_idx", migrations.RunSQL.noop),
+        # added without the unique constraint, filled in, then made unique:
+        # existing users may share a number in different spellings
+        migrations.AddField(
+            model_name='customuser',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=15, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customuser',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=15, null=True, unique=True),
+        ),
+    ]
@@ -3,8 +3,12 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from datetime import date
 
+from .utils import normalize_phone
+
 class CustomUser(AbstractUser):
     phone_number = models.CharField(max_length=15, blank=True, null=True)
+    # phone_number as normalize_phone() writes it; what booking looks patients up by
+    phone_normalized = models.CharField(max_length=15, unique=True, blank=True, null=True, editable=False)
     date_of_birth = models.DateField(blank=True, null=True)
     gender = models.CharField(max_length=8, choices=[
         ('Male', 'Male'),
@@ -20,7 +24,14 @@ class CustomUser(AbstractUser):
     offer= models.CharField(max_length=64,blank=True)
     sdp = models.TextField(blank=True, null=True)
     ice_candidates = models.TextField(blank=True, null=True)
-    
+
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone_number) or None
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "phone_number" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "phone_normalized"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.username
     
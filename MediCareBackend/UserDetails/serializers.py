@@ -1,5 +1,17 @@
 from rest_framework import serializers
 from UserDetails.models import CustomUser
+from UserDetails.utils import normalize_phone
+
+
+def validate_unique_phone(serializer, value):
+    # phone_normalized is unique; catch the clash here rather than as an IntegrityError
+    phone = normalize_phone(value)
+    taken = CustomUser.objects.filter(phone_normalized=phone)
+    if serializer.instance is not None:
+        taken = taken.exclude(pk=serializer.instance.pk)
+    if phone and taken.exists():
+        raise serializers.ValidationError("A user with that phone number already exists.")
+    return value
 
 class UserUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,6 +32,9 @@ class UserUpdateSerializer(serializers.ModelSerializer):
             "email": {"required": False},     # make email optional for updates
         }
 
+    def validate_phone_number(self, value):
+        return validate_unique_phone(self, value)
+
     def update(self, instance, validated_data):
         """
         Custom update method to update only provided fields.
@@ -41,6 +56,9 @@ class UserDetailSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("A user with that username already exists.")
         return value
 
+    def validate_phone_number(self, value):
+        return validate_unique_phone(self, value)
+
     def validate_email(self, value):
         user = self.instance
         if user and CustomUser.objects.exclude(pk=user.pk).filter(email=value).exists():
@@ -1,3 +1,71 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, TransactionTestCase
+
+from MediCareBackend.testing import assert_uses_index, latest_migrations, migrate_to, prefer_index_plans
+from .utils import normalize_phone
+
+User = get_user_model()
+
+
+class UserQueryPlanTests(TestCase):
+    def setUp(self):
+        prefer_index_plans()
+
+    def test_patient_by_phone(self):
+        assert_uses_index(User.objects.filter(phone_normalized="9000000001"))
+
+
+class PhoneNumberTests(TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_phone(" 98765-43210 "), "9876543210")
+        self.assertEqual(normalize_phone("+91 (98765) 43210"), "+919876543210")
+        self.assertEqual(normalize_phone(None), "")
+
+    def test_save_keeps_the_normalized_number(self):
+        user = User.objects.create(username="asha", phone_number="98765 43210")
+        self.assertEqual(user.phone_normalized, "9876543210")
+        user.phone_number = ""
+        user.save(update_fields=["phone_number"])
+        user.refresh_from_db()
+        self.assertIsNone(user.phone_normalized)
+        # users without a number don't collide
+        User.objects.create(username="ravi")
+
+    def test_one_user_per_number(self):
+        User.objects.create(username="asha", phone_number="98765 43210")
+        with self.assertRaises(IntegrityError):
+            User.objects.create(username="ravi", phone_number="98765-43210")
+
+    def test_backfill_command_reports_conflicts(self):
+        User.objects.bulk_create([
+            User(username="asha", phone_number="98765 43210"),
+            User(username="ravi", phone_number="98765-43210"),
+            User(username="meera", phone_number="91234 56789"),
+        ])
+        out = StringIO()
+        call_command("backfill_phone_numbers", stdout=out)
+        self.assertIn("2 users updated, 1 conflicting numbers", out.getvalue())
+        self.assertEqual(
+            dict(User.objects.values_list("username", "phone_normalized")),
+            {"asha": "9876543210", "ravi": None, "meera": "9123456789"},
+        )
+
+
+class PhoneNormalizedMigrationTests(TransactionTestCase):
+    def tearDown(self):
+        migrate_to(*latest_migrations())
+
+    def test_existing_users_are_backfilled(self):
+        apps = migrate_to(("UserDetails", "0002_customuser_ice_candidates_customuser_sdp"))
+        OldUser = apps.get_model("UserDetails", "CustomUser")
+        for username, phone in [("asha", "+91 98765 43210"), ("ravi", "+919876543210"), ("meera", None)]:
+            OldUser.objects.create(username=username, phone_number=phone)
+        migrate_to(*latest_migrations())
+        self.assertEqual(
+            dict(User.objects.values_list("username", "phone_normalized")),
+            {"asha": "+919876543210", "ravi": None, "meera": None},
+        )
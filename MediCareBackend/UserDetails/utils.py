@@ -0,0 +1,58 @@
+# utils.py
+import re
+
+from django.db import transaction
+
+
+def normalize_phone(raw_phone: str) -> str:
+    """
+    Normalize a phone number for consistent lookup:
+    - strip whitespace
+    - keep a leading '+' if present
+    - remove any other non-digit characters
+    Returns empty string if input is falsy.
+    """
+    if not raw_phone:
+        return ""
+    p = raw_phone.strip()
+    if p.startswith("+"):
+        return "+" + re.sub(r"\D", "", p[1:])
+    return re.sub(r"\D", "", p)
+
+
+def backfill_phone_normalized(user_model, batch_size=2000):
+    """
+    Recompute ``phone_normalized`` for every user of ``user_model`` (rows
+    written by bulk_create or raw SQL skip ``save()``). The first user
+    with a number keeps it; later users normalising to the same number
+    are left NULL and returned as conflicts.
+
+    Returns ``(updated, conflicts)`` where conflicts is
+    ``[(user_pk, normalized, owner_pk)]``. Takes the model as an argument
+    so migrations can pass their historical one.
+    """
+    owners, changed, conflicts = {}, [], []
+    rows = user_model.objects.order_by("pk").only("pk", "phone_number", "phone_normalized")
+    for user in rows.iterator(chunk_size=batch_size):
+        wanted = normalize_phone(user.phone_number) or None
+        if wanted is not None:
+            if wanted in owners:
+                conflicts.append((user.pk, wanted, owners[wanted]))
+                wanted = None
+            else:
+                owners[wanted] = user.pk
+        if user.phone_normalized != wanted:
+            user.phone_normalized = wanted
+            changed.append(user)
+
+    with transaction.atomic():
+        # clear the stale values first so no row collides with one not yet rewritten
+        for start in range(0, len(changed), batch_size):
+            pks = [user.pk for user in changed[start:start + batch_size]]
+            user_model.objects.filter(pk__in=pks).update(phone_normalized=None)
+        user_model.objects.bulk_update(
+            [user for user in changed if user.phone_normalized is not None],
+            ["phone_normalized"],
+            batch_size=batch_size,
+        )
+    return len(changed), conflicts
@@ -2,6 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from MediCareBackend.pagination import list_response
 from UserDetails.models import CustomUser
 from UserDetails.serializers import (
     UserListSerializer,
@@ -11,14 +12,13 @@ from UserDetails.serializers import (
 
 class UserListCreateView(APIView):
     """
-    GET: List all users
+    GET: List users, a keyset page at a time ({"next": ..., "results": [...]});
+         ?stream=1 streams every user as a JSON array
     POST: Create a new user
     """
 
     def get(self, request):
-        users = CustomUser.objects.all()
-        serializer = UserListSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, CustomUser.objects.all(), UserListSerializer, ordering=("id",))
 
     def post(self, request):
         serializer = UserDetailSerializer(data=request.data)
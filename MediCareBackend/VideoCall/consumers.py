@@ -0,0 +1,117 @@
+# consumers.py
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+# trickle ICE: candidates are buffered this long (or up to ICE_BATCH_MAX) and sent as one message
+ICE_BATCH_DELAY = 0.02  # seconds
+ICE_BATCH_MAX = 32
+
+RELAYED_TYPES = ("offer", "answer", "bye")
+
+
+class ConsultationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/consult/<user_id>/[?role=doctor]
+
+    WebRTC signaling for one consultation. The patient and the doctor both
+    connect to the patient's room. Anything one peer sends is relayed to the
+    other through the channel layer group ``consult_<user_id>``.
+
+    Client -> server messages:
+      {"type": "offer" | "answer", "sdp": ...}
+      {"type": "ice", "candidate": {...}}  or  {"type": "ice", "candidates": [...]}
+      {"type": "bye"}
+
+    Server -> client messages: the same shapes, with ICE always batched as
+    {"type": "ice", "candidates": [...]}, plus {"type": "peer", "event": "joined" | "left", "role": ...}.
+
+    ICE candidates are deduplicated and coalesced into batches on the way in.
+    Messages for a slow peer wait in its channel layer queue, which is bounded
+    by the layer's capacity (see CHANNEL_LAYERS in settings).
+    """
+
+    async def connect(self):
+        self.room = self.scope["url_route"]["kwargs"]["user_id"]
+        self.group_name = f"consult_{self.room}"
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        self.role = "doctor" if query.get("role") == ["doctor"] else "patient"
+
+        self._ice_pending = []
+        self._ice_seen = set()
+        self._ice_flush = None
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self._relay({"type": "peer", "event": "joined", "role": self.role})
+
+    async def disconnect(self, code):
+        if not hasattr(self, "group_name"):
+            return
+        if self._ice_pending:
+            await self._flush_ice()
+        await self._relay({"type": "peer", "event": "left", "role": self.role})
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self._ice_flush:
+            self._ice_flush.cancel()
+
+    # ---------- client -> room ----------
+    async def receive_json(self, content, **kwargs):
+        kind = content.get("type") if isinstance(content, dict) else None
+
+        if kind == "ice":
+            candidates = content["candidates"] if "candidates" in content else [content.get("candidate")]
+            await self._queue_ice(candidates)
+        elif kind in RELAYED_TYPES:
+            # keep SDP ordered after any candidates gathered before it
+            if self._ice_pending:
+                await self._flush_ice()
+            await self._relay(content)
+        else:
+            await self.send_json({"type": "error", "detail": f"unknown message type {kind!r}"})
+
+    async def _queue_ice(self, candidates):
+        end_of_candidates = False
+        for candidate in candidates:
+            if candidate is None:
+                # end-of-candidates marker: deliver it and everything before it now
+                end_of_candidates = True
+                self._ice_pending.append(None)
+                continue
+            key = json.dumps(candidate, sort_keys=True)
+            if key in self._ice_seen:
+                continue
+            self._ice_seen.add(key)
+            self._ice_pending.append(candidate)
+
+        if end_of_candidates or len(self._ice_pending) >= ICE_BATCH_MAX:
+            await self._flush_ice()
+        elif self._ice_pending and self._ice_flush is None:
+            self._ice_flush = asyncio.create_task(self._flush_ice_later())
+
+    async def _flush_ice_later(self):
+        await asyncio.sleep(ICE_BATCH_DELAY)
+        self._ice_flush = None
+        await self._flush_ice()
+
+    async def _flush_ice(self):
+        if self._ice_flush is not None and self._ice_flush is not asyncio.current_task():
+            self._ice_flush.cancel()
+            self._ice_flush = None
+        batch, self._ice_pending = self._ice_pending, []
+        if batch:
+            await self._relay({"type": "ice", "candidates": batch})
+
+    async def _relay(self, message):
+        await self.channel_layer.group_send(self.group_name, {
+            "type": "signal.message",
+            "sender": self.channel_name,
+            "message": message,
+        })
+
+    # ---------- room -> client ----------
+    async def signal_message(self, event):
+        if event["sender"] != self.channel_name:
+            await self.send_json(event["message"])
@@ -0,0 +1,123 @@
+# bench_consult.py
+import asyncio
+import json
+import time
+
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from MediCareBackend.benchmarking import percentile
+from VideoCall import routing
+
+
+class _Peer:
+    """Minimal WebSocket client driving the ASGI app in-process."""
+
+    def __init__(self, app, room, role):
+        self.role = role
+        self._comm = ApplicationCommunicator(app, {
+            "type": "websocket",
+            "path": f"/ws/consult/{room}/",
+            "query_string": f"role={role}".encode(),
+            "headers": [],
+            "subprotocols": [],
+        })
+
+    async def connect(self):
+        await self._comm.send_input({"type": "websocket.connect"})
+        assert (await self._comm.receive_output(5))["type"] == "websocket.accept"
+
+    async def send(self, message):
+        await self._comm.send_input({"type": "websocket.receive", "text": json.dumps(message)})
+
+    async def receive(self, timeout=10):
+        while True:
+            event = await self._comm.receive_output(timeout)
+            if event["type"] != "websocket.send":
+                raise RuntimeError(f"{self.role} connection closed: {event}")
+            message = json.loads(event["text"])
+            if message["type"] != "peer":
+                return message
+
+    async def close(self):
+        await self._comm.send_input({"type": "websocket.disconnect", "code": 1000})
+        await self._comm.wait(5)
+
+
+async def _consultation(app, room, candidates, latencies):
+    patient, doctor = _Peer(app, room, "patient"), _Peer(app, room, "doctor")
+    await patient.connect()
+    await doctor.connect()
+
+    await patient.send({"type": "offer", "sdp": "v=0 offer", "sent_at": time.perf_counter()})
+    offer = await doctor.receive()
+    latencies.append(time.perf_counter() - offer["sent_at"])
+
+    await doctor.send({"type": "answer", "sdp": "v=0 answer", "sent_at": time.perf_counter()})
+    answer = await patient.receive()
+    latencies.append(time.perf_counter() - answer["sent_at"])
+
+    # trickle the patient's candidates one message at a time, as a browser would
+    for n in range(candidates):
+        await patient.send({"type": "ice", "candidate": {"candidate": f"cand-{n}", "sent_at": time.perf_counter()}})
+    await patient.send({"type": "ice", "candidate": None})
+    received = 0
+    while received <= candidates:
+        batch = await doctor.receive()
+        now = time.perf_counter()
+        for candidate in batch["candidates"]:
+            received += 1
+            if candidate is not None:
+                latencies.append(now - candidate["sent_at"])
+
+    await patient.send({"type": "bye"})
+    await doctor.receive()
+    await patient.close()
+    await doctor.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive N simultaneous consultations through ConsultationConsumer "
+        "(offer, answer, trickle ICE, bye) and report relay latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--consultations", type=int, default=200)
+        parser.add_argument("--candidates", type=int, default=20, help="ICE candidates per patient")
+        parser.add_argument(
+            "--use-configured-layer", action="store_true",
+            help="use settings.CHANNEL_LAYERS instead of an in-memory channel layer",
+        )
+
+    def handle(self, *args, **options):
+        if options["use_configured_layer"]:
+            self._run(options)
+        else:
+            with override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}):
+                channel_layers.backends.clear()
+                self._run(options)
+
+    def _run(self, options):
+        n, candidates = options["consultations"], options["candidates"]
+        app = URLRouter(routing.websocket_urlpatterns)
+        latencies = []
+
+        async def main():
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                _consultation(app, f"bench{i}", candidates, latencies) for i in range(n)
+            ))
+            return time.perf_counter() - started
+
+        elapsed = asyncio.run(main())
+        self.stdout.write(
+            f"{n} consultations ({len(latencies)} relayed messages/candidates) in {elapsed:.2f}s | "
+            f"relay latency p50 {percentile(latencies, 50) * 1000:.2f}ms "
+            f"p95 {percentile(latencies, 95) * 1000:.2f}ms "
+            f"p99 {percentile(latencies, 99) * 1000:.2f}ms "
+            f"max {max(latencies, default=0) * 1000:.2f}ms"
+        )
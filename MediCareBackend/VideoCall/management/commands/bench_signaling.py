@@ -0,0 +1,82 @@
+# bench_signaling.py
+import multiprocessing
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from VideoCall.signaling import InMemorySignalingBackend, get_signaling_backend
+
+
+def _worker(index, processes, offers, barrier, results):
+    # never share a Redis connection with the parent across fork
+    get_signaling_backend.cache_clear()
+    signaling = get_signaling_backend()
+    prefix = f"bench-{index}"
+
+    started = time.perf_counter()
+    for i in range(offers):
+        signaling.push_offer({"user_id": f"{prefix}-{i}", "sdp": "v=0"})
+        signaling.put_answer(f"{prefix}-{i}", {"sdp": "v=0", "ice_candidates": []})
+    barrier.wait()
+
+    popped_offers = []
+    while (offer := signaling.pop_offer()) is not None:
+        popped_offers.append(offer["user_id"])
+
+    # read the answers addressed to the next process's patients
+    peer = f"bench-{(index + 1) % processes}"
+    popped_answers = [
+        f"{peer}-{i}" for i in range(offers) if signaling.pop_answer(f"{peer}-{i}") is not None
+    ]
+    results.put((index, time.perf_counter() - started, popped_offers, popped_answers))
+
+
+class Command(BaseCommand):
+    help = (
+        "Push and pop offers/answers from several worker processes through the "
+        "configured SIGNALING backend and check every entry is delivered exactly once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=4)
+        parser.add_argument("--offers", type=int, default=500, help="offers (and answers) per process")
+
+    def handle(self, *args, **options):
+        processes, offers = options["processes"], options["offers"]
+        if processes > 1 and isinstance(get_signaling_backend(), InMemorySignalingBackend):
+            raise CommandError("The in-memory signaling backend is per process; configure a shared backend.")
+
+        ctx = multiprocessing.get_context("fork")
+        barrier, results = ctx.Barrier(processes), ctx.Queue()
+        workers = [
+            ctx.Process(target=_worker, args=(n, processes, offers, barrier, results))
+            for n in range(processes)
+        ]
+        for w in workers:
+            w.start()
+        collected = [results.get() for _ in workers]
+        for w in workers:
+            w.join()
+
+        offer_counts = Counter(uid for *_, popped, _ in collected for uid in popped)
+        answer_counts = Counter(uid for *_, popped in collected for uid in popped)
+        expected = {f"bench-{n}-{i}" for n in range(processes) for i in range(offers)}
+        elapsed = max(t for _, t, *_ in collected)
+
+        problems = []
+        for label, counts in (("offers", offer_counts), ("answers", answer_counts)):
+            if set(counts) != expected:
+                problems.append(f"{label}: {len(expected - set(counts))} lost")
+            duplicated = sum(1 for c in counts.values() if c > 1)
+            if duplicated:
+                problems.append(f"{label}: {duplicated} delivered more than once")
+
+        ops = 4 * processes * offers  # push + pop for offers and answers
+        self.stdout.write(
+            f"{processes} processes x {offers} offers: {ops / elapsed:.0f} signaling ops/sec, "
+            f"per-process pops: {[len(p) for _, _, p, _ in collected]}"
+        )
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write("every offer and answer delivered exactly once")
@@ -0,0 +1,336 @@
+# signaling.py
+"""
+Storage for WebRTC signaling (patient offers and doctor answers).
+
+Offers wait in a FIFO queue, either the shared one or a specific doctor's,
+and answers are held per patient. Both are popped atomically, so exactly one
+doctor gets each offer and the patient reads its answer once. Unanswered
+offers and unread answers expire after a TTL.
+
+Configure with settings.SIGNALING:
+
+    SIGNALING = {
+        "BACKEND": "VideoCall.signaling.RedisSignalingBackend",
+        "CONFIG": {"hosts": [("127.0.0.1", 6379)], "offer_ttl": 120, "answer_ttl": 120},
+    }
+
+The Redis backend is shared by every worker process. Without the setting,
+the in-process backend is used. It only works with a single worker.
+
+Both backends also offer ``wait_offer``/``wait_answer`` coroutines for the
+long-poll endpoints. They park until something arrives or the timeout passes.
+
+ICE candidates are kept in an append-only log per (session, role), where the
+session is the patient's user id and role is the sender ("patient" or
+"doctor"). Peers read it incrementally with a cursor, ``candidates_since(...,
+after=seq)``, so call setup can start before gathering finishes.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+DEFAULT_TTL = 120  # seconds
+DEFAULT_WAIT = 25  # seconds a long-poll request stays parked
+DEFAULT_CANDIDATE_TTL = 600  # seconds a session's candidate log outlives its last append
+
+CANDIDATE_ROLES = ("patient", "doctor")
+
+# queue name for offers not addressed to a particular doctor
+ANY_DOCTOR = "any"
+
+
+class SignalingUnavailable(Exception):
+    """Raised by a backend when its store cannot be reached."""
+
+
+def _queue_name(doctor_id):
+    return str(doctor_id) if doctor_id else ANY_DOCTOR
+
+
+class InMemorySignalingBackend:
+    """
+    Process-local store. Offers go in one deque per queue, and answers go in
+    a dict keyed by patient. Expired entries are dropped when popped and
+    swept out when new ones arrive.
+    """
+
+    def __init__(self, offer_ttl=DEFAULT_TTL, answer_ttl=DEFAULT_TTL,
+                 candidate_ttl=DEFAULT_CANDIDATE_TTL, **config):
+        self.offer_ttl = offer_ttl
+        self.answer_ttl = answer_ttl
+        self.candidate_ttl = candidate_ttl
+        self._lock = threading.Lock()
+        self._offers = {}   # queue name -> deque[(expires_at, offer)]
+        self._answers = {}  # patient id -> (expires_at, answer)
+        self._candidates = {}  # (session, role) -> [expires_at, [candidate, ...]]
+        self._waiters = {}  # "offers:<queue>" / "answer:<patient>" -> {(loop, event)}
+
+    def _wake(self, key):
+        # called with self._lock held, possibly from a sync worker thread
+        for loop, event in self._waiters.get(key, ()):
+            loop.call_soon_threadsafe(event.set)
+
+    async def _wait(self, keys, pop, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._lock:
+            for key in keys:
+                self._waiters.setdefault(key, set()).add(waiter)
+        try:
+            # registered before the first pop, so a push in between still wakes us
+            while (item := pop()) is None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            return item
+        finally:
+            with self._lock:
+                for key in keys:
+                    waiters = self._waiters.get(key)
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[key]
+
+    def push_offer(self, offer, doctor_id=None):
+        now = time.monotonic()
+        with self._lock:
+            queue = self._offers.setdefault(_queue_name(doctor_id), deque())
+            # the TTL is constant, so expired offers are always at the front
+            while queue and queue[0][0] <= now:
+                queue.popleft()
+            queue.append((now + self.offer_ttl, offer))
+            self._wake(f"offers:{_queue_name(doctor_id)}")
+
+    def pop_offer(self, doctor_id=None):
+        now = time.monotonic()
+        names = [_queue_name(doctor_id), ANY_DOCTOR] if doctor_id else [ANY_DOCTOR]
+        with self._lock:
+            for name in names:
+                queue = self._offers.get(name)
+                while queue:
+                    expires_at, offer = queue.popleft()
+                    if expires_at > now:
+                        return offer
+        return None
+
+    def put_answer(self, patient_id, answer):
+        now = time.monotonic()
+        with self._lock:
+            expired = [pid for pid, (expires_at, _) in self._answers.items() if expires_at <= now]
+            for pid in expired:
+                del self._answers[pid]
+            self._answers[str(patient_id)] = (now + self.answer_ttl, answer)
+            self._wake(f"answer:{patient_id}")
+
+    def pop_answer(self, patient_id):
+        with self._lock:
+            expires_at, answer = self._answers.pop(str(patient_id), (0, None))
+        return answer if expires_at > time.monotonic() else None
+
+    async def wait_offer(self, doctor_id=None, timeout=DEFAULT_WAIT):
+        names = [_queue_name(doctor_id), ANY_DOCTOR] if doctor_id else [ANY_DOCTOR]
+        return await self._wait([f"offers:{n}" for n in names], lambda: self.pop_offer(doctor_id), timeout)
+
+    def append_candidates(self, session_id, role, candidates):
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._candidates.items() if expires_at <= now]
+            for key in expired:
+                del self._candidates[key]
+            log = self._candidates.setdefault((str(session_id), role), [0, []])
+            log[0] = now + self.candidate_ttl
+            log[1].extend(candidates)
+            return len(log[1])
+
+    def candidates_since(self, session_id, role, after=0):
+        with self._lock:
+            expires_at, candidates = self._candidates.get((str(session_id), role), (0, []))
+            if expires_at <= time.monotonic():
+                return [], 0
+            return candidates[after:], len(candidates)
+
+    def clear_candidates(self, session_id):
+        with self._lock:
+            for role in CANDIDATE_ROLES:
+                self._candidates.pop((str(session_id), role), None)
+
+    async def wait_answer(self, patient_id, timeout=DEFAULT_WAIT):
+        return await self._wait([f"answer:{patient_id}"], lambda: self.pop_answer(patient_id), timeout)
+
+
+class RedisSignalingBackend:
+    """
+    Offers: one Redis list per queue of JSON entries stamped with an expiry,
+    consumed with LPOP. Answers: a one-element list per patient, replaced on
+    every answer and consumed with LPOP. Key TTLs bound memory even when
+    nobody ever pops.
+    """
+
+    def __init__(self, hosts=None, prefix="signal", offer_ttl=DEFAULT_TTL, answer_ttl=DEFAULT_TTL,
+                 candidate_ttl=DEFAULT_CANDIDATE_TTL, **config):
+        import redis
+
+        host = (hosts or [("127.0.0.1", 6379)])[0]
+        if isinstance(host, str):
+            self._redis = redis.Redis.from_url(host, **config)
+        else:
+            self._redis = redis.Redis(host=host[0], port=host[1], **config)
+        self._host, self._config = host, config
+        self._errors = (redis.RedisError,)
+        self.prefix = prefix
+        self.offer_ttl = offer_ttl
+        self.answer_ttl = answer_ttl
+        self.candidate_ttl = candidate_ttl
+
+    def _offer_key(self, name):
+        return f"{self.prefix}:offers:{name}"
+
+    def _answer_key(self, patient_id):
+        return f"{self.prefix}:answer:{patient_id}"
+
+    def _candidate_key(self, session_id, role):
+        return f"{self.prefix}:ice:{session_id}:{role}"
+
+    def _call(self, fn):
+        try:
+            return fn()
+        except self._errors as exc:
+            raise SignalingUnavailable(str(exc)) from exc
+
+    def push_offer(self, offer, doctor_id=None):
+        key = self._offer_key(_queue_name(doctor_id))
+        entry = json.dumps({"expires_at": time.time() + self.offer_ttl, "offer": offer})
+
+        def run():
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.rpush(key, entry)
+            pipe.expire(key, self.offer_ttl)
+            pipe.execute()
+
+        self._call(run)
+
+    def pop_offer(self, doctor_id=None):
+        names = [_queue_name(doctor_id), ANY_DOCTOR] if doctor_id else [ANY_DOCTOR]
+        for name in names:
+            key = self._offer_key(name)
+            while True:
+                raw = self._call(lambda: self._redis.lpop(key))
+                if raw is None:
+                    break
+                entry = json.loads(raw)
+                if entry["expires_at"] > time.time():
+                    return entry["offer"]
+        return None
+
+    def put_answer(self, patient_id, answer):
+        key = self._answer_key(patient_id)
+
+        def run():
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.delete(key)
+            pipe.rpush(key, json.dumps(answer))
+            pipe.expire(key, self.answer_ttl)
+            pipe.execute()
+
+        self._call(run)
+
+    def pop_answer(self, patient_id):
+        raw = self._call(lambda: self._redis.lpop(self._answer_key(patient_id)))
+        return json.loads(raw) if raw is not None else None
+
+    def append_candidates(self, session_id, role, candidates):
+        key = self._candidate_key(session_id, role)
+
+        def run():
+            pipe = self._redis.pipeline(transaction=True)
+            if candidates:
+                pipe.rpush(key, *(json.dumps(c) for c in candidates))
+            else:
+                pipe.llen(key)
+            pipe.expire(key, self.candidate_ttl)
+            return pipe.execute()[0]
+
+        return self._call(run)
+
+    def candidates_since(self, session_id, role, after=0):
+        key = self._candidate_key(session_id, role)
+
+        def run():
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.lrange(key, after, -1)
+            pipe.llen(key)
+            return pipe.execute()
+
+        raw, length = self._call(run)
+        return [json.loads(c) for c in raw], length
+
+    def clear_candidates(self, session_id):
+        self._call(lambda: self._redis.delete(
+            *(self._candidate_key(session_id, role) for role in CANDIDATE_ROLES)
+        ))
+
+    def _async_client(self):
+        # a BLPOP holds its connection for the whole wait, so each waiter gets its own client
+        import redis.asyncio
+
+        if isinstance(self._host, str):
+            return redis.asyncio.Redis.from_url(self._host, **self._config)
+        return redis.asyncio.Redis(host=self._host[0], port=self._host[1], **self._config)
+
+    async def _wait(self, keys, timeout, accept):
+        """BLPOP from ``keys`` until ``accept(raw)`` returns an item or the timeout passes."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            async with self._async_client() as client:
+                while (remaining := deadline - loop.time()) > 0:
+                    popped = await client.blpop(keys, timeout=remaining)
+                    if popped is None:
+                        break
+                    item = accept(popped[1])
+                    if item is not None:
+                        return item
+        except self._errors as exc:
+            raise SignalingUnavailable(str(exc)) from exc
+        return None
+
+    async def wait_offer(self, doctor_id=None, timeout=DEFAULT_WAIT):
+        names = [_queue_name(doctor_id), ANY_DOCTOR] if doctor_id else [ANY_DOCTOR]
+
+        def accept(raw):
+            entry = json.loads(raw)
+            return entry["offer"] if entry["expires_at"] > time.time() else None
+
+        return await self._wait([self._offer_key(n) for n in names], timeout, accept)
+
+    async def wait_answer(self, patient_id, timeout=DEFAULT_WAIT):
+        return await self._wait([self._answer_key(patient_id)], timeout, json.loads)
+
+
+@lru_cache(maxsize=None)
+def get_signaling_backend():
+    conf = getattr(settings, "SIGNALING", None) or {
+        "BACKEND": "VideoCall.signaling.InMemorySignalingBackend",
+    }
+    return import_string(conf["BACKEND"])(**conf.get("CONFIG", {}))
+
+
+@receiver(setting_changed)
+def _reset_signaling_backend(setting, **kwargs):
+    if setting == "SIGNALING":
+        get_signaling_backend.cache_clear()
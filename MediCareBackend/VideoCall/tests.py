@@ -1,3 +1,255 @@
-from django.test import TestCase
+import asyncio
+import multiprocessing
+import time
 
-# Create your tests here.
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from MediCareBackend.testing import redis_server, reset_shared_state
+from .routing import websocket_urlpatterns
+from .signaling import InMemorySignalingBackend, RedisSignalingBackend, get_signaling_backend
+
+
+def _drain_offers(host, doctor_id, start_at):
+    """Worker process: pop offers for ``doctor_id`` until the queues stay empty."""
+    backend = RedisSignalingBackend(hosts=[tuple(host)])
+    while time.time() < start_at:  # line the workers up so they really race
+        time.sleep(0.001)
+    popped, misses = [], 0
+    while misses < 20:
+        offer = backend.pop_offer(doctor_id)
+        if offer is None:
+            misses += 1
+            continue
+        misses = 0
+        popped.append(offer)
+    return popped
+
+
+def _race_answer(host, patient_id, start_at):
+    backend = RedisSignalingBackend(hosts=[tuple(host)])
+    while time.time() < start_at:
+        time.sleep(0.001)
+    return [answer for answer in (backend.pop_answer(patient_id) for _ in range(50)) if answer is not None]
+
+
+class RedisSignalingMultiProcessTests(SimpleTestCase):
+    """
+    RedisSignalingBackend shared by separate worker processes, as under
+    several ASGI workers, against a redis-server started for the test.
+    """
+    workers_per_doctor = 3
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.host = cls.enterClassContext(redis_server())
+        # fresh interpreters, like separate server processes; no state inherited from the test
+        cls.pool = multiprocessing.get_context("spawn").Pool(2 * cls.workers_per_doctor)
+        cls.addClassCleanup(cls.pool.terminate)
+
+    def setUp(self):
+        self.backend = RedisSignalingBackend(hosts=[self.host], offer_ttl=60, answer_ttl=60)
+        self.backend._redis.flushdb()
+
+    def test_each_offer_is_popped_exactly_once_and_only_by_its_doctor(self):
+        pushed = []
+        for n in range(300):
+            doctor_id = 1 if n % 2 else 2
+            offer = {"patient": n, "for": doctor_id}
+            self.backend.push_offer(offer, doctor_id=doctor_id)
+            pushed.append(offer)
+
+        start_at = time.time() + 0.5
+        doctors = [1] * self.workers_per_doctor + [2] * self.workers_per_doctor
+        results = self.pool.starmap(_drain_offers, [(self.host, d, start_at) for d in doctors])
+
+        popped = [offer["patient"] for worker in results for offer in worker]
+        self.assertEqual(len(popped), len(set(popped)), "an offer was delivered twice")
+        self.assertEqual(sorted(popped), list(range(300)))
+        for doctor_id, worker in zip(doctors, results):
+            self.assertTrue(all(offer["for"] == doctor_id for offer in worker))
+        # both doctors' workers shared the work rather than one process taking it all
+        self.assertGreater(sum(1 for worker in results if worker), 2)
+
+    def test_shared_offers_go_to_any_doctor_once(self):
+        for n in range(100):
+            self.backend.push_offer({"patient": n})
+        start_at = time.time() + 0.5
+        results = self.pool.starmap(_drain_offers, [(self.host, d, start_at) for d in (1, 2, 3, None)])
+        popped = sorted(offer["patient"] for worker in results for offer in worker)
+        self.assertEqual(popped, list(range(100)))
+
+    def test_an_answer_is_read_once(self):
+        self.backend.put_answer(42, {"sdp": "answer"})
+        start_at = time.time() + 0.5
+        results = self.pool.starmap(_race_answer, [(self.host, 42, start_at)] * 4)
+        self.assertEqual([answer for worker in results for answer in worker], [{"sdp": "answer"}])
+
+    def test_offers_and_answers_expire(self):
+        backend = RedisSignalingBackend(hosts=[self.host], offer_ttl=1, answer_ttl=1)
+        backend.push_offer({"patient": 1}, doctor_id=5)
+        backend.put_answer(1, {"sdp": "late"})
+        self.assertLessEqual(backend._redis.ttl(backend._offer_key("5")), 1)
+        time.sleep(1.2)
+        self.assertIsNone(backend.pop_offer(5))
+        self.assertIsNone(backend.pop_answer(1))
+        self.assertFalse(backend._redis.exists(backend._offer_key("5"), backend._answer_key(1)))
+
+    def test_expired_offers_are_skipped_in_favour_of_live_ones(self):
+        backend = RedisSignalingBackend(hosts=[self.host], offer_ttl=1)
+        backend.push_offer({"patient": "stale"}, doctor_id=5)
+        time.sleep(0.6)
+        backend.offer_ttl = 60
+        backend.push_offer({"patient": "fresh"}, doctor_id=5)  # refreshes the list's TTL
+        time.sleep(0.6)
+        self.assertEqual(backend.pop_offer(5), {"patient": "fresh"})
+
+
+class InMemorySignalingTests(SimpleTestCase):
+    def test_doctor_queue_falls_back_to_shared_offers(self):
+        backend = InMemorySignalingBackend()
+        backend.push_offer({"patient": 1}, doctor_id=7)
+        backend.push_offer({"patient": 2})
+        # another doctor sees only the shared offer
+        self.assertEqual(backend.pop_offer(8), {"patient": 2})
+        self.assertIsNone(backend.pop_offer(8))
+        self.assertEqual(backend.pop_offer(7), {"patient": 1})
+
+    def test_offers_expire(self):
+        backend = InMemorySignalingBackend(offer_ttl=0.05)
+        backend.push_offer({"patient": 1})
+        time.sleep(0.1)
+        self.assertIsNone(backend.pop_offer())
+
+
+class LongPollTests(SimpleTestCase):
+    def setUp(self):
+        reset_shared_state()
+
+    async def test_waiting_doctor_gets_an_offer_pushed_meanwhile(self):
+        waiting = asyncio.ensure_future(self.async_client.get("/VideoCall/DoctorPoll/wait/?doctor_id=3&timeout=5"))
+        await asyncio.sleep(0.1)
+        self.assertFalse(waiting.done())
+        get_signaling_backend().push_offer({"user_id": 1, "sdp": "offer"}, doctor_id=3)
+        response = await asyncio.wait_for(waiting, 2)
+        self.assertEqual(response.json(), {"user_id": 1, "sdp": "offer"})
+
+    async def test_waiting_patient_gets_the_answer(self):
+        waiting = asyncio.ensure_future(self.async_client.get("/VideoCall/patient_get_answer/wait/?user_id=9&timeout=5"))
+        await asyncio.sleep(0.1)
+        get_signaling_backend().put_answer(9, {"sdp": "answer"})
+        response = await asyncio.wait_for(waiting, 2)
+        self.assertEqual(response.json(), {"sdp": "answer"})
+
+    async def test_wait_times_out_empty(self):
+        started = time.monotonic()
+        response = await self.async_client.get("/VideoCall/DoctorPoll/wait/?timeout=0.2")
+        self.assertEqual(response.json(), {"status": "empty"})
+        self.assertLess(time.monotonic() - started, 2)
+
+    async def test_bad_timeout_is_rejected(self):
+        response = await self.async_client.get("/VideoCall/patient_get_answer/wait/?user_id=1&timeout=soon")
+        self.assertEqual(response.status_code, 400)
+
+
+class ConsultationConsumerTests(SimpleTestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.peers = []
+
+    async def join(self, role):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/consult/5/?role={role}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.peers.append(communicator)
+        return communicator
+
+    async def leave(self):
+        for communicator in self.peers:
+            await communicator.disconnect()
+
+    async def test_sdp_is_relayed_to_the_other_peer(self):
+        patient = await self.join("patient")
+        doctor = await self.join("doctor")
+        self.assertEqual(await patient.receive_json_from(), {"type": "peer", "event": "joined", "role": "doctor"})
+
+        await patient.send_json_to({"type": "offer", "sdp": "v=0 offer"})
+        self.assertEqual(await doctor.receive_json_from(), {"type": "offer", "sdp": "v=0 offer"})
+        await doctor.send_json_to({"type": "answer", "sdp": "v=0 answer"})
+        self.assertEqual(await patient.receive_json_from(), {"type": "answer", "sdp": "v=0 answer"})
+        # nothing echoed back to the sender
+        self.assertTrue(await doctor.receive_nothing(0.05))
+        await self.leave()
+
+    async def test_ice_candidates_are_deduplicated_and_batched(self):
+        patient = await self.join("patient")
+        doctor = await self.join("doctor")
+        await patient.receive_json_from()
+        for candidate in ("a", "a", "b"):
+            await patient.send_json_to({"type": "ice", "candidate": {"candidate": candidate}})
+        message = await doctor.receive_json_from()
+        self.assertEqual(message, {"type": "ice", "candidates": [{"candidate": "a"}, {"candidate": "b"}]})
+        await self.leave()
+
+    async def test_sdp_is_not_overtaken_by_earlier_candidates(self):
+        patient = await self.join("patient")
+        doctor = await self.join("doctor")
+        await patient.receive_json_from()
+        await patient.send_json_to({"type": "ice", "candidate": {"candidate": "a"}})
+        await patient.send_json_to({"type": "offer", "sdp": "v=0"})
+        self.assertEqual((await doctor.receive_json_from())["type"], "ice")
+        self.assertEqual((await doctor.receive_json_from())["type"], "offer")
+        await self.leave()
+
+    async def test_unknown_messages_get_an_error(self):
+        patient = await self.join("patient")
+        await patient.send_json_to({"type": "hello"})
+        self.assertEqual((await patient.receive_json_from())["type"], "error")
+        await self.leave()
+
+
+class IceCandidateLogTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.patient = get_user_model().objects.create(username="patient")
+
+    def post(self, path, data):
+        return self.client.post(path, data, content_type="application/json")
+
+    def test_candidates_are_read_after_a_cursor(self):
+        offer = self.post("/VideoCall/CreateOffer/", {
+            "user_id": self.patient.pk, "sdp": "offer", "ice_candidates": [{"c": 1}],
+        })
+        self.assertEqual(offer.status_code, 201)
+        self.assertEqual(self.post("/VideoCall/candidates/", {
+            "user_id": self.patient.pk, "role": "patient", "candidates": [{"c": 2}, {"c": 3}],
+        }).json(), {"seq": 3})
+
+        doctor_view = self.client.get("/VideoCall/DoctorPoll/")
+        self.assertEqual(doctor_view.json()["ice_seq"], 1)
+        later = self.client.get(f"/VideoCall/candidates/?user_id={self.patient.pk}&role=patient&after=1")
+        self.assertEqual(later.json(), {"candidates": [{"c": 2}, {"c": 3}], "seq": 3})
+        caught_up = self.client.get(f"/VideoCall/candidates/?user_id={self.patient.pk}&role=patient&after=3")
+        self.assertEqual(caught_up.json(), {"candidates": [], "seq": 3})
+
+    def test_roles_have_separate_logs(self):
+        self.post("/VideoCall/candidates/", {"user_id": 1, "role": "doctor", "candidate": {"c": "d"}})
+        patient_log = self.client.get("/VideoCall/candidates/?user_id=1&role=patient")
+        doctor_log = self.client.get("/VideoCall/candidates/?user_id=1&role=doctor")
+        self.assertEqual(patient_log.json(), {"candidates": [], "seq": 0})
+        self.assertEqual(doctor_log.json(), {"candidates": [{"c": "d"}], "seq": 1})
+
+    def test_a_new_offer_starts_a_fresh_log(self):
+        self.post("/VideoCall/candidates/", {"user_id": self.patient.pk, "role": "patient", "candidates": [{"c": 1}]})
+        self.post("/VideoCall/CreateOffer/", {"user_id": self.patient.pk, "sdp": "again"})
+        log = self.client.get(f"/VideoCall/candidates/?user_id={self.patient.pk}&role=patient")
+        self.assertEqual(log.json(), {"candidates": [], "seq": 0})
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get("/VideoCall/candidates/?user_id=1&role=nurse").status_code, 400)
+        self.assertEqual(self.client.get("/VideoCall/candidates/?user_id=1&role=doctor&after=x").status_code, 400)
+        response = self.post("/VideoCall/candidates/", {"user_id": 1, "role": "doctor", "candidates": "x"})
+        self.assertEqual(response.status_code, 400)
@@ -1,7 +1,11 @@
 from django.urls import path
-from .views import patient_get_answer,doctor_poll_view,create_offer
+from .views import patient_get_answer,doctor_poll_view,create_offer,doctor_wait_offer,patient_wait_answer,ice_candidates_view
 urlpatterns = [
     path('CreateOffer/', create_offer, name='CreateOffer'),
     path('DoctorPoll/', doctor_poll_view, name='DoctorPoll'),
     path('patient_get_answer/', patient_get_answer, name='patient_get_answer'),   
+    path('candidates/', ice_candidates_view, name='ice_candidates'),
+    # long-poll variants
+    path('DoctorPoll/wait/', doctor_wait_offer, name='DoctorPollWait'),
+    path('patient_get_answer/wait/', patient_wait_answer, name='patient_get_answer_wait'),
 ]
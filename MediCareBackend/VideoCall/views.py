@@ -3,17 +3,19 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import get_user_model
-import json
-from collections import deque
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .signaling import CANDIDATE_ROLES, DEFAULT_WAIT, SignalingUnavailable, get_signaling_backend
 
 User = get_user_model()
 
-# --- In-memory storage for simple signaling (Not for production with multiple workers) ---
-# Queue for patients waiting for a doctor
-offer_queue = deque()
-# Dictionary to hold a doctor's answer, keyed by the patient's user_id
-answer_dict = {}
-# --------------------------------------------------------------------------------------
+# upper bound for ?timeout= on the long-poll endpoints, below typical proxy read timeouts
+LONG_POLL_MAX_WAIT = 55
+
+
+def _signaling_unavailable():
+    return Response({"error": "Signaling service unavailable"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
 # -------------------- 1. Patient creates an offer --------------------
@@ -21,11 +23,15 @@ answer_dict = {}
 def create_offer(request):
     """
     Patient sends their SDP offer and ICE candidates.
-    The offer is added to a queue for a doctor to pick up.
+    The offer is added to a queue for a doctor to pick up: the given
+    doctor_id's queue if provided, otherwise the shared one.
+    Starts a fresh ICE candidate log for the session (the patient's user_id);
+    candidates gathered later are trickled through /VideoCall/candidates/.
     """
     user_id = request.data.get("user_id")
     sdp = request.data.get("sdp")
     ice_candidates = request.data.get("ice_candidates", [])
+    doctor_id = request.data.get("doctor_id")
 
     if not all([user_id, sdp]):
         return Response({"error": "user_id and sdp are required"}, status=status.HTTP_400_BAD_REQUEST)
@@ -36,14 +42,20 @@ def create_offer(request):
     except User.DoesNotExist:
         return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # NOTE: Removed the unnecessary database save. The in-memory queue is sufficient.
-
     # Add the patient's offer to the queue
-    offer_queue.append({
-        "user_id": user_id,
-        "sdp": sdp,
-        "ice_candidates": ice_candidates
-    })
+    signaling = get_signaling_backend()
+    try:
+        signaling.clear_candidates(user_id)
+        ice_seq = signaling.append_candidates(user_id, "patient", ice_candidates)
+        signaling.push_offer({
+            "user_id": user_id,
+            "sdp": sdp,
+            "ice_candidates": ice_candidates,
+            # cursor for /VideoCall/candidates/?role=patient&after=
+            "ice_seq": ice_seq,
+        }, doctor_id=doctor_id)
+    except SignalingUnavailable:
+        return _signaling_unavailable()
     return Response({"status": "queued", "user_id": user_id}, status=status.HTTP_201_CREATED)
 
 
@@ -51,16 +63,22 @@ def create_offer(request):
 @api_view(["GET", "POST"])
 def doctor_poll_view(request):
     """
-    GET: Doctor polls this endpoint to get the next patient's offer from the queue.
+    GET: Doctor polls this endpoint to get the next patient's offer from the queue
+         (?doctor_id= takes offers addressed to that doctor first, then the shared queue).
     POST: Doctor sends back an SDP answer and ICE candidates for a specific patient.
     """
+    signaling = get_signaling_backend()
+
     if request.method == "GET":
-        if not offer_queue:
+        try:
+            patient_offer = signaling.pop_offer(doctor_id=request.query_params.get("doctor_id"))
+        except SignalingUnavailable:
+            return _signaling_unavailable()
+
+        if patient_offer is None:
             # No patients are waiting
             return Response({"status": "empty"}, status=status.HTTP_200_OK)
 
-        # Get the next patient from the queue
-        patient_offer = offer_queue.popleft()
         return Response(patient_offer, status=status.HTTP_200_OK)
 
     elif request.method == "POST":
@@ -71,11 +89,16 @@ def doctor_poll_view(request):
         if not all([patient_id, sdp]):
             return Response({"error": "patient_id and sdp are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Store the answer in our dictionary, ensuring the key is a string for consistency.
-        answer_dict[str(patient_id)] = {
-            "sdp": sdp,
-            "ice_candidates": ice_candidates
-        }
+        try:
+            ice_seq = signaling.append_candidates(patient_id, "doctor", ice_candidates)
+            signaling.put_answer(patient_id, {
+                "sdp": sdp,
+                "ice_candidates": ice_candidates,
+                # cursor for /VideoCall/candidates/?role=doctor&after=
+                "ice_seq": ice_seq,
+            })
+        except SignalingUnavailable:
+            return _signaling_unavailable()
         return Response({"status": "answer stored"}, status=status.HTTP_200_OK)
 
 
@@ -91,14 +114,114 @@ def patient_get_answer(request):
     if not user_id:
         return Response({"error": "user_id query parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-    # **FIXED LOGIC HERE**
     # Atomically get and remove the answer for the user_id.
-    # Using .pop() with a default value of None is clean and safe.
-    answer = answer_dict.pop(str(user_id), None)
+    try:
+        answer = get_signaling_backend().pop_answer(user_id)
+    except SignalingUnavailable:
+        return _signaling_unavailable()
 
     if answer:
         # If an answer was found, return it
         return Response(answer, status=status.HTTP_200_OK)
     else:
         # If no answer is ready for this user_id, let them know.
-        return Response({"status": "no answer yet"}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({"status": "no answer yet"}, status=status.HTTP_200_OK)
+
+
+# -------------------- 4. Trickle ICE candidates --------------------
+@api_view(["GET", "POST"])
+def ice_candidates_view(request):
+    """
+    Append-only ICE candidate log per session (the patient's user_id) and sender role.
+
+    POST {"user_id", "role": "patient"|"doctor", "candidates": [...]} appends and
+         returns the new last sequence number.
+    GET ?user_id=&role=&after=N returns the candidates the `role` peer sent
+         after sequence N, plus the cursor to pass as `after` next time.
+    """
+    data = request.data if request.method == "POST" else request.query_params
+    user_id = data.get("user_id")
+    role = data.get("role")
+
+    if not user_id or role not in CANDIDATE_ROLES:
+        return Response({"error": "user_id and role (patient or doctor) are required"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    signaling = get_signaling_backend()
+
+    if request.method == "POST":
+        candidates = data.get("candidates")
+        if candidates is None and "candidate" in data:
+            candidates = [data.get("candidate")]
+        if not isinstance(candidates, list):
+            return Response({"error": "candidates must be a list"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            seq = signaling.append_candidates(user_id, role, candidates)
+        except SignalingUnavailable:
+            return _signaling_unavailable()
+        return Response({"seq": seq}, status=status.HTTP_201_CREATED)
+
+    after = data.get("after", "0")
+    if not after.isdigit():
+        return Response({"error": "after must be a sequence number"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        candidates, seq = signaling.candidates_since(user_id, role, after=int(after))
+    except SignalingUnavailable:
+        return _signaling_unavailable()
+    return Response({"candidates": candidates, "seq": seq}, status=status.HTTP_200_OK)
+
+
+# -------------------- 5. Long-poll variants (async, served by the ASGI app) --------------------
+def _long_poll_timeout(request):
+    try:
+        timeout = float(request.GET.get("timeout", DEFAULT_WAIT))
+    except ValueError:
+        return None
+    return max(0.0, min(timeout, LONG_POLL_MAX_WAIT))
+
+
+@require_GET
+async def doctor_wait_offer(request):
+    """
+    Long-poll variant of doctor_poll_view GET: the request parks until an offer
+    arrives (for ?doctor_id= or the shared queue) or ?timeout= seconds pass
+    (default 25, max 55), then answers exactly like the polling endpoint.
+    """
+    timeout = _long_poll_timeout(request)
+    if timeout is None:
+        return JsonResponse({"error": "timeout must be a number of seconds"}, status=400)
+
+    try:
+        patient_offer = await get_signaling_backend().wait_offer(
+            doctor_id=request.GET.get("doctor_id"), timeout=timeout
+        )
+    except SignalingUnavailable:
+        return JsonResponse({"error": "Signaling service unavailable"}, status=503)
+
+    if patient_offer is None:
+        return JsonResponse({"status": "empty"})
+    return JsonResponse(patient_offer)
+
+
+@require_GET
+async def patient_wait_answer(request):
+    """
+    Long-poll variant of patient_get_answer: parks until the doctor's answer for
+    ?user_id= arrives or ?timeout= seconds pass (default 25, max 55).
+    """
+    user_id = request.GET.get("user_id")
+    if not user_id:
+        return JsonResponse({"error": "user_id query parameter is required"}, status=400)
+
+    timeout = _long_poll_timeout(request)
+    if timeout is None:
+        return JsonResponse({"error": "timeout must be a number of seconds"}, status=400)
+
+    try:
+        answer = await get_signaling_backend().wait_answer(user_id, timeout=timeout)
+    except SignalingUnavailable:
+        return JsonResponse({"error": "Signaling service unavailable"}, status=503)
+
+    if answer is None:
+        return JsonResponse({"status": "no answer yet"})
+    return JsonResponse(answer)
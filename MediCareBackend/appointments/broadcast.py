@@ -0,0 +1,75 @@
+# broadcast.py
+"""
+Fan out appointment state changes to the doctor/date queue channel group,
+so reception and patient screens subscribed over WebSocket
+(appointments.consumers.DoctorQueueConsumer) see them without polling.
+"""
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import queue as appointment_queue
+from .eta import predicted_start, queue_clock
+from .signals import appointment_status_changed
+
+logger = logging.getLogger(__name__)
+
+
+def queue_group_name(doctor_id, the_date):
+    return f"queue_{doctor_id}_{the_date.isoformat()}"
+
+
+def clock_message(clock):
+    """
+    ``queue_clock`` as sent to clients: the patient at position p is
+    expected at first_start + p * minutes_per_patient. None when the day
+    has no predictions.
+    """
+    if clock is None:
+        return None
+    first_start, step = clock
+    return {"first_start": first_start.isoformat(), "minutes_per_patient": round(step.total_seconds() / 60, 2)}
+
+
+def queue_delta(appointment, position=None, clock=None):
+    """
+    Compact message describing one appointment's new state, with the queue
+    clock: every change can move everyone's ETA (a cancellation moves the
+    queue up, a completion updates the average consultation), so clients
+    recompute all of them from it rather than only the changed one.
+    """
+    eta = predicted_start(clock, position)
+    return {
+        "id": appointment.pk,
+        "number": appointment.appointment_number,
+        "status": appointment.status,
+        "position": position,
+        "eta": eta.isoformat() if eta else None,
+        "clock": clock_message(clock),
+    }
+
+
+# connected after the queue's and the ETA model's receivers (this module imports
+# both), so their on_commit updates have run by the time the delta is built
+@receiver(appointment_status_changed)
+def _broadcast_status_change(sender, appointment, previous_status, **kwargs):
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        doctor_id, the_date = appointment.doctor_id, appointment.appointment_date
+        position = None
+        if appointment.status == "booked":
+            position = appointment_queue.appointment_position(doctor_id, the_date, appointment.appointment_number)
+        try:
+            async_to_sync(channel_layer.group_send)(
+                queue_group_name(doctor_id, the_date),
+                {"type": "queue.delta", "delta": queue_delta(appointment, position, queue_clock(doctor_id, the_date))},
+            )
+        except Exception:
+            # a dead channel layer must not fail the request that changed the appointment
+            logger.exception("could not broadcast change of appointment %s", appointment.pk)
+
+    transaction.on_commit(send)
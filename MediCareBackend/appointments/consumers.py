@@ -0,0 +1,64 @@
+# consumers.py
+from datetime import date as date_cls
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.utils import timezone
+
+from . import queue as appointment_queue
+from .broadcast import clock_message, queue_group_name
+from .eta import predicted_start, queue_clock
+
+
+class DoctorQueueConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/queue/<doctor_id>/[<YYYY-MM-DD>/]
+
+    Sends a snapshot of the doctor's queue on connect, then one compact delta
+    ({"id", "number", "status", "position", "eta", "clock"}) per appointment
+    state change. Both carry the queue clock ({"first_start",
+    "minutes_per_patient"}, or null for days without predictions): clients
+    keep the queue's numbers in order, apply each delta to it, and recompute
+    every ETA as first_start + position * minutes_per_patient.
+    """
+
+    async def connect(self):
+        kwargs = self.scope["url_route"]["kwargs"]
+        self.doctor_id = int(kwargs["doctor_id"])
+        try:
+            self.the_date = date_cls.fromisoformat(kwargs["date"]) if kwargs.get("date") else timezone.localdate()
+        except ValueError:
+            await self.close(code=4400)
+            return
+
+        self.group_name = queue_group_name(self.doctor_id, self.the_date)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        queue, clock = await self._snapshot()
+        await self.send_json({"type": "snapshot", "queue": queue, "clock": clock_message(clock)})
+
+    async def disconnect(self, code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # read-only feed: clients only listen
+        pass
+
+    async def queue_delta(self, event):
+        await self.send_json({"type": "delta", **event["delta"]})
+
+    @database_sync_to_async
+    def _snapshot(self):
+        entries = appointment_queue.queue_entries(self.doctor_id, self.the_date)
+        clock = queue_clock(self.doctor_id, self.the_date)
+        queue = [
+            {
+                "id": e["id"],
+                "number": e["appointment_number"],
+                "status": e["status"],
+                "eta": clock and predicted_start(clock, position).isoformat(),
+            }
+            for position, e in enumerate(entries)
+        ]
+        return queue, clock
@@ -0,0 +1,166 @@
+# bench_booking.py
+import json
+import logging
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+
+from Doctor.models import Doctor
+from MediCareBackend.benchmarking import benchmark_database, percentile, run_concurrently
+from MediCareBackend.db import sqlite_options
+from appointments.models import Appointment, DailyAppointmentCounter
+from appointments.signals import appointment_status_changed
+
+User = get_user_model()
+
+
+def _legacy_book(doctor, patient, appointment_date, notes=""):
+    """
+    The previous booking path: lock the counter row in its own transaction,
+    then insert the appointment in a second round trip. It notifies the same
+    appointment_status_changed receivers as Appointment.book, so the two runs
+    differ only in how the number is allocated.
+    """
+    with transaction.atomic():
+        counter, _ = DailyAppointmentCounter.objects.select_for_update().get_or_create(
+            doctor=doctor, date=appointment_date, defaults={"last": 0}
+        )
+        counter.last += 1
+        counter.save(update_fields=["last"])
+        number = counter.last
+
+    with transaction.atomic():
+        appointment = Appointment.objects.create(
+            doctor=doctor,
+            patient=patient,
+            appointment_date=appointment_date,
+            appointment_number=number,
+            status="booked",
+            notes=notes,
+        )
+        appointment_status_changed.send(sender=Appointment, appointment=appointment, previous_status=None)
+    return appointment
+
+
+ALLOCATORS = {
+    "legacy": lambda: mock.patch.object(Appointment, "book", staticmethod(_legacy_book)),
+    "atomic": contextmanager(lambda: (yield)),
+}
+
+
+SQLITE_PROFILES = {"tuned": True, "plain": False}
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer BookAppointmentByPhoneAPIView for a single doctor from concurrent "
+        "threads and report bookings/sec for the legacy and atomic number allocators. "
+        "With --readers, that many more threads poll the doctor's queue meanwhile. "
+        "On SQLite, --sqlite-profile compares the tuned connection settings with "
+        "the driver defaults. Runs against a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--bookings", type=int, default=50, help="bookings per worker")
+        parser.add_argument("--readers", type=int, default=0, help="threads reading the queue while booking")
+        parser.add_argument("--allocator", choices=[*ALLOCATORS, "both"], default="both")
+        parser.add_argument("--sqlite-profile", choices=[*SQLITE_PROFILES, "both"], default="tuned")
+
+    def handle(self, *args, **options):
+        workers, bookings, readers = options["workers"], options["bookings"], options["readers"]
+        allocators = list(ALLOCATORS) if options["allocator"] == "both" else [options["allocator"]]
+        profiles = [None]
+        if connection.vendor == "sqlite":
+            profile = options["sqlite_profile"]
+            profiles = list(SQLITE_PROFILES) if profile == "both" else [profile]
+
+        # failed bookings are counted and summarised below; keep their tracebacks out of the report
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+        configured_options = connection.settings_dict["OPTIONS"]
+        try:
+            for profile in profiles:
+                if profile is not None:
+                    # worker threads build their connections from this same settings dict
+                    connection.settings_dict["OPTIONS"] = sqlite_options(SQLITE_PROFILES[profile])
+                with benchmark_database():
+                    doctor_user = User.objects.create(username="bench-doctor", first_name="Bench")
+                    doctor = Doctor.objects.create(user=doctor_user, designation="General")
+                    # bulk_create skips save(), which is what fills phone_normalized
+                    phones = [f"90000{n:05d}" for n in range(workers)]
+                    User.objects.bulk_create(
+                        User(username=f"bench-patient-{n}", phone_number=phone, phone_normalized=phone)
+                        for n, phone in enumerate(phones)
+                    )
+
+                    for offset, name in enumerate(allocators, start=1):
+                        # a fresh date per run so every run starts from an empty counter
+                        the_date = timezone.localdate() + timedelta(days=offset)
+                        label = name if profile is None else f"{profile}/{name}"
+                        with ALLOCATORS[name]():
+                            self._run(label, doctor, the_date, workers, bookings, readers)
+        finally:
+            connection.settings_dict["OPTIONS"] = configured_options
+
+    def _run(self, name, doctor, the_date, workers, bookings, readers):
+        clients = [Client() for _ in range(workers + readers)]
+        book_latencies, read_latencies = [], []
+
+        def book(worker, i):
+            t0 = time.perf_counter()
+            response = clients[worker].post(
+                "/appointments/book/",
+                data=json.dumps({
+                    "doctor_name": "Bench",
+                    "phone_number": f"90000{worker:05d}",
+                    "appointment_date": the_date.isoformat(),
+                }),
+                content_type="application/json",
+            )
+            if response.status_code != 201:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.content[:200]!r}")
+            book_latencies.append(time.perf_counter() - t0)
+
+        def read(worker, i):
+            t0 = time.perf_counter()
+            response = clients[worker].get(f"/appointments/doctor/{doctor.pk}/queue/")
+            if response.status_code != 200:
+                raise RuntimeError(f"read HTTP {response.status_code}: {response.content[:200]!r}")
+            read_latencies.append(time.perf_counter() - t0)
+
+        def task(worker, i):
+            return book(worker, i) if worker < workers else read(worker, i)
+
+        elapsed, _, errors = run_concurrently(task, workers + readers, bookings)
+        booked = len(book_latencies)
+
+        numbers = list(
+            Appointment.objects.filter(doctor=doctor, appointment_date=the_date)
+            .order_by("appointment_number")
+            .values_list("appointment_number", flat=True)
+        )
+        gapless = numbers == list(range(1, len(numbers) + 1))
+
+        self.stdout.write(
+            f"{name:>7}: {booked} bookings in {elapsed:.2f}s "
+            f"= {booked / elapsed:.1f} bookings/sec | "
+            f"p50 {percentile(book_latencies, 50) * 1000:.1f}ms "
+            f"p99 {percentile(book_latencies, 99) * 1000:.1f}ms | "
+            f"errors {len(errors)} | numbering {'gapless' if gapless else 'HAS GAPS'}"
+        )
+        if readers:
+            self.stdout.write(
+                f"{'':>7}  {len(read_latencies)} queue reads = {len(read_latencies) / elapsed:.1f} reads/sec | "
+                f"p50 {percentile(read_latencies, 50) * 1000:.1f}ms "
+                f"p99 {percentile(read_latencies, 99) * 1000:.1f}ms"
+            )
+        for exc in errors[:3]:
+            self.stdout.write(f"         e.g. {exc}")
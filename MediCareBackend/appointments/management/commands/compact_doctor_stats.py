@@ -0,0 +1,40 @@
+# compact_doctor_stats.py
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from appointments.models import Appointment, DoctorDailyStats
+from appointments.stats import compact_daily_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute DoctorDailyStats rows from the appointments, correcting any drift "
+        "from changes that bypassed the status transitions. Run nightly: by default "
+        "only yesterday, the day just closed. --since rebuilds a range of past days; "
+        "--all rebuilds everything."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="first day to recompute (YYYY-MM-DD); the last is yesterday")
+        parser.add_argument("--all", action="store_true", help="recompute every day, including today")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        if options["all"]:
+            since = until = None
+        else:
+            try:
+                since = date.fromisoformat(options["since"]) if options["since"] else yesterday
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+            # today is still changing; it is kept current by the status transitions
+            until = yesterday
+
+        rows = compact_daily_stats(
+            Appointment, DoctorDailyStats, since=since, until=until, batch_size=options["batch_size"]
+        )
+        span = "all days" if since is None else f"{since} to {until}"
+        self.stdout.write(self.style.SUCCESS(f"{rows} doctor-day rows recomputed for {span}"))
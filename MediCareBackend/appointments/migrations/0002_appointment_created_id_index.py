@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Doctor', '0002_doctor_designation'),
+        ('appointments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-created_at', '-id'], name='appt_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Doctor', '0002_doctor_designation'),
+        ('appointments', '0002_appointment_created_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'booked')), fields=['doctor', 'appointment_date', 'appointment_number'], name='appt_booked_queue_idx'),
+        ),
+    ]
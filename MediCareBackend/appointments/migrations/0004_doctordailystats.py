@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:02
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+# appointments.eta.MAX_CONSULTATION as of this migration
+MAX_CONSULTATION = timedelta(hours=4)
+
+
+def consultation_seconds(actual_start, actual_end):
+    # appointments.eta.consultation_seconds as of this migration
+    if actual_start is None or actual_end is None:
+        return None
+    length = actual_end - actual_start
+    if not timedelta(0) < length <= MAX_CONSULTATION:
+        return None
+    return length.total_seconds()
+
+
+def compact_daily_stats(appointment_model, stats_model, batch_size=2000):
+    # appointments.stats.compact_daily_stats as of this migration, over all days
+    rows = {
+        (row["doctor_id"], row["appointment_date"]): stats_model(
+            doctor_id=row["doctor_id"],
+            date=row["appointment_date"],
+            booked=row["booked"],
+            completed=row["completed"],
+            cancelled=row["cancelled"],
+        )
+        for row in appointment_model.objects.order_by().values("doctor_id", "appointment_date").annotate(
+            booked=Count("id"),
+            completed=Count("id", filter=Q(status="completed")),
+            cancelled=Count("id", filter=Q(status="cancelled")),
+        )
+    }
+    completed = (
+        appointment_model.objects.filter(status="completed", actual_start__isnull=False, actual_end__isnull=False)
+        .values_list("doctor_id", "appointment_date", "actual_start", "actual_end")
+    )
+    for doctor_id, the_date, actual_start, actual_end in completed.iterator(chunk_size=batch_size):
+        seconds = consultation_seconds(actual_start, actual_end)
+        if seconds is not None:
+            rows[doctor_id, the_date].total_minutes += seconds / 60
+
+    stats_model.objects.all().delete()
+    stats_model.objects.bulk_create(rows.values(), batch_size=batch_size)
+
+
+def backfill(apps, schema_editor):
+    compact_daily_stats(apps.get_model("appointments", "Appointment"), apps.get_model("appointments", "DoctorDailyStats"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Doctor', '0002_doctor_designation'),
+        ('appointments', '0003_appointment_booked_queue_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('total_minutes', models.FloatField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='Doctor.doctor')),
+            ],
+            options={
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+        # roll up the appointments made before the rollup existed
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:37
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import migrations, models
+
+# appointments.eta.MAX_CONSULTATION as of this migration
+MAX_CONSULTATION = timedelta(hours=4)
+
+
+def count_timed_completions(apps, schema_editor):
+    Appointment = apps.get_model("appointments", "Appointment")
+    DoctorDailyStats = apps.get_model("appointments", "DoctorDailyStats")
+
+    # the completions whose length total_minutes already includes
+    # (appointments.eta.consultation_seconds as of this migration)
+    timed = Counter()
+    completed = (
+        Appointment.objects.filter(status="completed", actual_start__isnull=False, actual_end__isnull=False)
+        .values_list("doctor_id", "appointment_date", "actual_start", "actual_end")
+    )
+    for doctor_id, the_date, actual_start, actual_end in completed.iterator(chunk_size=2000):
+        if timedelta(0) < actual_end - actual_start <= MAX_CONSULTATION:
+            timed[doctor_id, the_date] += 1
+
+    rows = []
+    for row in DoctorDailyStats.objects.only("doctor_id", "date").iterator(chunk_size=2000):
+        row.timed_completed = timed[row.doctor_id, row.date]
+        if row.timed_completed:
+            rows.append(row)
+    DoctorDailyStats.objects.bulk_update(rows, ["timed_completed"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_doctordailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctordailystats',
+            name='timed_completed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_timed_completions, migrations.RunPython.noop),
+    ]
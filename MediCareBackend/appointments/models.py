@@ -1,10 +1,12 @@
 # models.py
-from django.db import models, transaction
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 from datetime import date
 
 from Doctor.models import Doctor  # adjust if your Doctor model path differs
+from .signals import appointment_status_changed
 
 
 class DailyAppointmentCounter(models.Model):
@@ -23,6 +25,33 @@ class DailyAppointmentCounter(models.Model):
         return f"{self.doctor} - {self.date}: {self.last}"
 
 
+def _bump_counter(doctor_id, the_date):
+    """
+    Atomically increment DailyAppointmentCounter.last and return the new value,
+    or None if there is no counter row yet.
+
+    Uses a single ``UPDATE ... RETURNING`` round trip where the backend supports
+    it (SQLite >= 3.35, PostgreSQL); otherwise the UPDATE takes the row lock and
+    the value is read back inside the same transaction.
+    """
+    if connection.vendor in ("sqlite", "postgresql"):
+        qn = connection.ops.quote_name
+        table, last = qn(DailyAppointmentCounter._meta.db_table), qn("last")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET {last} = {last} + 1 "
+                f"WHERE {qn('doctor_id')} = %s AND {qn('date')} = %s RETURNING {last}",
+                [doctor_id, connection.ops.adapt_datefield_value(the_date)],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    counters = DailyAppointmentCounter.objects.filter(doctor_id=doctor_id, date=the_date)
+    if not counters.update(last=F("last") + 1):
+        return None
+    return counters.values_list("last", flat=True).get()
+
+
 class Appointment(models.Model):
     STATUS_CHOICES = [
         ("booked", "Booked"),
@@ -47,6 +76,16 @@ class Appointment(models.Model):
     class Meta:
         unique_together = ("doctor", "appointment_date", "appointment_number")
         ordering = ("appointment_date", "appointment_number")
+        indexes = [
+            # keyset pagination of the appointment list (newest first)
+            models.Index(fields=["-created_at", "-id"], name="appt_created_id_idx"),
+            # the doctor's live queue: booked appointments of a day in number order
+            models.Index(
+                fields=["doctor", "appointment_date", "appointment_number"],
+                condition=models.Q(status="booked"),
+                name="appt_booked_queue_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.doctor} | {self.appointment_date} | #{self.appointment_number} ({self.status})"
@@ -54,19 +93,96 @@ class Appointment(models.Model):
     # --- appointment number generator ---
     @classmethod
     def issue_appointment_number(cls, doctor, appointment_date):
-        # avoid circular import if this file is imported elsewhere
-        with transaction.atomic():
-            counter, created = DailyAppointmentCounter.objects.select_for_update().get_or_create(
+        """
+        Increment and return the counter for (doctor, appointment_date).
+
+        Must be called inside the transaction that inserts the appointment:
+        the counter bump and the insert then commit (or roll back) together,
+        so a failed booking never leaves a gap in the numbering.
+        """
+        number = _bump_counter(doctor.pk, appointment_date)
+        if number is None:
+            # first booking of the day for this doctor: create the counter row.
+            # A concurrent first booking may win the insert, so ignore the
+            # conflict and bump again.
+            DailyAppointmentCounter.objects.bulk_create(
+                [DailyAppointmentCounter(doctor_id=doctor.pk, date=appointment_date, last=0)],
+                ignore_conflicts=True,
+            )
+            number = _bump_counter(doctor.pk, appointment_date)
+        return number
+
+    @classmethod
+    def book(cls, doctor, patient, appointment_date, notes=""):
+        """
+        Issue the next number and insert the appointment in one transaction.
+        """
+        # no savepoint inside a caller's transaction: two fewer statements while
+        # the counter row is locked, and a failure here fails the whole booking anyway
+        with transaction.atomic(savepoint=False):
+            appointment = cls.objects.create(
                 doctor=doctor,
-                date=appointment_date,
-                defaults={"last": 0},
+                patient=patient,
+                appointment_date=appointment_date,
+                appointment_number=cls.issue_appointment_number(doctor, appointment_date),
+                status="booked",
+                notes=notes,
+            )
+            appointment_status_changed.send(sender=cls, appointment=appointment, previous_status=None)
+        return appointment
+
+    # --- status transitions ---
+    def start(self):
+        self._set_status("in_progress", actual_start=timezone.now())
+
+    def complete(self):
+        self._set_status("completed", actual_end=timezone.now())
+
+    def cancel(self):
+        self._set_status("cancelled")
+
+    def _set_status(self, new_status, **fields):
+        """
+        Save the new status (plus any timestamp fields) and notify
+        appointment_status_changed receivers in the same transaction.
+        """
+        previous_status = self.status
+        self.status = new_status
+        for name, value in fields.items():
+            setattr(self, name, value)
+        with transaction.atomic():
+            self.save(update_fields=["status", *fields])
+            appointment_status_changed.send(
+                sender=type(self), appointment=self, previous_status=previous_status
             )
-            counter.last += 1
-            counter.save(update_fields=["last"])
-            return counter.last
 
     @classmethod
     def appointments_for_date(cls, doctor, the_date=None):
         if the_date is None:
             the_date = timezone.localdate()
         return cls.objects.filter(doctor=doctor, appointment_date=the_date).order_by("appointment_number")
+
+
+class DoctorDailyStats(models.Model):
+    """
+    Per doctor and day rollup of appointments, for reporting without
+    scanning Appointment: booked counts every appointment made for the day,
+    completed and cancelled those that ended that way, total_minutes the
+    summed length of the completed consultations and timed_completed how
+    many of them had a usable length. Kept up to date on each
+    status change (appointments.stats) and recomputed nightly by the
+    compact_doctor_stats command.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField()
+    booked = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    timed_completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    total_minutes = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ("doctor", "date")
+
+    def __str__(self):
+        return f"{self.doctor} - {self.date}: {self.booked} booked, {self.completed} completed"
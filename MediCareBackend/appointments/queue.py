@@ -0,0 +1,409 @@
+# queue.py
+"""
+Live per-(doctor, date) queue of booked appointments.
+
+The queue is kept in sync from appointment_status_changed, so "next
+appointment", "position of patient X" and "queue length" are answered from
+the queue backend (a Redis sorted set keyed by appointment_number, or an
+in-process structure) instead of SQL. A cold queue is loaded from the
+database once and reloaded every QUEUE_RELOAD_INTERVAL seconds, so it heals
+itself after a Redis restart or a missed update. Every add and remove bumps
+the queue's version, and a load only replaces the queue if the version it
+read before querying is still current, so a booking or cancel that commits
+while the rows are being read is never overwritten by them.
+
+Configure with settings.APPOINTMENT_QUEUE:
+
+    APPOINTMENT_QUEUE = {
+        "BACKEND": "appointments.queue.RedisQueueBackend",
+        "CONFIG": {"hosts": [("127.0.0.1", 6379)]},
+    }
+
+Without it the in-process backend is used (fine for tests and a single
+worker). If the backend is unreachable, reads fall back to the database.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from MediCareBackend.prefetch import optimize_queryset
+
+from .signals import appointment_status_changed
+
+logger = logging.getLogger(__name__)
+
+QUEUE_RELOAD_INTERVAL = 300  # seconds
+QUEUE_KEY_TTL = 2 * 24 * 60 * 60  # keep a day's queue around a little longer than the day
+QUEUE_LOAD_ATTEMPTS = 3
+
+
+class QueueUnavailable(Exception):
+    """Raised by a backend when its store cannot be reached."""
+
+
+# -----------------------
+# Backends
+# -----------------------
+class InMemoryQueueBackend:
+    """
+    Process-local queues: a sorted list of appointment numbers per
+    (doctor, date) plus the entries and each patient's sorted numbers.
+    """
+
+    def __init__(self, **config):
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._versions = {}
+
+    def _queue(self, key):
+        return self._queues.setdefault(key, {"numbers": [], "entries": {}, "patients": {}, "loaded_at": None})
+
+    def is_loaded(self, key):
+        with self._lock:
+            q = self._queues.get(key)
+            return bool(q and q["loaded_at"] and time.monotonic() - q["loaded_at"] < QUEUE_RELOAD_INTERVAL)
+
+    def version(self, key):
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def replace(self, key, entries, version=None):
+        patients = {}
+        for e in entries:
+            bisect.insort(patients.setdefault(str(e["patient"]), []), e["appointment_number"])
+        with self._lock:
+            if version is not None and self._versions.get(key, 0) != version:
+                return False
+            self._queues[key] = {
+                "numbers": sorted(e["appointment_number"] for e in entries),
+                "entries": {e["appointment_number"]: e for e in entries},
+                "patients": patients,
+                "loaded_at": time.monotonic(),
+            }
+            return True
+
+    def add(self, key, entry):
+        number = entry["appointment_number"]
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            q = self._queue(key)
+            if number not in q["entries"]:
+                bisect.insort(q["numbers"], number)
+                bisect.insort(q["patients"].setdefault(str(entry["patient"]), []), number)
+            q["entries"][number] = entry
+
+    def remove(self, key, number, patient_id):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            q = self._queue(key)
+            if q["entries"].pop(number, None) is None:
+                return
+            del q["numbers"][bisect.bisect_left(q["numbers"], number)]
+            numbers = q["patients"].get(str(patient_id), [])
+            if number in numbers:
+                numbers.remove(number)
+                if not numbers:
+                    del q["patients"][str(patient_id)]
+
+    def first(self, key):
+        with self._lock:
+            q = self._queue(key)
+            return q["entries"][q["numbers"][0]] if q["numbers"] else None
+
+    def entries(self, key):
+        with self._lock:
+            q = self._queue(key)
+            return [q["entries"][n] for n in q["numbers"]]
+
+    def length(self, key):
+        with self._lock:
+            return len(self._queue(key)["numbers"])
+
+    def rank(self, key, number):
+        with self._lock:
+            q = self._queue(key)
+            return bisect.bisect_left(q["numbers"], number) if number in q["entries"] else None
+
+    def position(self, key, patient_id):
+        with self._lock:
+            q = self._queue(key)
+            numbers = q["patients"].get(str(patient_id))
+            if not numbers:
+                return None
+            # a patient booked twice that day waits for the earlier appointment
+            return bisect.bisect_left(q["numbers"], numbers[0])
+
+
+class RedisQueueBackend:
+    """
+    One sorted set per queue (member = JSON entry, score = appointment_number)
+    plus a second one of "<patient_id>:<zero-padded number>" members, all
+    scored 0 so they sort by patient and then number: a patient's earliest
+    booking is the first member in their lex range. Numbers are unique within
+    a queue, so entries are addressed by score, every operation is O(log n),
+    and writes are single MULTI round trips that never read first. A
+    counter beside them is the queue's version; ``replace`` WATCHes it.
+    """
+
+    # 0-based rank of the patient's earliest booked number, or nil
+    POSITION_SCRIPT = """
+    local members = redis.call('ZRANGEBYLEX', KEYS[2], ARGV[1], ARGV[2], 'LIMIT', 0, 1)
+    if #members == 0 then
+        return false
+    end
+    local number = string.match(members[1], ':(%d+)$')
+    return redis.call('ZCOUNT', KEYS[1], '-inf', '(' .. tonumber(number))
+    """
+
+    def __init__(self, hosts=None, prefix="apptq", **config):
+        import redis
+
+        host = (hosts or [("127.0.0.1", 6379)])[0]
+        if isinstance(host, str):
+            self._redis = redis.Redis.from_url(host, **config)
+        else:
+            self._redis = redis.Redis(host=host[0], port=host[1], **config)
+        self._errors = (redis.RedisError,)
+        self._watch_error = redis.WatchError
+        self.prefix = prefix
+        self._position = self._redis.register_script(self.POSITION_SCRIPT)
+
+    def _keys(self, key):
+        base = f"{self.prefix}:{key}"
+        return f"{base}:z", f"{base}:bypatient", f"{base}:loaded", f"{base}:version"
+
+    @staticmethod
+    def _patient_member(patient_id, number):
+        return f"{patient_id}:{int(number):010d}"
+
+    def _call(self, fn):
+        try:
+            return fn()
+        except self._errors as exc:
+            raise QueueUnavailable(str(exc)) from exc
+
+    def is_loaded(self, key):
+        return self._call(lambda: bool(self._redis.exists(self._keys(key)[2])))
+
+    def version(self, key):
+        return self._call(lambda: int(self._redis.get(self._keys(key)[3]) or 0))
+
+    def replace(self, key, entries, version=None):
+        zkey, pkey, loaded, vkey = self._keys(key)
+
+        def run():
+            with self._redis.pipeline(transaction=True) as pipe:
+                try:
+                    if version is not None:
+                        pipe.watch(vkey)
+                        if int(pipe.get(vkey) or 0) != version:
+                            return False
+                        pipe.multi()
+                    pipe.delete(zkey, pkey)
+                    if entries:
+                        pipe.zadd(zkey, {json.dumps(e): e["appointment_number"] for e in entries})
+                        pipe.zadd(
+                            pkey, {self._patient_member(e["patient"], e["appointment_number"]): 0 for e in entries}
+                        )
+                        pipe.expire(zkey, QUEUE_KEY_TTL)
+                        pipe.expire(pkey, QUEUE_KEY_TTL)
+                    pipe.set(loaded, 1, ex=QUEUE_RELOAD_INTERVAL)
+                    pipe.execute()
+                except self._watch_error:
+                    return False
+            return True
+
+        return self._call(run)
+
+    def add(self, key, entry):
+        zkey, pkey, _, vkey = self._keys(key)
+        number = entry["appointment_number"]
+
+        def run():
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.zremrangebyscore(zkey, number, number)
+            pipe.zadd(zkey, {json.dumps(entry): number})
+            pipe.zadd(pkey, {self._patient_member(entry["patient"], number): 0})
+            pipe.incr(vkey)
+            pipe.expire(zkey, QUEUE_KEY_TTL)
+            pipe.expire(pkey, QUEUE_KEY_TTL)
+            pipe.expire(vkey, QUEUE_KEY_TTL)
+            pipe.execute()
+
+        self._call(run)
+
+    def remove(self, key, number, patient_id):
+        zkey, pkey, _, vkey = self._keys(key)
+
+        def run():
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.zremrangebyscore(zkey, number, number)
+            pipe.zrem(pkey, self._patient_member(patient_id, number))
+            pipe.incr(vkey)
+            pipe.expire(vkey, QUEUE_KEY_TTL)
+            pipe.execute()
+
+        self._call(run)
+
+    def first(self, key):
+        members = self._call(lambda: self._redis.zrange(self._keys(key)[0], 0, 0))
+        return json.loads(members[0]) if members else None
+
+    def entries(self, key):
+        return [json.loads(m) for m in self._call(lambda: self._redis.zrange(self._keys(key)[0], 0, -1))]
+
+    def length(self, key):
+        return self._call(lambda: self._redis.zcard(self._keys(key)[0]))
+
+    def rank(self, key, number):
+        zkey = self._keys(key)[0]
+
+        def run():
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.zcount(zkey, number, number)
+            pipe.zcount(zkey, "-inf", f"({number}")
+            return pipe.execute()
+
+        queued, ahead = self._call(run)
+        return ahead if queued else None
+
+    def position(self, key, patient_id):
+        zkey, pkey, _, _ = self._keys(key)
+        # ";" sorts right after ":", so this range is exactly this patient's members
+        return self._call(lambda: self._position(keys=[zkey, pkey], args=[f"[{patient_id}:", f"({patient_id};"]))
+
+
+@lru_cache(maxsize=None)
+def get_queue_backend():
+    conf = getattr(settings, "APPOINTMENT_QUEUE", None) or {
+        "BACKEND": "appointments.queue.InMemoryQueueBackend",
+    }
+    return import_string(conf["BACKEND"])(**conf.get("CONFIG", {}))
+
+
+@receiver(setting_changed)
+def _reset_queue_backend(setting, **kwargs):
+    if setting == "APPOINTMENT_QUEUE":
+        get_queue_backend.cache_clear()
+
+
+# -----------------------
+# Queue operations
+# -----------------------
+def queue_key(doctor_id, the_date):
+    return f"{doctor_id}:{the_date.isoformat()}"
+
+
+def _entry(appointment):
+    # avoid circular import: serializers import models
+    from .serializers import AppointmentSerializer
+    return dict(AppointmentSerializer(appointment).data)
+
+
+def _booked_from_db(doctor_id, the_date):
+    from .models import Appointment
+    from .serializers import AppointmentSerializer
+    return optimize_queryset(
+        Appointment.objects
+        .filter(doctor_id=doctor_id, appointment_date=the_date, status="booked")
+        .order_by("appointment_number"),
+        AppointmentSerializer,
+    )
+
+
+def _loaded_backend(doctor_id, the_date):
+    """Return the backend with the queue for (doctor, date) loaded from the database if cold."""
+    backend = get_queue_backend()
+    key = queue_key(doctor_id, the_date)
+    if backend.is_loaded(key):
+        return backend
+    for _ in range(QUEUE_LOAD_ATTEMPTS):
+        # read before the rows: a change committed after the query is refused
+        # by replace(), which would otherwise overwrite it with stale rows
+        version = backend.version(key)
+        if backend.replace(key, [_entry(a) for a in _booked_from_db(doctor_id, the_date)], version):
+            return backend
+    raise QueueUnavailable(f"queue {key} kept changing while it was being loaded")
+
+
+def next_entry(doctor_id, the_date):
+    """Serialized next booked appointment (lowest number), or None."""
+    try:
+        return _loaded_backend(doctor_id, the_date).first(queue_key(doctor_id, the_date))
+    except QueueUnavailable:
+        logger.warning("appointment queue unavailable, reading next appointment from the database")
+        appointment = _booked_from_db(doctor_id, the_date).first()
+        return _entry(appointment) if appointment else None
+
+
+def queue_entries(doctor_id, the_date):
+    """Serialized booked appointments in queue order."""
+    try:
+        return _loaded_backend(doctor_id, the_date).entries(queue_key(doctor_id, the_date))
+    except QueueUnavailable:
+        logger.warning("appointment queue unavailable, reading queue from the database")
+        return [_entry(a) for a in _booked_from_db(doctor_id, the_date)]
+
+
+def queue_length(doctor_id, the_date):
+    try:
+        return _loaded_backend(doctor_id, the_date).length(queue_key(doctor_id, the_date))
+    except QueueUnavailable:
+        logger.warning("appointment queue unavailable, counting queue in the database")
+        return _booked_from_db(doctor_id, the_date).count()
+
+
+def appointment_position(doctor_id, the_date, number):
+    """0-based position of booked appointment ``number`` in the queue, or None."""
+    try:
+        return _loaded_backend(doctor_id, the_date).rank(queue_key(doctor_id, the_date), number)
+    except QueueUnavailable:
+        logger.warning("appointment queue unavailable, computing position in the database")
+        numbers = list(_booked_from_db(doctor_id, the_date).values_list("appointment_number", flat=True))
+        return numbers.index(number) if number in numbers else None
+
+
+def patient_position(doctor_id, the_date, patient_id):
+    """0-based position of the patient's earliest booked appointment in the queue, or None."""
+    try:
+        return _loaded_backend(doctor_id, the_date).position(queue_key(doctor_id, the_date), patient_id)
+    except QueueUnavailable:
+        logger.warning("appointment queue unavailable, computing position in the database")
+        patients = list(_booked_from_db(doctor_id, the_date).values_list("patient_id", flat=True))
+        try:
+            return patients.index(int(patient_id))
+        except ValueError:
+            return None
+
+
+# -----------------------
+# Sync on status changes
+# -----------------------
+@receiver(appointment_status_changed)
+def _sync_queue(sender, appointment, previous_status, **kwargs):
+    key = queue_key(appointment.doctor_id, appointment.appointment_date)
+    booked = appointment.status == "booked"
+
+    def apply():
+        backend = get_queue_backend()
+        try:
+            if booked:
+                # added to a cold queue too, so a load that read the rows before
+                # this commit sees the version change and is refused; serialized
+                # here rather than in the transaction, which holds the write lock
+                backend.add(key, _entry(appointment))
+            else:
+                backend.remove(key, appointment.appointment_number, appointment.patient_id)
+        except QueueUnavailable:
+            logger.warning("appointment queue unavailable, %s will be picked up on reload", key)
+
+    transaction.on_commit(apply)
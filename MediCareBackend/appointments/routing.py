@@ -0,0 +1,7 @@
+# routing.py
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'ws/queue/(?P<doctor_id>\d+)/(?:(?P<date>\d{4}-\d{2}-\d{2})/)?$', consumers.DoctorQueueConsumer.as_asgi()),
+]
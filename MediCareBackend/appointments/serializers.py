@@ -1,14 +1,17 @@
 # serializers.py
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 from .models import Appointment
-from Doctor.models import Doctor
+from Doctor.search import find_doctor
+from UserDetails.utils import normalize_phone
 
 User = get_user_model()
 
 
 class AppointmentSerializer(serializers.ModelSerializer):
+    """
+    Pass ``fields=[...]`` to serialize only a subset of the declared fields.
+    """
     doctor_name = serializers.CharField(
         source="doctor.user.get_full_name", read_only=True
     )
@@ -33,6 +36,12 @@ class AppointmentSerializer(serializers.ModelSerializer):
             "status"
         ]
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 
 class AppointmentCreateByPhoneSerializer(serializers.Serializer):
     """
@@ -46,26 +55,19 @@ class AppointmentCreateByPhoneSerializer(serializers.Serializer):
     notes = serializers.CharField(required=False, allow_blank=True)
 
     def validate_doctor_name(self, value):
-        value = value.strip()
-
         # Search doctor by user fields, NOT doctor.name (which doesn't exist)
-        qs = Doctor.objects.filter(
-            Q(user__first_name__icontains=value) |
-            Q(user__last_name__icontains=value) |
-            Q(user__username__icontains=value)
-        )
+        doctor = find_doctor(value.strip())
 
-        if not qs.exists():
+        if doctor is None:
             raise serializers.ValidationError("No doctor found matching that name.")
 
-        return qs.first()  # simple: pick first match
+        return doctor  # best-ranked match
 
     def validate_phone_number(self, value):
-        phone = value.strip()
-
-        try:
-            user = User.objects.get(phone_number=phone)
-        except User.DoesNotExist:
+        phone = normalize_phone(value)
+        # one probe of the unique phone_normalized index, whatever the formatting
+        user = User.objects.filter(phone_normalized=phone).first() if phone else None
+        if user is None:
             raise serializers.ValidationError("No user found with this phone number.")
 
         return user
@@ -81,13 +83,4 @@ class AppointmentCreateByPhoneSerializer(serializers.Serializer):
         appointment_date = validated_data["appointment_date"]
         notes = validated_data.get("notes", "")
 
-        appointment_number = Appointment.issue_appointment_number(doctor, appointment_date)
-
-        return Appointment.objects.create(
-            doctor=doctor,
-            patient=patient,
-            appointment_date=appointment_date,
-            appointment_number=appointment_number,
-            status="booked",
-            notes=notes
-        )
+        return Appointment.book(doctor, patient, appointment_date, notes=notes)
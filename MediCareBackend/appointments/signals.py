@@ -0,0 +1,6 @@
+# signals.py
+from django.dispatch import Signal
+
+# Sent whenever an appointment is booked or changes status.
+# kwargs: appointment, previous_status (None for a new booking)
+appointment_status_changed = Signal()
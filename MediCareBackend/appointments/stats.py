@@ -0,0 +1,106 @@
+# stats.py
+"""
+Maintenance of the DoctorDailyStats rollup.
+
+Each status change adds to the (doctor, appointment_date) row in the
+transaction that saves it, so the rollup commits or rolls back with the
+appointment: a booking adds to booked, completion to completed,
+timed_completed and total_minutes, cancellation to cancelled. Appointments changed without
+Appointment.book/_set_status (admin, bulk updates, deletes) are not
+counted; ``compact_daily_stats`` recomputes days from Appointment and is
+run nightly for the day just closed (compact_doctor_stats command).
+
+Consultation lengths follow the ETA model's rules (appointments.eta):
+completions without both timestamps, or longer than MAX_CONSULTATION,
+count as completed but add no minutes. timed_completed counts the
+completions that did add minutes, so total_minutes / timed_completed is
+the average consultation length.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.dispatch import receiver
+
+from .eta import consultation_seconds
+from .signals import appointment_status_changed
+
+# status an appointment moves into -> DoctorDailyStats counter it adds to
+STATUS_COUNTERS = {"completed": "completed", "cancelled": "cancelled"}
+
+
+def _add(doctor_id, the_date, **deltas):
+    """Add ``deltas`` to the doctor's row for ``the_date``, creating the row if needed."""
+    from .models import DoctorDailyStats
+
+    changes = {name: F(name) + value for name, value in deltas.items()}
+    rows = DoctorDailyStats.objects.filter(doctor_id=doctor_id, date=the_date)
+    if not rows.update(**changes):
+        # first change of the day: a concurrent one may create the row first
+        DoctorDailyStats.objects.bulk_create(
+            [DoctorDailyStats(doctor_id=doctor_id, date=the_date)], ignore_conflicts=True
+        )
+        rows.update(**changes)
+
+
+@receiver(appointment_status_changed)
+def _count_transition(sender, appointment, previous_status, **kwargs):
+    if previous_status is None:
+        _add(appointment.doctor_id, appointment.appointment_date, booked=1)
+        return
+    counter = STATUS_COUNTERS.get(appointment.status)
+    if counter is None or appointment.status == previous_status:
+        return
+    deltas = {counter: 1}
+    if appointment.status == "completed":
+        seconds = consultation_seconds(appointment.actual_start, appointment.actual_end)
+        if seconds is not None:
+            deltas["timed_completed"] = 1
+            deltas["total_minutes"] = seconds / 60
+    _add(appointment.doctor_id, appointment.appointment_date, **deltas)
+
+
+def compact_daily_stats(appointment_model, stats_model, since=None, until=None, batch_size=2000):
+    """
+    Replace the rollup rows dated ``since``..``until`` (inclusive; None is
+    open-ended) with counts recomputed from ``appointment_model``. Takes the
+    models so migrations can pass historical ones. Returns the number of
+    rows written.
+    """
+    appointments = appointment_model.objects.all()
+    stats = stats_model.objects.all()
+    if since is not None:
+        appointments = appointments.filter(appointment_date__gte=since)
+        stats = stats.filter(date__gte=since)
+    if until is not None:
+        appointments = appointments.filter(appointment_date__lte=until)
+        stats = stats.filter(date__lte=until)
+
+    with transaction.atomic():
+        rows = {
+            (row["doctor_id"], row["appointment_date"]): stats_model(
+                doctor_id=row["doctor_id"],
+                date=row["appointment_date"],
+                booked=row["booked"],
+                completed=row["completed"],
+                cancelled=row["cancelled"],
+            )
+            for row in appointments.order_by().values("doctor_id", "appointment_date").annotate(
+                booked=Count("id"),
+                completed=Count("id", filter=Q(status="completed")),
+                cancelled=Count("id", filter=Q(status="cancelled")),
+            )
+        }
+        # lengths are summed here rather than in SQL so they match _count_transition exactly
+        completed = (
+            appointments.filter(status="completed", actual_start__isnull=False, actual_end__isnull=False)
+            .values_list("doctor_id", "appointment_date", "actual_start", "actual_end")
+        )
+        for doctor_id, the_date, actual_start, actual_end in completed.iterator(chunk_size=batch_size):
+            seconds = consultation_seconds(actual_start, actual_end)
+            if seconds is not None:
+                row = rows[doctor_id, the_date]
+                row.timed_completed += 1
+                row.total_minutes += seconds / 60
+
+        stats.delete()
+        stats_model.objects.bulk_create(rows.values(), batch_size=batch_size)
+    return len(rows)
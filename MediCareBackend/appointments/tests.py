@@ -1,3 +1,469 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from MediCareBackend.testing import (
+    assert_uses_index, latest_migrations, make_doctor, make_patient, migrate_to, prefer_index_plans, redis_server,
+    reset_shared_state,
+)
+from . import eta, queue as appointment_queue
+from .broadcast import queue_group_name
+from .models import Appointment, DailyAppointmentCounter, DoctorDailyStats
+from .queue import InMemoryQueueBackend, RedisQueueBackend
+from .stats import compact_daily_stats
+
+
+class BookingNumberTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.doctor = make_doctor()
+        self.patient = make_patient(1, phone="9000000001")
+        self.today = timezone.localdate()
+
+    def test_numbers_count_up_per_doctor_and_day(self):
+        other_doctor = make_doctor("Bob")
+        tomorrow = self.today + timedelta(days=1)
+        numbers = [Appointment.book(self.doctor, self.patient, self.today).appointment_number for _ in range(3)]
+        self.assertEqual(numbers, [1, 2, 3])
+        self.assertEqual(Appointment.book(self.doctor, self.patient, tomorrow).appointment_number, 1)
+        self.assertEqual(Appointment.book(other_doctor, self.patient, self.today).appointment_number, 1)
+        self.assertEqual(DailyAppointmentCounter.objects.get(doctor=self.doctor, date=self.today).last, 3)
+
+    def test_rolled_back_booking_leaves_no_gap(self):
+        Appointment.book(self.doctor, self.patient, self.today)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Appointment.book(self.doctor, self.patient, self.today)
+                raise RuntimeError("booking rejected")
+        self.assertEqual(Appointment.book(self.doctor, self.patient, self.today).appointment_number, 2)
+        numbers = Appointment.objects.values_list("appointment_number", flat=True).order_by("appointment_number")
+        self.assertEqual(list(numbers), [1, 2])
+
+    def test_booking_takes_one_counter_update(self):
+        Appointment.book(self.doctor, self.patient, self.today)
+        # counter UPDATE ... RETURNING, appointment INSERT, daily stats UPDATE
+        with self.assertNumQueries(3):
+            Appointment.book(self.doctor, self.patient, self.today)
+
+    def test_book_by_phone(self):
+        payload = {"doctor_name": "ann", "phone_number": " 90000-00001 ", "appointment_date": str(self.today)}
+        first = self.client.post("/appointments/book/", json.dumps(payload), content_type="application/json")
+        second = self.client.post("/appointments/book/", json.dumps(payload), content_type="application/json")
+        self.assertEqual(first.status_code, 201, first.content)
+        self.assertEqual([first.json()["appointment_number"], second.json()["appointment_number"]], [1, 2])
+
+    def test_unknown_phone_is_rejected_without_using_a_number(self):
+        payload = {"doctor_name": "ann", "phone_number": "9999999999", "appointment_date": str(self.today)}
+        response = self.client.post("/appointments/book/", json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Appointment.book(self.doctor, self.patient, self.today).appointment_number, 1)
+
+
+def queue_entry(number, patient):
+    return {"id": number, "appointment_number": number, "patient": patient}
+
+
+class QueueBackendContract:
+    """The same checks against each queue backend; subclasses provide ``make_backend``."""
+
+    key = "7:2026-01-01"
+
+    def setUp(self):
+        self.backend = self.make_backend()
+
+    def test_entries_in_number_order(self):
+        for number, patient in [(3, 30), (1, 10), (2, 20)]:
+            self.backend.add(self.key, queue_entry(number, patient))
+        self.assertEqual([e["appointment_number"] for e in self.backend.entries(self.key)], [1, 2, 3])
+        self.assertEqual(self.backend.first(self.key)["patient"], 10)
+        self.assertEqual(self.backend.length(self.key), 3)
+
+    def test_position_and_cancel(self):
+        for number, patient in [(1, 10), (2, 20), (3, 30)]:
+            self.backend.add(self.key, queue_entry(number, patient))
+        self.assertEqual(self.backend.position(self.key, 30), 2)
+        self.backend.remove(self.key, 1, 10)
+        self.assertEqual(self.backend.position(self.key, 30), 1)
+        self.assertIsNone(self.backend.position(self.key, 10))
+        self.assertEqual(self.backend.length(self.key), 2)
+
+    def test_patient_with_two_bookings_waits_for_the_earlier_one(self):
+        for number, patient in [(1, 10), (2, 20), (3, 10)]:
+            self.backend.add(self.key, queue_entry(number, patient))
+        self.assertEqual(self.backend.position(self.key, 10), 0)
+        self.backend.remove(self.key, 1, 10)
+        self.assertEqual(self.backend.position(self.key, 10), 1)
+        self.backend.remove(self.key, 3, 10)
+        self.assertIsNone(self.backend.position(self.key, 10))
+
+    def test_replace_maps_every_booking(self):
+        self.backend.add(self.key, queue_entry(9, 90))
+        self.backend.replace(self.key, [queue_entry(4, 10), queue_entry(5, 11), queue_entry(6, 10)])
+        self.assertTrue(self.backend.is_loaded(self.key))
+        self.assertIsNone(self.backend.position(self.key, 90))
+        self.backend.remove(self.key, 4, 10)
+        self.assertEqual(self.backend.position(self.key, 10), 1)
+
+    def test_replace_is_refused_after_a_change(self):
+        version = self.backend.version(self.key)
+        self.backend.remove(self.key, 4, 10)
+        self.assertFalse(self.backend.replace(self.key, [queue_entry(4, 10)], version))
+        self.assertFalse(self.backend.is_loaded(self.key))
+        self.assertTrue(self.backend.replace(self.key, [], self.backend.version(self.key)))
+        self.assertTrue(self.backend.is_loaded(self.key))
+
+    def test_patient_ids_sharing_a_prefix_are_kept_apart(self):
+        self.backend.add(self.key, queue_entry(1, 12))
+        self.backend.add(self.key, queue_entry(2, 1))
+        self.assertEqual(self.backend.position(self.key, 1), 1)
+        self.assertEqual(self.backend.position(self.key, 12), 0)
+
+
+class InMemoryQueueBackendTests(QueueBackendContract, TestCase):
+    def make_backend(self):
+        return InMemoryQueueBackend()
+
+
+class RedisQueueBackendTests(QueueBackendContract, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.host = cls.enterClassContext(redis_server())
+
+    def make_backend(self):
+        backend = RedisQueueBackend(hosts=[self.host])
+        backend._redis.flushdb()
+        return backend
+
+
+class LiveQueueTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.doctor = make_doctor()
+        self.patients = [make_patient(n) for n in range(3)]
+        self.today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointments = [Appointment.book(self.doctor, p, self.today) for p in self.patients]
+
+    def test_cancel_moves_everyone_up(self):
+        last = self.patients[2].pk
+        self.assertEqual(appointment_queue.patient_position(self.doctor.pk, self.today, last), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/appointments/{self.appointments[0].pk}/cancel/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(appointment_queue.patient_position(self.doctor.pk, self.today, last), 1)
+        self.assertEqual(appointment_queue.next_entry(self.doctor.pk, self.today)["appointment_number"], 2)
+
+    def test_started_appointment_leaves_the_queue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/appointments/{self.appointments[0].pk}/start/")
+        self.assertEqual(appointment_queue.queue_length(self.doctor.pk, self.today), 2)
+
+    def test_cancel_during_a_reload_is_kept(self):
+        appointment_queue.get_queue_backend.cache_clear()  # cold, as after a restart
+        booked_from_db = appointment_queue._booked_from_db
+        cancelled = []
+
+        def cancel_after_the_read(doctor_id, the_date):
+            rows = list(booked_from_db(doctor_id, the_date))
+            if not cancelled:
+                # commits between the load's query and its replace()
+                with self.captureOnCommitCallbacks(execute=True):
+                    cancelled.append(self.client.post(f"/appointments/{self.appointments[0].pk}/cancel/"))
+            return rows
+
+        with mock.patch.object(appointment_queue, "_booked_from_db", cancel_after_the_read):
+            entries = appointment_queue.queue_entries(self.doctor.pk, self.today)
+        self.assertEqual(cancelled[0].status_code, 200)
+        self.assertEqual([e["appointment_number"] for e in entries], [2, 3])
+        self.assertEqual(appointment_queue.queue_length(self.doctor.pk, self.today), 2)
+
+    def test_warm_queue_reads_run_no_sql(self):
+        self.client.get(f"/appointments/doctor/{self.doctor.pk}/queue/")
+        with self.assertNumQueries(0):
+            next_response = self.client.get(f"/appointments/doctor/{self.doctor.pk}/next/")
+            queue_response = self.client.get(
+                f"/appointments/doctor/{self.doctor.pk}/queue/?patient={self.patients[1].pk}"
+            )
+        self.assertEqual(next_response.json()["appointment_number"], 1)
+        self.assertEqual(queue_response.json()["length"], 3)
+        self.assertEqual(queue_response.json()["position"], 1)
+
+
+class QueueBroadcastTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.doctor = make_doctor()
+        self.today = timezone.localdate()
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(queue_group_name(self.doctor.pk, self.today), self.channel)
+
+    def book(self, n):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Appointment.book(self.doctor, make_patient(n), self.today)
+
+    def next_delta(self):
+        return async_to_sync(self.layer.receive)(self.channel)["delta"]
+
+    def test_every_delta_carries_the_queue_clock(self):
+        first, second = self.book(1), self.book(2)
+        self.next_delta()
+        delta = self.next_delta()
+        self.assertEqual((delta["number"], delta["position"]), (2, 1))
+        self.assertEqual(delta["clock"]["minutes_per_patient"], 15)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.cancel()
+        delta = self.next_delta()
+        # the cancelled appointment has no ETA, but the clock lets #2 recompute its own
+        self.assertEqual((delta["status"], delta["position"], delta["eta"]), ("cancelled", None, None))
+        self.assertEqual(delta["clock"]["first_start"][:10], str(self.today))
+        self.assertEqual(appointment_queue.appointment_position(self.doctor.pk, self.today, second.appointment_number), 0)
+
+    def test_completion_moves_the_clock(self):
+        appointment = self.book(1)
+        self.next_delta()
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.start()
+        self.next_delta()
+        appointment.actual_start -= timedelta(minutes=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.complete()
+        self.assertAlmostEqual(self.next_delta()["clock"]["minutes_per_patient"], 5, places=1)
+
+    def test_other_days_have_no_clock(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.book(self.doctor, make_patient(1), self.today + timedelta(days=1))
+        async_to_sync(self.layer.group_add)(queue_group_name(self.doctor.pk, self.today + timedelta(days=1)), self.channel)
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.book(self.doctor, make_patient(2), self.today + timedelta(days=1))
+        delta = self.next_delta()
+        self.assertEqual((delta["position"], delta["eta"], delta["clock"]), (1, None, None))
+
+
+@override_settings(APPOINTMENT_SLOT_MINUTES=15, APPOINTMENT_ETA_ALPHA=0.2)
+class EtaTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.doctor = make_doctor()
+        self.now = timezone.now()
+
+    def completed(self, n, minutes, ended_ago):
+        actual_end = self.now - ended_ago
+        return Appointment.objects.create(
+            doctor=self.doctor, patient=make_patient(n), appointment_date=timezone.localdate(actual_end),
+            appointment_number=n, status="completed",
+            actual_start=actual_end - timedelta(minutes=minutes), actual_end=actual_end,
+        )
+
+    def test_fold(self):
+        model = {"mean": 900, "samples": 0}
+        # the first samples count for at least 1/n: the default is replaced outright
+        model = eta._fold(model, 600)
+        self.assertEqual(model, {"mean": 600, "samples": 1})
+        self.assertEqual(eta._fold(model, 300), {"mean": 450, "samples": 2})
+        # once 1/n drops below alpha, alpha weights the newest sample
+        self.assertAlmostEqual(eta._fold({"mean": 600, "samples": 9}, 1100)["mean"], 700)
+
+    def test_consultation_seconds(self):
+        start = self.now
+        self.assertEqual(eta.consultation_seconds(start, start + timedelta(minutes=12)), 720)
+        self.assertEqual(eta.consultation_seconds(start, start + eta.MAX_CONSULTATION), 4 * 3600)
+        for end in (None, start, start - timedelta(minutes=1), start + eta.MAX_CONSULTATION + timedelta(seconds=1)):
+            self.assertIsNone(eta.consultation_seconds(start, end))
+        self.assertIsNone(eta.consultation_seconds(None, start))
+
+    def test_queue_clock_without_a_running_consultation(self):
+        self.assertEqual(eta.queue_clock(self.doctor.pk, timezone.localdate(self.now), self.now),
+                         (self.now, timedelta(minutes=15)))
+        tomorrow = timezone.localdate(self.now) + timedelta(days=1)
+        self.assertIsNone(eta.queue_clock(self.doctor.pk, tomorrow, self.now))
+
+    def test_queue_clock_waits_for_the_running_consultation(self):
+        today = timezone.localdate(self.now)
+        started = self.now - timedelta(minutes=5)
+        cache.set(eta._current_key(self.doctor.pk), started.isoformat())
+        self.assertEqual(eta.queue_clock(self.doctor.pk, today, self.now)[0], started + timedelta(minutes=15))
+        # overrunning the average: expected to end any moment
+        cache.set(eta._current_key(self.doctor.pk), (self.now - timedelta(minutes=40)).isoformat())
+        self.assertEqual(eta.queue_clock(self.doctor.pk, today, self.now)[0], self.now)
+
+    def test_predicted_start(self):
+        clock = (self.now, timedelta(minutes=10))
+        self.assertEqual(eta.predicted_start(clock, 0), self.now)
+        self.assertEqual(eta.predicted_start(clock, 3), self.now + timedelta(minutes=30))
+        self.assertIsNone(eta.predicted_start(None, 3))
+        self.assertIsNone(eta.predicted_start(clock, None))
+
+    def test_lost_model_is_rebuilt_from_history_once(self):
+        # oldest first; the 5-hour one was left open by mistake and is skipped
+        for n, minutes in enumerate([10, 300, 20, 5], start=1):
+            self.completed(n, minutes, ended_ago=timedelta(hours=10 - n))
+        expected = {"mean": 900, "samples": 0}
+        for minutes in (10, 20, 5):
+            expected = eta._fold(expected, minutes * 60)
+
+        self.assertEqual(eta.duration_model(self.doctor.pk), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(eta.duration_model(self.doctor.pk), expected)
+
+    def test_observe_after_a_lost_model_does_not_count_twice(self):
+        self.completed(1, 10, ended_ago=timedelta(minutes=1))
+        self.assertEqual(eta.observe(self.doctor.pk, 600), {"mean": 600, "samples": 1})
+        self.assertEqual(eta.observe(self.doctor.pk, 1200), {"mean": 900, "samples": 2})
+
+
+class DoctorDailyStatsTests(TestCase):
+    FIELDS = ("doctor_id", "date", "booked", "completed", "timed_completed", "cancelled", "total_minutes")
+
+    def setUp(self):
+        reset_shared_state()
+        self.doctors = [make_doctor("Ann"), make_doctor("Ben")]
+        self.today = timezone.localdate()
+        patients = iter(make_patient(n) for n in range(100))
+        with self.captureOnCommitCallbacks(execute=True):
+            for doctor in self.doctors:
+                for the_date in (self.today - timedelta(days=1), self.today):
+                    booked = [Appointment.book(doctor, next(patients), the_date) for _ in range(5)]
+                    self.consult(booked[0], timedelta(minutes=6))
+                    self.consult(booked[1], timedelta(minutes=12))
+                    # left open overnight: completed, but no usable length
+                    self.consult(booked[2], timedelta(hours=9))
+                    booked[3].cancel()
+
+    def consult(self, appointment, length):
+        appointment.start()
+        appointment.actual_start -= length
+        Appointment.objects.filter(pk=appointment.pk).update(actual_start=appointment.actual_start)
+        appointment.complete()
+
+    def rollup(self):
+        rows = DoctorDailyStats.objects.order_by("doctor_id", "date").values_list(*self.FIELDS)
+        return [row[:-1] + (round(row[-1], 6),) for row in rows]
+
+    def test_incremental_rollup_matches_a_recompute(self):
+        incremental = self.rollup()
+        self.assertEqual(len(incremental), 4)
+        self.assertEqual(incremental[0][2:6], (5, 3, 2, 1))
+        compact_daily_stats(Appointment, DoctorDailyStats)
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_average_leaves_out_completions_without_a_length(self):
+        response = self.client.get(f"/appointments/doctor/{self.doctors[0].pk}/stats/")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["completed"], body["timed_completed"], body["no_shows"]), (6, 4, 1))
+        self.assertAlmostEqual(body["avg_consultation_minutes"], 9, places=1)
+
+
+class TimedCompletedMigrationTests(TransactionTestCase):
+    def tearDown(self):
+        migrate_to(*latest_migrations())
+
+    def test_existing_rows_are_counted(self):
+        apps = migrate_to(("appointments", "0004_doctordailystats"))
+        user = apps.get_model("UserDetails", "CustomUser").objects.create(username="dr-ann")
+        doctor = apps.get_model("Doctor", "Doctor").objects.create(user=user)
+        OldAppointment = apps.get_model("appointments", "Appointment")
+        today, now = timezone.localdate(), timezone.now()
+        for n, minutes in enumerate([10, 20, 9 * 60], start=1):
+            OldAppointment.objects.create(
+                doctor=doctor, patient=user, appointment_date=today, appointment_number=n, status="completed",
+                actual_start=now - timedelta(minutes=minutes), actual_end=now,
+            )
+        apps.get_model("appointments", "DoctorDailyStats").objects.create(
+            doctor=doctor, date=today, booked=3, completed=3, total_minutes=30
+        )
+
+        migrate_to(*latest_migrations())
+
+        self.assertEqual(DoctorDailyStats.objects.get(doctor_id=doctor.pk, date=today).timed_completed, 2)
+
+
+class AppointmentListPaginationTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        doctor, patient = make_doctor(), make_patient(1)
+        today = timezone.localdate()
+        for _ in range(7):
+            Appointment.book(doctor, patient, today)
+        # ties on created_at are broken by id
+        Appointment.objects.filter(appointment_number__in=[2, 3, 4]).update(created_at=timezone.now())
+        self.expected = list(Appointment.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen, url, pages = [], "/appointments/?page_size=3", 0
+        while url:
+            body = self.client.get(url).json()
+            seen += [row["id"] for row in body["results"]]
+            url, pages = body["next"], pages + 1
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, 3)
+
+    def test_later_pages_cost_the_same_as_the_first(self):
+        with self.assertNumQueries(1):
+            first = self.client.get("/appointments/?page_size=3").json()
+        with self.assertNumQueries(1):
+            self.client.get(first["next"])
+
+    def test_field_projection(self):
+        body = self.client.get("/appointments/?fields=id,status&page_size=1").json()
+        self.assertEqual(set(body["results"][0]), {"id", "status"})
+        self.assertEqual(self.client.get("/appointments/?fields=id,secret").status_code, 400)
+
+    def test_bad_cursor_is_not_found(self):
+        self.assertEqual(self.client.get("/appointments/?cursor=bm90LWpzb24").status_code, 404)
+
+
+class DoctorAppointmentsQueryCountTests(TestCase):
+    def setUp(self):
+        reset_shared_state()
+        self.doctor = make_doctor()
+        self.today = timezone.localdate()
+        self.url = f"/appointments/doctor/{self.doctor.pk}/?date={self.today}"
+
+    def test_patients_do_not_add_queries(self):
+        Appointment.book(self.doctor, make_patient(1), self.today)
+        # the doctor, then the day's appointments joined to doctor and patient
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        for n in range(2, 10):
+            Appointment.book(self.doctor, make_patient(n), self.today)
+        with self.assertNumQueries(2):
+            body = self.client.get(self.url).json()
+        self.assertEqual([row["patient_username"] for row in body["appointments"]][-1], "patient-9")
+        self.assertEqual(body["appointments"][0]["doctor_name"], "Ann")
+
+
+class AppointmentQueryPlanTests(TestCase):
+    def setUp(self):
+        prefer_index_plans()
+        self.doctor = make_doctor()
+        self.today = timezone.localdate()
+        self.day = Appointment.objects.filter(doctor=self.doctor, appointment_date=self.today)
+
+    def test_doctor_queue(self):
+        assert_uses_index(self.day.filter(status="booked").order_by("appointment_number"))
+
+    def test_doctor_day_list(self):
+        assert_uses_index(self.day.order_by("appointment_number"))
+
+    def test_appointment_list_pages(self):
+        newest_first = Appointment.objects.order_by("-created_at", "-id")
+        assert_uses_index(newest_first[:20])
+        assert_uses_index(newest_first.filter(created_at__lt=timezone.now())[:20])
+
+    def test_appointment_number_counter(self):
+        assert_uses_index(DailyAppointmentCounter.objects.filter(doctor=self.doctor, date=self.today))
+
+    def test_doctor_daily_stats(self):
+        week_ago = self.today - timedelta(days=7)
+        assert_uses_index(DoctorDailyStats.objects.filter(doctor=self.doctor, date__range=(week_ago, self.today)))
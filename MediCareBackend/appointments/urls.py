@@ -6,7 +6,11 @@ from .views import (
     AppointmentsForDoctorAPIView,
     StartAppointmentAPIView,
     CompleteAppointmentAPIView,
+    CancelAppointmentAPIView,
     NextAppointmentAPIView,
+    DoctorQueueAPIView,
+    DoctorQueueETAAPIView,
+    DoctorStatsAPIView,
     SearchAppointmentsByDoctorNameAPIView,
 )
 
@@ -18,6 +22,10 @@ urlpatterns = [
     path("doctor/", AppointmentsForDoctorAPIView.as_view(), name="appointments-for-doctor-by-name"),
     path("<int:appointment_id>/start/", StartAppointmentAPIView.as_view(), name="appointment-start"),
     path("<int:appointment_id>/complete/", CompleteAppointmentAPIView.as_view(), name="appointment-complete"),
+    path("<int:appointment_id>/cancel/", CancelAppointmentAPIView.as_view(), name="appointment-cancel"),
     path("doctor/<int:doctor_id>/next/", NextAppointmentAPIView.as_view(), name="appointment-next"),
+    path("doctor/<int:doctor_id>/queue/", DoctorQueueAPIView.as_view(), name="appointment-queue"),
+    path("doctor/<int:doctor_id>/eta/", DoctorQueueETAAPIView.as_view(), name="appointment-queue-eta"),
+    path("doctor/<int:doctor_id>/stats/", DoctorStatsAPIView.as_view(), name="appointment-doctor-stats"),
     path("search/", SearchAppointmentsByDoctorNameAPIView.as_view(), name="appointments-search"),
 ]
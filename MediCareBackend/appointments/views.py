@@ -1,20 +1,27 @@
 # views.py
-from datetime import date as date_cls
+from datetime import date as date_cls, timedelta
 from typing import Optional
 
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
 
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 
-from .models import Appointment
+from MediCareBackend.pagination import KeysetPagination
+from MediCareBackend.prefetch import QueryPlanMixin, optimize_queryset
+from . import queue as appointment_queue
+from .eta import predicted_start, queue_clock
+from .models import Appointment, DoctorDailyStats
 from .serializers import AppointmentSerializer, AppointmentCreateByPhoneSerializer
 from Doctor.models import Doctor
+from Doctor.search import find_doctor
 
 User = get_user_model()
 
@@ -60,24 +67,42 @@ class BookAppointmentByPhoneAPIView(APIView):
         serializer = AppointmentCreateByPhoneSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        appointment = serializer.save()
+        with transaction.atomic():
+            appointment = serializer.save()
 
-        # Optional: prevent same-day booking outside working hours
-        if appointment.appointment_date == timezone.localdate() and not _is_now_within_doctor_time(appointment.doctor):
-            # rollback created appointment to avoid leaving an invalid booking
-            appointment.delete()
-            return Response({"detail": "Doctor not available at this time"}, status=status.HTTP_400_BAD_REQUEST)
+            # Optional: prevent same-day booking outside working hours
+            if appointment.appointment_date == timezone.localdate() and not _is_now_within_doctor_time(appointment.doctor):
+                # roll back the booking (and its number) to avoid leaving an invalid booking or a gap
+                transaction.set_rollback(True)
+                return Response({"detail": "Doctor not available at this time"}, status=status.HTTP_400_BAD_REQUEST)
 
         response_data = AppointmentSerializer(appointment).data
         return Response(response_data, status=status.HTTP_201_CREATED)
 
 
-class AppointmentListAPIView(ListAPIView):
+class AppointmentListAPIView(QueryPlanMixin, ListAPIView):
     """
-    List all appointments. You can add pagination by configuring DRF pagination.
+    List all appointments, newest first, in keyset-paginated pages.
+      - ?cursor=<next cursor>&page_size=N (default 50, max 500)
+      - ?fields=id,doctor_name,status to return only some fields
     """
-    queryset = Appointment.objects.all().order_by("-created_at")
+    queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
+    pagination_class = KeysetPagination
+
+    def get_serializer_fields(self):
+        raw = self.request.query_params.get("fields")
+        if not raw:
+            return None
+        fields = [f.strip() for f in raw.split(",") if f.strip()]
+        unknown = set(fields) - set(AppointmentSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({"fields": f"Unknown field(s): {', '.join(sorted(unknown))}"})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs["fields"] = self.get_serializer_fields()
+        return super().get_serializer(*args, **kwargs)
 
 
 class AppointmentsForDoctorAPIView(APIView):
@@ -92,12 +117,11 @@ class AppointmentsForDoctorAPIView(APIView):
         doctor = None
 
         if doctor_id is not None:
-            doctor = get_object_or_404(Doctor, pk=doctor_id)
+            doctor = get_object_or_404(Doctor.objects.select_related("user"), pk=doctor_id)
         elif name_q:
-            qs = Doctor.objects.filter(name__icontains=name_q.strip())
-            if not qs.exists():
+            doctor = find_doctor(name_q.strip())
+            if doctor is None:
                 return Response({"detail": f"No doctor found matching '{name_q}'"}, status=status.HTTP_404_NOT_FOUND)
-            doctor = qs.first()
         else:
             return Response({"detail": "Provide doctor_id in path or name query parameter."},
                             status=status.HTTP_400_BAD_REQUEST)
@@ -108,7 +132,7 @@ class AppointmentsForDoctorAPIView(APIView):
         except ValueError:
             return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
 
-        appts = Appointment.appointments_for_date(doctor, the_date)
+        appts = optimize_queryset(Appointment.appointments_for_date(doctor, the_date), AppointmentSerializer)
         serializer = AppointmentSerializer(appts, many=True)
         return Response({
             "doctor": _doctor_display_name(doctor),
@@ -127,9 +151,7 @@ class StartAppointmentAPIView(APIView):
         if appt.status != "booked":
             return Response({"detail": "Appointment cannot be started"}, status=status.HTTP_400_BAD_REQUEST)
 
-        appt.status = "in_progress"
-        appt.actual_start = timezone.now()
-        appt.save(update_fields=["status", "actual_start"])
+        appt.start()
 
         return Response(AppointmentSerializer(appt).data, status=status.HTTP_200_OK)
 
@@ -144,9 +166,22 @@ class CompleteAppointmentAPIView(APIView):
         if appt.status not in ("booked", "in_progress"):
             return Response({"detail": "Appointment cannot be completed"}, status=status.HTTP_400_BAD_REQUEST)
 
-        appt.status = "completed"
-        appt.actual_end = timezone.now()
-        appt.save(update_fields=["status", "actual_end"])
+        appt.complete()
+
+        return Response(AppointmentSerializer(appt).data, status=status.HTTP_200_OK)
+
+
+class CancelAppointmentAPIView(APIView):
+    """
+    Cancel a booked appointment; it leaves the doctor's queue.
+    """
+    def post(self, request, appointment_id):
+        appt = get_object_or_404(Appointment, pk=appointment_id)
+
+        if appt.status != "booked":
+            return Response({"detail": "Appointment cannot be cancelled"}, status=status.HTTP_400_BAD_REQUEST)
+
+        appt.cancel()
 
         return Response(AppointmentSerializer(appt).data, status=status.HTTP_200_OK)
 
@@ -154,25 +189,130 @@ class CompleteAppointmentAPIView(APIView):
 class NextAppointmentAPIView(APIView):
     """
     Return the next booked appointment for today (lowest appointment_number).
+    Served from the live doctor queue, so polling it does no SQL.
     """
     def get(self, request, doctor_id):
-        doctor = get_object_or_404(Doctor, pk=doctor_id)
-        today = timezone.localdate()
-
-        next_appt = (
-            Appointment.objects
-            .filter(doctor=doctor, appointment_date=today, status="booked")
-            .order_by("appointment_number")
-            .first()
-        )
+        next_appt = appointment_queue.next_entry(doctor_id, timezone.localdate())
 
         if not next_appt:
             return Response({"detail": "No more appointments today"}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response(AppointmentSerializer(next_appt).data, status=status.HTTP_200_OK)
+        return Response(next_appt, status=status.HTTP_200_OK)
+
+
+class DoctorQueueAPIView(APIView):
+    """
+    Queue length and next number for a doctor's day, plus a patient's position.
+    Example: /api/appointments/doctor/3/queue/?date=YYYY-MM-DD&patient=12
+    """
+    def get(self, request, doctor_id):
+        try:
+            the_date = _parse_date_param(request.query_params.get("date"))
+        except ValueError:
+            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_appt = appointment_queue.next_entry(doctor_id, the_date)
+        data = {
+            "doctor_id": doctor_id,
+            "date": str(the_date),
+            "length": appointment_queue.queue_length(doctor_id, the_date),
+            "next_number": next_appt["appointment_number"] if next_appt else None,
+        }
+
+        patient_id = request.query_params.get("patient")
+        if patient_id:
+            if not patient_id.isdigit():
+                return Response({"detail": "patient must be a user id."}, status=status.HTTP_400_BAD_REQUEST)
+            # 0-based position in the queue; None if the patient has no booked appointment
+            position = appointment_queue.patient_position(doctor_id, the_date, patient_id)
+            data["position"] = position
+            eta = predicted_start(queue_clock(doctor_id, the_date), position)
+            data["predicted_start"] = eta.isoformat() if eta else None
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class DoctorQueueETAAPIView(APIView):
+    """
+    Predicted start time for every booked appointment in a doctor's queue,
+    from the doctor's average consultation length (appointments.eta).
+    Only today's queue has predictions; other dates return None.
+    Example: /api/appointments/doctor/3/eta/?date=YYYY-MM-DD
+    """
+    def get(self, request, doctor_id):
+        try:
+            the_date = _parse_date_param(request.query_params.get("date"))
+        except ValueError:
+            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        clock = queue_clock(doctor_id, the_date)
+        queue = []
+        for position, entry in enumerate(appointment_queue.queue_entries(doctor_id, the_date)):
+            eta = predicted_start(clock, position)
+            queue.append({
+                "id": entry["id"],
+                "appointment_number": entry["appointment_number"],
+                "patient": entry["patient"],
+                "position": position,
+                "predicted_start": eta.isoformat() if eta else None,
+            })
+
+        return Response({
+            "doctor_id": doctor_id,
+            "date": str(the_date),
+            "minutes_per_patient": round(clock[1].total_seconds() / 60, 1) if clock else None,
+            "queue": queue,
+        }, status=status.HTTP_200_OK)
+
+
+class DoctorStatsAPIView(APIView):
+    """
+    Daily utilisation of a doctor from the DoctorDailyStats rollup, plus totals
+    over the range. Booked appointments of past days that were neither
+    completed nor cancelled count as no-shows; avg_consultation_minutes is
+    total_minutes over timed_completed, the completions with a usable length.
+    Example: /api/appointments/doctor/3/stats/?from=YYYY-MM-DD&to=YYYY-MM-DD (default: last 30 days)
+    """
+    def get(self, request, doctor_id):
+        try:
+            until = _parse_date_param(request.query_params.get("to"))
+            since = (
+                date_cls.fromisoformat(request.query_params["from"])
+                if request.query_params.get("from") else until - timedelta(days=29)
+            )
+        except ValueError:
+            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        today = timezone.localdate()
+        days = list(
+            DoctorDailyStats.objects
+            .filter(doctor_id=doctor_id, date__range=(since, until))
+            .order_by("date")
+            .values("date", "booked", "completed", "timed_completed", "cancelled", "total_minutes")
+        )
+        totals = {
+            name: sum(day[name] for day in days)
+            for name in ("booked", "completed", "timed_completed", "cancelled", "total_minutes")
+        }
+        past = [day for day in days if day["date"] < today]
+        past_booked = sum(day["booked"] for day in past)
+        no_shows = sum(day["booked"] - day["completed"] - day["cancelled"] for day in past)
+        for day in days:
+            day["date"] = str(day["date"])
+
+        return Response({
+            "doctor_id": doctor_id,
+            "from": str(since),
+            "to": str(until),
+            **totals,
+            "no_shows": no_shows,
+            "no_show_rate": round(no_shows / past_booked, 3) if past_booked else None,
+            "avg_consultation_minutes": (
+                round(totals["total_minutes"] / totals["timed_completed"], 1) if totals["timed_completed"] else None
+            ),
+            "days": days,
+        }, status=status.HTTP_200_OK)
 
-# paste/replace this class in views.py
-from django.db.models import Q  # ensure this import exists at top of views.py
 
 class SearchAppointmentsByDoctorNameAPIView(APIView):
     """
@@ -185,23 +325,17 @@ class SearchAppointmentsByDoctorNameAPIView(APIView):
             return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Search doctor by related user fields (first_name, last_name, username)
-        doctor_qs = Doctor.objects.filter(
-            Q(user__first_name__icontains=q) |
-            Q(user__last_name__icontains=q) |
-            Q(user__username__icontains=q)
-        )
+        doctor = find_doctor(q)
 
-        if not doctor_qs.exists():
+        if doctor is None:
             return Response({"detail": f"No doctor found matching '{q}'"}, status=status.HTTP_404_NOT_FOUND)
 
-        doctor = doctor_qs.first()
-
         try:
             the_date = _parse_date_param(request.query_params.get("date"))
         except ValueError:
             return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
 
-        appts = Appointment.appointments_for_date(doctor, the_date)
+        appts = optimize_queryset(Appointment.appointments_for_date(doctor, the_date), AppointmentSerializer)
         serializer = AppointmentSerializer(appts, many=True)
 
         return Response({